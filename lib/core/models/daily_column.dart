@@ -28,4 +28,17 @@ class DailyColumn {
       affiliateUrl: json['affiliate_url'],
     );
   }
+
+  /// Replaces the text fields with a translation from article_translations.
+  DailyColumn translated(Map<String, dynamic> fields) {
+    return DailyColumn(
+      id: id,
+      title: fields['title'] ?? title,
+      artistName: fields['artist'] ?? artistName,
+      imageUrl: imageUrl,
+      content: fields['content'] ?? content,
+      displayDate: displayDate,
+      affiliateUrl: affiliateUrl,
+    );
+  }
 }
@@ -34,4 +34,18 @@ class TrendingArticle {
       content: json['content'],
     );
   }
+
+  /// Replaces the text fields with a translation from article_translations.
+  TrendingArticle translated(Map<String, dynamic> fields) {
+    return TrendingArticle(
+      id: id,
+      title: fields['title'] ?? title,
+      summary: fields['summary'] ?? summary,
+      imageUrl: imageUrl,
+      sourceUrl: sourceUrl,
+      publishedAt: publishedAt,
+      keyword: keyword,
+      content: fields['content'] ?? content,
+    );
+  }
 }
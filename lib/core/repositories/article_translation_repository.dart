@@ -0,0 +1,43 @@
+import 'dart:ui';
+import 'package:supabase_flutter/supabase_flutter.dart';
+
+/// Reads the pre-translated article fields written by scripts/translate_articles.py.
+class ArticleTranslationRepository {
+  static const Set<String> supportedLanguages = {'en', 'zh', 'ko'};
+
+  final SupabaseClient _client = Supabase.instance.client;
+
+  /// The device language if articles are translated into it, otherwise null (show the Japanese original).
+  static String? get deviceLanguage {
+    final code = PlatformDispatcher.instance.locale.languageCode;
+    return supportedLanguages.contains(code) ? code : null;
+  }
+
+  /// Returns {source_id: {field: translated text}} for the given rows.
+  Future<Map<String, Map<String, dynamic>>> getTranslations(
+    String sourceTable,
+    List<String> ids, {
+    String? language,
+  }) async {
+    final lang = language ?? deviceLanguage;
+    if (lang == null || ids.isEmpty) return {};
+
+    try {
+      final response = await _client
+          .from('article_translations')
+          .select('source_id, fields')
+          .eq('source_table', sourceTable)
+          .eq('language', lang)
+          .inFilter('source_id', ids);
+
+      final List<dynamic> data = response as List<dynamic>;
+      return {
+        for (final row in data)
+          row['source_id'] as String: Map<String, dynamic>.from(row['fields'] as Map),
+      };
+    } catch (e) {
+      // debugPrint('Error fetching translations: $e');
+      return {};
+    }
+  }
+}
@@ -1,8 +1,22 @@
 import 'package:supabase_flutter/supabase_flutter.dart';
 import '../models/daily_column.dart';
+import 'article_translation_repository.dart';
 
 class DailyColumnRepository {
   final SupabaseClient _client = Supabase.instance.client;
+  final ArticleTranslationRepository _translations = ArticleTranslationRepository();
+
+  /// Shows columns in the device language when a pre-translation exists.
+  Future<List<DailyColumn>> _localize(List<DailyColumn> columns) async {
+    final translations = await _translations.getTranslations(
+      'daily_columns',
+      columns.map((c) => c.id).toList(),
+    );
+    if (translations.isEmpty) return columns;
+    return columns
+        .map((c) => translations.containsKey(c.id) ? c.translated(translations[c.id]!) : c)
+        .toList();
+  }
 
   Future<DailyColumn?> getTodayColumn() async {
     try {
@@ -26,12 +40,12 @@ class DailyColumnRepository {
             .maybeSingle();
             
         if (latestResponse != null) {
-          return DailyColumn.fromJson(latestResponse);
+          return (await _localize([DailyColumn.fromJson(latestResponse)])).first;
         }
         return null;
       }
 
-      return DailyColumn.fromJson(response);
+      return (await _localize([DailyColumn.fromJson(response)])).first;
     } catch (e) {
       // debugPrint('Error fetching daily column: $e');
       return null;
@@ -59,7 +73,7 @@ class DailyColumnRepository {
           .order('display_date', ascending: false)
           .range(offset, offset + limit - 1);
       final List<dynamic> data = response as List<dynamic>;
-      return data.map((e) => DailyColumn.fromJson(e)).toList();
+      return await _localize(data.map((e) => DailyColumn.fromJson(e)).toList());
     } catch (e) {
       // debugPrint('Error searching columns: $e');
       return [];
@@ -1,8 +1,22 @@
 import 'package:supabase_flutter/supabase_flutter.dart';
 import '../models/trending_article.dart';
+import 'article_translation_repository.dart';
 
 class TrendingRepository {
   final SupabaseClient _client = Supabase.instance.client;
+  final ArticleTranslationRepository _translations = ArticleTranslationRepository();
+
+  /// Shows articles in the device language when a pre-translation exists.
+  Future<List<TrendingArticle>> _localize(List<TrendingArticle> articles) async {
+    final translations = await _translations.getTranslations(
+      'trending_articles',
+      articles.map((a) => a.id).toList(),
+    );
+    if (translations.isEmpty) return articles;
+    return articles
+        .map((a) => translations.containsKey(a.id) ? a.translated(translations[a.id]!) : a)
+        .toList();
+  }
 
   Future<List<TrendingArticle>> getTrendingArticles({int limit = 10}) async {
     try {
@@ -15,7 +29,7 @@ class TrendingRepository {
           .limit(limit);
 
       final List<dynamic> data = response as List<dynamic>;
-      return data.map((e) => TrendingArticle.fromJson(e)).toList();
+      return await _localize(data.map((e) => TrendingArticle.fromJson(e)).toList());
     } catch (e) {
       // debugPrint('Error fetching trending articles: $e');
       return [];
@@ -40,7 +54,7 @@ class TrendingRepository {
           .order('published_at', ascending: false)
           .range(offset, offset + limit - 1);
       final List<dynamic> data = response as List<dynamic>;
-      return data.map((e) => TrendingArticle.fromJson(e)).toList();
+      return await _localize(data.map((e) => TrendingArticle.fromJson(e)).toList());
     } catch (e) {
       // debugPrint('Error searching articles: $e');
       return [];
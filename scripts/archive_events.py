@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Archive Events - 終了した展覧会を events から events_archive へバッチ単位で移動
+daily_crawler からも呼ばれる。単体で実行すると移動件数と所要時間を表示する
+"""
+import os
+import time
+import datetime
+from pathlib import Path
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+# Load .env from project root
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(env_path)
+
+ARCHIVE_BATCH_SIZE = 500
+MAX_BATCHES = 200  # 1回の実行で移動する上限（ARCHIVE_BATCH_SIZE * MAX_BATCHES 件）
+
+
+def archive_expired_events(supabase, cutoff=None, batch_size=ARCHIVE_BATCH_SIZE, max_batches=MAX_BATCHES):
+    """cutoff より前に終了したイベントを移動し、(移動件数, バッチ数, 秒数) を返す"""
+    cutoff = (cutoff or datetime.date.today()).isoformat()
+    started = time.monotonic()
+    moved = 0
+    batches = 0
+
+    while batches < max_batches:
+        result = supabase.rpc('archive_expired_events', {'cutoff': cutoff, 'batch_size': batch_size}).execute()
+        count = result.data or 0
+        if not count:
+            break
+        moved += count
+        batches += 1
+        if count < batch_size:
+            break
+
+    return moved, batches, time.monotonic() - started
+
+
+def main(dry_run=False):
+    # Configuration
+    supabase_url = os.environ.get("SUPABASE_URL", "").strip()
+    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+
+    if not supabase_url or not supabase_key:
+        print("Error: Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY environment variables.")
+        return
+
+    supabase: Client = create_client(supabase_url, supabase_key)
+    today_str = datetime.date.today().isoformat()
+
+    if dry_run:
+        try:
+            result = supabase.table('events').select('id', count='exact').lt('end_date', today_str).limit(1).execute()
+            print(f"[DRY RUN] Would archive {result.count} events that ended before {today_str}.")
+        except Exception as e:
+            print(f"Error counting expired events: {e}")
+        return
+
+    print(f"Archiving events that ended before {today_str}...")
+    try:
+        moved, batches, elapsed = archive_expired_events(supabase)
+    except Exception as e:
+        print(f"Error archiving events: {e}")
+        return
+
+    print(f"Archived {moved} events in {batches} batches ({elapsed:.2f}s).")
+
+
+if __name__ == "__main__":
+    import sys
+    dry_run = "--dry-run" in sys.argv
+    main(dry_run=dry_run)
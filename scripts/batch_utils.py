@@ -0,0 +1,40 @@
+"""
+Batch Utils - バッチ/メンテナンス系スクリプトの共通ヘルパー
+"""
+import hashlib
+
+
+def chunked(items, size):
+    """リストを size 件ずつに分割する"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def fetch_all(supabase, table, columns, page_size=1000, order='id', apply_filters=None):
+    """PostgRESTの行数上限を超えてテーブル全件をページングで取得する"""
+    rows = []
+    offset = 0
+    while True:
+        query = supabase.table(table).select(columns)
+        if apply_filters:
+            query = apply_filters(query)
+        page = query.order(order).range(offset, offset + page_size - 1).execute()
+        rows.extend(page.data)
+        if len(page.data) < page_size:
+            return rows
+        offset += page_size
+
+
+def content_hash(*parts):
+    """行の内容から変更検知用のハッシュを作る（Noneは空文字として扱う）"""
+    joined = "\x1f".join("" if part is None else str(part) for part in parts)
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+
+def upload_object(supabase, bucket, path, data, content_type, cache_control="3600"):
+    """Supabase Storage にオブジェクトを上書きアップロードする"""
+    supabase.storage.from_(bucket).upload(path, data, file_options={
+        "content-type": content_type,
+        "cache-control": cache_control,
+        "upsert": "true",
+    })
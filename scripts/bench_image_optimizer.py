@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Bench Image Optimizer - ローカルで動かした image_optimizer の /process に負荷をかけ、レイテンシとスループットを計測する
+asyncio だけで書いた HTTP/1.1 クライアント（keep-alive）で、同時接続数とリクエストレートを指定して送る
+入力解像度ごとに p50/p95/p99・スループット・エラー率・応答サイズを表示し、JSONに保存してビルド間で比較できる
+
+使い方:
+  cd image_optimizer && cargo run --release   # PORT=8080
+  python scripts/bench_image_optimizer.py --corpus ~/photos --concurrency 8 --duration 30 --output before.json
+  python scripts/bench_image_optimizer.py --corpus ~/photos --concurrency 8 --duration 30 --compare before.json
+
+--synthesize で合成画像のコーパスを作る場合の追加の依存: pip install pillow
+"""
+import io
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+DEFAULT_URL = "http://localhost:8080/process"
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp'}
+
+# スマホカメラの代表的な解像度（--synthesize 用）
+CAMERA_RESOLUTIONS = [(4032, 3024), (4000, 3000), (3264, 2448), (1920, 1080), (1024, 768)]
+
+REQUEST_TIMEOUT_SECONDS = 60
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def image_size(data):
+    """JPEG / PNG のヘッダから (幅, 高さ) を読む。読めなければ None"""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return int.from_bytes(data[16:20], 'big'), int.from_bytes(data[20:24], 'big')
+    if data[:2] != b"\xff\xd8":
+        return None
+    pos = 2
+    while pos + 9 < len(data):
+        if data[pos] != 0xFF:
+            pos += 1
+            continue
+        marker = data[pos + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            pos += 1 if marker == 0xFF else 2
+            continue
+        length = int.from_bytes(data[pos + 2:pos + 4], 'big')
+        # SOF0-SOF15 (excluding DHT, JPG and DAC) carry the frame size
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            return int.from_bytes(data[pos + 7:pos + 9], 'big'), int.from_bytes(data[pos + 5:pos + 7], 'big')
+        pos += 2 + length
+    return None
+
+
+def load_corpus(directory):
+    corpus = []
+    for path in sorted(Path(directory).expanduser().rglob('*')):
+        if path.suffix.lower() not in IMAGE_SUFFIXES:
+            continue
+        data = path.read_bytes()
+        size = image_size(data)
+        corpus.append({
+            "name": path.name,
+            "data": data,
+            "resolution": f"{size[0]}x{size[1]}" if size else "unknown",
+        })
+    return corpus
+
+
+def synthesize_corpus(per_resolution, seed=0):
+    """カメラ画像に近いサイズ・圧縮率になるよう、グラデーションにノイズを重ねたJPEGを作る"""
+    rng = random.Random(seed)
+    corpus = []
+    for width, height in CAMERA_RESOLUTIONS:
+        for i in range(per_resolution):
+            base = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+            noise = Image.effect_noise((width, height), rng.uniform(20, 60)).convert('RGB')
+            image = Image.blend(base, noise, 0.5)
+            buffer = io.BytesIO()
+            image.save(buffer, format='JPEG', quality=92)
+            corpus.append({"name": f"synthetic-{width}x{height}-{i}.jpg", "data": buffer.getvalue(),
+                           "resolution": f"{width}x{height}"})
+    return corpus
+
+
+def multipart_body(item):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="image"; filename="{item["name"]}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + item["data"] + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class Connection:
+    """keep-alive の HTTP/1.1 接続（1度に1リクエスト）"""
+
+    def __init__(self, host, port, path, use_ssl=False):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.use_ssl = use_ssl
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+        self.reader = self.writer = None
+
+    async def post(self, body, content_type):
+        """(ステータス, 応答ボディ) を返す"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port, ssl=True if self.use_ssl else None)
+
+        head = (
+            f"POST {self.path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode()
+        self.writer.write(head + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by server")
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            payload = b"".join(chunks)
+        elif 'content-length' in headers:
+            payload = await self.reader.readexactly(int(headers['content-length']))
+        elif 100 <= status < 200 or status in (204, 304):
+            payload = b""
+        else:
+            # No length given: the body runs until the server closes the connection
+            payload = await self.reader.read()
+            await self.close()
+            return status, payload
+
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, payload
+
+
+async def run_load(url, corpus, concurrency, rate, total_requests, duration, warmup, seed=0):
+    """負荷をかけて1リクエストごとの結果を返す。rate が 0 なら各接続が応答を待って次を送る（クローズドループ）"""
+    parts = urlsplit(url)
+    host, port, path = parts.hostname, parts.port or DEFAULT_PORTS[parts.scheme], parts.path or "/"
+    use_ssl = parts.scheme == 'https'
+    rng = random.Random(seed)
+    bodies = [(item, *multipart_body(item)) for item in corpus]
+
+    pool = asyncio.Queue()
+    for _ in range(concurrency):
+        pool.put_nowait(Connection(host, port, path, use_ssl))
+
+    results = []
+
+    async def one_request(record):
+        item, body, content_type = rng.choice(bodies)
+        queued = time.perf_counter()
+        connection = await pool.get()
+        # In open-loop mode the wait for a free connection counts too (avoids coordinated omission)
+        started = queued if rate else time.perf_counter()
+        result = {"resolution": item["resolution"], "input_bytes": len(item["data"])}
+        try:
+            status, payload = await asyncio.wait_for(connection.post(body, content_type), REQUEST_TIMEOUT_SECONDS)
+            result.update(status=status, output_bytes=len(payload), ok=status == 200)
+            if status != 200:
+                result["error"] = f"HTTP {status}"
+        except Exception as e:
+            await connection.close()
+            result.update(status=None, output_bytes=0, ok=False, error=type(e).__name__)
+        finally:
+            pool.put_nowait(connection)
+        result["latency"] = time.perf_counter() - started
+        if record:
+            results.append(result)
+
+    # Warm up connections and the service before measuring
+    if warmup:
+        await asyncio.gather(*(one_request(False) for _ in range(warmup)))
+
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    def more(sent):
+        if total_requests is not None and sent >= total_requests:
+            return False
+        return deadline is None or time.perf_counter() < deadline
+
+    if rate:
+        # Open loop: schedule at a fixed rate regardless of response times
+        tasks = []
+        sent = 0
+        while more(sent):
+            tasks.append(asyncio.create_task(one_request(True)))
+            sent += 1
+            await asyncio.sleep(max(0.0, started + sent / rate - time.perf_counter()))
+        await asyncio.gather(*tasks)
+    else:
+        counter = {"sent": 0}
+
+        async def worker():
+            while more(counter["sent"]):
+                counter["sent"] += 1
+                await one_request(True)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    elapsed = time.perf_counter() - started
+    while not pool.empty():
+        await pool.get_nowait().close()
+    return results, elapsed
+
+
+def percentile_ms(latencies, pct):
+    """最近傍順位法のパーセンタイル（ミリ秒）"""
+    if not latencies:
+        return None
+    ordered = sorted(latencies)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index] * 1000
+
+
+def summarize(results, elapsed):
+    ok = [r for r in results if r["ok"]]
+    latencies = [r["latency"] for r in ok]
+    errors = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "error_kinds": errors,
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+        "mean_input_bytes": sum(r["input_bytes"] for r in results) / len(results) if results else 0,
+        "mean_output_bytes": sum(r["output_bytes"] for r in ok) / len(ok) if ok else 0,
+    }
+
+
+def resolution_key(resolution):
+    try:
+        width, height = resolution.split('x')
+        return int(width) * int(height)
+    except ValueError:
+        return -1
+
+
+def print_report(report):
+    def fmt(value):
+        return f"{value:8.1f}" if value is not None else "       -"
+
+    print(f"\n{'resolution':>12} {'reqs':>6} {'err%':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'in KB':>8} {'out KB':>8}")
+    rows = sorted(report["by_resolution"].items(), key=lambda kv: resolution_key(kv[0]))
+    for name, s in rows + [("all", report["overall"])]:
+        print(f"{name:>12} {s['requests']:6d} {s['error_rate'] * 100:6.1f} {fmt(s['p50_ms'])} {fmt(s['p95_ms'])} "
+              f"{fmt(s['p99_ms'])} {s['mean_input_bytes'] / 1024:8.0f} {s['mean_output_bytes'] / 1024:8.0f}")
+    overall = report["overall"]
+    print(f"\nThroughput: {overall['throughput_rps']:.1f} req/s over {report['elapsed_seconds']:.1f}s "
+          f"({overall['errors']} errors{', ' + str(overall['error_kinds']) if overall['error_kinds'] else ''})")
+
+
+def print_comparison(report, baseline):
+    """前回の結果（ベースライン）との差分を表示する"""
+    print(f"\nCompared with {baseline.get('label') or baseline.get('started_at')}:")
+    print(f"{'resolution':>12} {'metric':>10} {'before':>10} {'after':>10} {'change':>8}")
+    pairs = [("all", baseline["overall"], report["overall"])]
+    for name in sorted(report["by_resolution"], key=resolution_key):
+        if name in baseline.get("by_resolution", {}):
+            pairs.append((name, baseline["by_resolution"][name], report["by_resolution"][name]))
+    for name, before, after in pairs:
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            if name != "all" and metric == "throughput_rps":
+                continue
+            old, new = before.get(metric), after.get(metric)
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old * 100:+7.1f}%" if old else "       -"
+            print(f"{name:>12} {metric:>10} {old:10.1f} {new:10.1f} {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the image_optimizer /process endpoint.")
+    parser.add_argument("--url", default=DEFAULT_URL, help=f"Endpoint to test (default: {DEFAULT_URL})")
+    parser.add_argument("--corpus", help="Directory of sample camera images (.jpg/.png/.webp)")
+    parser.add_argument("--synthesize", type=int, metavar="N", help="Generate N synthetic JPEGs per camera resolution (needs pillow)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent connections")
+    parser.add_argument("--rate", type=float, default=0, help="Requests per second (open loop). 0 = as fast as responses allow")
+    parser.add_argument("--requests", type=int, help="Stop after this many measured requests")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds (default: 30 unless --requests is given)")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests sent first")
+    parser.add_argument("--label", help="Name for this run (e.g. the build or commit)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run to compare against")
+    args = parser.parse_args()
+
+    parts = urlsplit(args.url)
+    if parts.scheme not in DEFAULT_PORTS or not parts.hostname:
+        print(f"Error: --url must be an http:// or https:// URL: {args.url}")
+        return
+
+    if args.synthesize:
+        if Image is None:
+            print("Error: pillow is not installed. Run: pip install pillow")
+            return
+        print(f"Synthesizing {args.synthesize} images per resolution...")
+        corpus = synthesize_corpus(args.synthesize)
+    elif args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        print("Error: Specify --corpus DIR or --synthesize N.")
+        return
+    if not corpus:
+        print("Error: No images found in the corpus.")
+        return
+
+    resolutions = sorted({item["resolution"] for item in corpus}, key=resolution_key)
+    print(f"Corpus: {len(corpus)} images ({', '.join(resolutions)})")
+    print(f"Target: {args.url} | concurrency {args.concurrency} | "
+          f"{'rate ' + str(args.rate) + ' req/s' if args.rate else 'closed loop'}")
+
+    duration = args.duration if args.duration or args.requests else 30
+    started_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    results, elapsed = asyncio.run(run_load(
+        args.url, corpus, args.concurrency, args.rate,
+        args.requests, duration, args.warmup,
+    ))
+    if not results:
+        print("Error: No requests completed.")
+        return
+
+    by_resolution = {}
+    for result in results:
+        by_resolution.setdefault(result["resolution"], []).append(result)
+
+    report = {
+        "label": args.label,
+        "started_at": started_at,
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "elapsed_seconds": elapsed,
+        "corpus_images": len(corpus),
+        "overall": summarize(results, elapsed),
+        "by_resolution": {name: summarize(rows, elapsed) for name, rows in by_resolution.items()},
+    }
+    print_report(report)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Bench Records - Gemini 応答のデコード・検証・行への変換コストを計測する
+records.parse_records と、これまで各スクリプトで行っていた辞書ベースの処理を
+同じ合成データ（展覧会の応答）で比較し、1レコードあたりの時間とメモリを表示する
+どちらもテキストから行（dict）までを計測し、メモリは upsert まで保持するもの（辞書 / レコード）を比べる
+"""
+import gc
+import io
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from contextlib import redirect_stdout
+from records import Event, parse_records, strip_code_fence
+
+
+def synthetic_response(count, invalid_ratio=0.0, seed=0):
+    """daily_crawler の応答に似た ```json で囲まれたJSONを作る"""
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        start = f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        event = {
+            "title": f"特別展「名品{i}」",
+            "venue": f"美術館{i % 300}",
+            "prefecture_code": f"{rng.randint(1, 47):02d}",
+            "start_date": start,
+            "end_date": start.replace("2026", "2027"),
+            "description_json": json.dumps({"summary": "展覧会の概要" * 10}, ensure_ascii=False),
+        }
+        if rng.random() < invalid_ratio:
+            event["start_date"] = "未定"
+        events.append(event)
+    return "```json\n" + json.dumps(events, ensure_ascii=False) + "\n```"
+
+
+def strip_fence_split(text):
+    """records 導入前の各スクリプトのコードブロック除去"""
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0]
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0]
+    return text.strip()
+
+
+def build_dict_rows(events):
+    """records 導入前の処理（辞書のまま、キー参照と description_json のデコード）"""
+    rows = []
+    for event in events:
+        try:
+            rows.append({
+                "title": event['title'],
+                "venue": event['venue'],
+                "prefecture_code": event.get('prefecture_code'),
+                "start_date": event['start_date'],
+                "end_date": event['end_date'],
+                "description_json": json.loads(event['description_json']) if isinstance(event['description_json'], str) else event['description_json'],
+            })
+        except Exception:
+            pass
+    return rows
+
+
+def parse_dicts(text):
+    return build_dict_rows(json.loads(strip_fence_split(text)))
+
+
+def parse_with_records(text):
+    return [event.to_row() for event in parse_records(Event, text)]
+
+
+def time_per_record(func, text, count, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        with redirect_stdout(io.StringIO()):  # keep the skipped-record notices out of the timing
+            func(text)
+        best = min(best, time.perf_counter() - started)
+    return best / count * 1e6
+
+
+def bytes_per_record(build, count):
+    gc.collect()
+    tracemalloc.start()
+    with redirect_stdout(io.StringIO()):
+        items = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return size / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark decoding Gemini JSON into record types.")
+    parser.add_argument("--count", type=int, default=5000, help="Records per synthetic response")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    parser.add_argument("--invalid-ratio", type=float, default=0.0, help="Fraction of records with a bad date")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    text = synthetic_response(args.count, args.invalid_ratio)
+
+    results = {
+        "count": args.count,
+        "dict_parse_us": time_per_record(parse_dicts, text, args.count, args.repeat),
+        "records_parse_us": time_per_record(parse_with_records, text, args.count, args.repeat),
+        "json_only_us": time_per_record(lambda t: json.loads(strip_code_fence(t)), text, args.count, args.repeat),
+        # What each path holds between parsing and the upsert: the decoded dicts vs the records
+        "dict_bytes": bytes_per_record(lambda: json.loads(strip_fence_split(text)), args.count),
+        "record_bytes": bytes_per_record(lambda: parse_records(Event, text), args.count),
+    }
+    results["records_validate_us"] = results["records_parse_us"] - results["json_only_us"]
+    results["records_vs_dict"] = results["records_parse_us"] / results["dict_parse_us"] - 1
+
+    print(f"{args.count} records per response (invalid ratio {args.invalid_ratio}):")
+    print(f"  json.loads only          {results['json_only_us']:8.2f} us/record")
+    print(f"  dict path (old)          {results['dict_parse_us']:8.2f} us/record")
+    print(f"  records path             {results['records_parse_us']:8.2f} us/record "
+          f"(validate + to_row {results['records_validate_us']:.2f} us)")
+    print(f"  retained until upsert: parsed dicts {results['dict_bytes']:.0f} B/record, "
+          f"records {results['record_bytes']:.0f} B/record")
+    change = results["records_vs_dict"]
+    print(f"Records path is {abs(change) * 100:.0f}% {'slower' if change > 0 else 'faster'} than the dict path "
+          f"(it also validates dates, date order and prefecture codes, which the dict path did not).")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
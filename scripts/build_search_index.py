@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Build Search Index - trending_articles / daily_columns の文字bigram転置インデックスを作って Storage に公開する
+アプリは manifest.json を見てインデックスを1回ダウンロードし、検索は端末内で完結する（DBへの問い合わせなし）
+元データ（ハッシュ）が前回と同じなら何もしない
+
+インデックスの形式（gzip圧縮、数値はすべて unsigned LEB128 varint）:
+  b"ENSI" | version(1 byte) | docs_json の長さ | docs_json（[{"t": テーブル, "id", "title"}]）
+  | 語数 | 語ごとに: 語のUTF-8長 | 語 | 件数 | 文書番号の差分列（昇順）
+"""
+import os
+import re
+import gzip
+import json
+import hashlib
+import datetime
+import unicodedata
+from pathlib import Path
+from dotenv import load_dotenv
+from supabase import create_client, Client
+from batch_utils import content_hash, fetch_all, upload_object
+
+# Load .env from project root
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(env_path)
+
+BUCKET = 'search_index'
+INDEX_VERSION = 1
+INDEX_DIR = f"v{INDEX_VERSION}"
+MANIFEST_PATH = f"{INDEX_DIR}/manifest.json"
+MAGIC = b"ENSI"
+KEEP_INDEXES = 3
+
+MANIFEST_CACHE_CONTROL = "300"
+INDEX_CACHE_CONTROL = "31536000"  # ファイル名に内容のハッシュを含むので不変
+
+# 索引対象のテーブルとフィールド
+SOURCES = {
+    'trending_articles': {
+        'columns': 'id, title, summary, keyword',
+        'fields': ['title', 'summary', 'keyword'],
+        'filters': lambda q: q.eq('is_published', True),
+    },
+    'daily_columns': {
+        'columns': 'id, title, artist',
+        'fields': ['title', 'artist'],
+        'filters': None,
+    },
+}
+
+_SEPARATORS = re.compile(r"[\s\W_]+")
+
+
+def normalize(text):
+    """NFKC正規化して小文字にし、空白・記号で区切った断片を返す"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return [part for part in _SEPARATORS.split(text) if part]
+
+
+def bigrams(text):
+    """文字bigramの集合（1文字だけの断片はその文字自体）"""
+    grams = set()
+    for part in normalize(text):
+        if len(part) == 1:
+            grams.add(part)
+        else:
+            grams.update(part[i:i + 2] for i in range(len(part) - 1))
+    return grams
+
+
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def build_index(docs, texts):
+    """docs と各文書の索引テキストから、圧縮前のインデックスのバイト列を作る"""
+    postings = {}
+    for doc_number, text in enumerate(texts):
+        for gram in bigrams(text):
+            postings.setdefault(gram, []).append(doc_number)  # doc_number 順に追加されるので昇順
+
+    out = bytearray(MAGIC)
+    out.append(INDEX_VERSION)
+    docs_json = json.dumps(docs, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    encode_varint(len(docs_json), out)
+    out += docs_json
+
+    encode_varint(len(postings), out)
+    for gram in sorted(postings):
+        term = gram.encode('utf-8')
+        encode_varint(len(term), out)
+        out += term
+        doc_numbers = postings[gram]
+        encode_varint(len(doc_numbers), out)
+        previous = 0
+        for doc_number in doc_numbers:
+            encode_varint(doc_number - previous, out)
+            previous = doc_number
+    return bytes(out), len(postings)
+
+
+def decode_index(data):
+    """build_index の逆変換（動作確認用。アプリ側も同じ手順で読む）"""
+    if data[:4] != MAGIC or data[4] != INDEX_VERSION:
+        raise ValueError("Not a search index of this version")
+    pos = 5
+    length, pos = decode_varint(data, pos)
+    docs = json.loads(data[pos:pos + length].decode('utf-8'))
+    pos += length
+
+    postings = {}
+    term_count, pos = decode_varint(data, pos)
+    for _ in range(term_count):
+        length, pos = decode_varint(data, pos)
+        term = data[pos:pos + length].decode('utf-8')
+        pos += length
+        count, pos = decode_varint(data, pos)
+        doc_numbers = []
+        current = 0
+        for _ in range(count):
+            delta, pos = decode_varint(data, pos)
+            current += delta
+            doc_numbers.append(current)
+        postings[term] = doc_numbers
+    return docs, postings
+
+
+def search(docs, postings, query):
+    """クエリのbigramをすべて含む文書を返す（AND検索）"""
+    grams = bigrams(query)
+    if not grams:
+        return []
+
+    def lookup(gram):
+        if len(gram) == 1:
+            # A one-character query matches every bigram that contains the character
+            return {n for term, numbers in postings.items() if gram in term for n in numbers}
+        return set(postings.get(gram, []))
+
+    matched = None
+    for gram in sorted(grams, key=lambda g: len(postings.get(g, []))):
+        doc_numbers = lookup(gram)
+        matched = doc_numbers if matched is None else matched & doc_numbers
+        if not matched:
+            return []
+    return [docs[n] for n in sorted(matched)]
+
+
+def load_documents(supabase):
+    docs = []
+    texts = []
+    for table, source in SOURCES.items():
+        rows = fetch_all(supabase, table, source['columns'], apply_filters=source['filters'])
+        for row in sorted(rows, key=lambda r: str(r['id'])):
+            docs.append({"t": table, "id": row['id'], "title": row.get('title')})
+            texts.append("\n".join(row.get(field) or "" for field in source['fields']))
+    return docs, texts
+
+
+def load_manifest(supabase):
+    try:
+        return json.loads(supabase.storage.from_(BUCKET).download(MANIFEST_PATH))
+    except Exception:
+        return None
+
+
+def main(dry_run=False, force=False, output=None):
+    # Configuration
+    supabase_url = os.environ.get("SUPABASE_URL", "").strip()
+    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+
+    if not supabase_url or not supabase_key:
+        print("Error: Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY environment variables.")
+        return
+
+    supabase: Client = create_client(supabase_url, supabase_key)
+
+    print("Loading searchable documents...")
+    try:
+        docs, texts = load_documents(supabase)
+    except Exception as e:
+        print(f"Error loading documents: {e}")
+        return
+
+    # Skip the build entirely when no indexed field changed since the published index
+    source_hash = content_hash(*(f"{doc['t']}:{doc['id']}:{text}" for doc, text in zip(docs, texts)))
+    manifest = load_manifest(supabase)
+    if manifest and manifest.get('source_hash') == source_hash and not force:
+        print(f"{len(docs)} documents unchanged since {manifest.get('built_at')}. Nothing to rebuild.")
+        return
+
+    raw, term_count = build_index(docs, texts)
+    data = gzip.compress(raw, compresslevel=9, mtime=0)
+    index_path = f"{INDEX_DIR}/index-{hashlib.sha256(data).hexdigest()[:16]}.bin.gz"
+    print(f"Built index: {len(docs)} documents, {term_count} bigrams, {len(raw)} bytes ({len(data)} gzipped).")
+
+    if output:
+        with open(output, "wb") as f:
+            f.write(data)
+        print(f"Index written to {output}")
+
+    new_manifest = {
+        "version": INDEX_VERSION,
+        "index": index_path,
+        "doc_count": len(docs),
+        "term_count": term_count,
+        "bytes": len(data),
+        "source_hash": source_hash,
+        "built_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+    if dry_run:
+        print(f"[DRY RUN] Would publish {index_path} and {MANIFEST_PATH}")
+        return
+
+    try:
+        upload_object(supabase, BUCKET, index_path, data, "application/gzip", INDEX_CACHE_CONTROL)
+        upload_object(supabase, BUCKET, MANIFEST_PATH, json.dumps(new_manifest).encode('utf-8'),
+                      "application/json", MANIFEST_CACHE_CONTROL)
+        print(f"Published {index_path}.")
+    except Exception as e:
+        print(f"Error uploading index: {e}")
+        return
+
+    # Keep only the newest KEEP_INDEXES index files (clients may still hold an older manifest)
+    try:
+        objects = supabase.storage.from_(BUCKET).list(INDEX_DIR, {"limit": 1000, "sortBy": {"column": "created_at", "order": "desc"}})
+        names = [obj['name'] for obj in objects if obj.get('name', '').startswith('index-')]
+        old = [name for name in names if f"{INDEX_DIR}/{name}" != index_path][KEEP_INDEXES - 1:]
+        if old:
+            supabase.storage.from_(BUCKET).remove([f"{INDEX_DIR}/{name}" for name in old])
+            print(f"Removed {len(old)} old index files.")
+    except Exception as e:
+        print(f"Error removing old index files: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build and publish the client-side article search index.")
+    parser.add_argument("--dry-run", action="store_true", help="Build but do not upload")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the documents are unchanged")
+    parser.add_argument("--output", help="Also write the gzipped index to this local path")
+    args = parser.parse_args()
+    main(dry_run=args.dry_run, force=args.force, output=args.output)
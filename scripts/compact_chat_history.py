@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Compact Chat History - Anytime Curator の古い会話をセッションごとの要約に圧縮
+直近のターンだけを生のまま残し、それより古いメッセージは安価なモデルで要約して archived にする
+前回の実行以降に更新されたセッション（ウォーターマーク）だけを処理する
+"""
+import os
+import json
+import datetime
+from pathlib import Path
+from dotenv import load_dotenv
+import google.generativeai as genai
+from supabase import create_client, Client
+from batch_utils import chunked, fetch_all
+from model_router import get_model, print_usage_report
+from records import strip_code_fence
+
+# Load .env from project root
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(env_path)
+
+JOB_NAME = 'compact_chat_history'
+
+REPLAY_WINDOW_MESSAGES = 40     # キュレーターが再送する直近20ターン（user + model）
+KEEP_RECENT_MESSAGES = 12       # 生のまま残すのは直近6ターン。再送範囲のそれより古い部分は要約に置き換わる
+MIN_MESSAGES_TO_COMPACT = 10    # これ未満しか古いメッセージがなければ要約しない
+SESSIONS_PER_PROMPT = 8
+MAX_CHARS_PER_PROMPT = 40000
+CHARS_PER_TOKEN = 1.5           # 日本語混じりの文章の概算
+
+
+def estimate_tokens(text):
+    return int(len(text or "") / CHARS_PER_TOKEN)
+
+
+def load_watermark(supabase):
+    result = supabase.table('job_watermarks').select('watermark').eq('job', JOB_NAME).execute()
+    return result.data[0]['watermark'] if result.data else None
+
+
+def save_watermark(supabase, watermark):
+    supabase.table('job_watermarks').upsert({
+        'job': JOB_NAME,
+        'watermark': watermark,
+        'updated_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }, on_conflict='job').execute()
+
+
+def build_prompt(batch):
+    sections = []
+    for item in batch:
+        lines = [f"{m['role']}: {m['content']}" for m in item['messages']]
+        previous = f"これまでの要約: {item['summary']}\n" if item.get('summary') else ""
+        sections.append(f"### session_id: {item['id']}\n{previous}" + "\n".join(lines))
+
+    return f"""
+    以下は美術館ガイドAIとユーザーの複数の会話セッションの古い部分です。
+    セッションごとに、今後の会話に必要な情報（ユーザーの関心、話題にした作品・作家・展覧会、
+    ユーザーが伝えた好みや事実）だけを残した要約を300文字以内で作成してください。
+    「これまでの要約」がある場合はそれも含めて1つの要約に統合してください。
+
+    以下のJSON形式で出力してください。JSON以外の余計なテキストは含めないでください。
+    {{"<session_id>": "要約", ...}}
+
+    {chr(10).join(sections)}
+    """
+
+
+def summarize_batch(model, batch):
+    response = model.generate_content(build_prompt(batch))
+    return json.loads(strip_code_fence(response.text))
+
+
+def pack_batches(items):
+    """1プロンプトあたりのセッション数と文字数に収まるようにまとめる"""
+    batches = []
+    current = []
+    size = 0
+    for item in items:
+        item_size = sum(len(m['content'] or "") for m in item['messages'])
+        if current and (len(current) >= SESSIONS_PER_PROMPT or size + item_size > MAX_CHARS_PER_PROMPT):
+            batches.append(current)
+            current = []
+            size = 0
+        current.append(item)
+        size += item_size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def main(dry_run=False):
+    # Configuration
+    gemini_api_key = os.environ.get("GEMINI_API_KEY", "").strip()
+    supabase_url = os.environ.get("SUPABASE_URL", "").strip()
+    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+
+    if not gemini_api_key or not supabase_url or not supabase_key:
+        print("Error: Missing environment variables.")
+        return
+
+    genai.configure(api_key=gemini_api_key)
+    supabase: Client = create_client(supabase_url, supabase_key)
+
+    # 1. Sessions updated since the last run
+    try:
+        watermark = load_watermark(supabase)
+        sessions = fetch_all(
+            supabase, 'chat_sessions', 'id, summary, last_updated', order='last_updated',
+            apply_filters=(lambda q: q.gt('last_updated', watermark)) if watermark else None,
+        )
+    except Exception as e:
+        print(f"Error fetching sessions: {e}")
+        return
+
+    print(f"Found {len(sessions)} sessions updated since {watermark or 'the beginning'}.")
+    if not sessions:
+        return
+
+    # 2. Load active messages and pick the turns older than the replay window
+    items = []
+    for session_batch in chunked(sessions, 50):
+        ids = [s['id'] for s in session_batch]
+        try:
+            messages = fetch_all(
+                supabase, 'chat_messages', 'id, session_id, role, content, created_at',
+                apply_filters=lambda q: q.in_('session_id', ids).eq('archived', False),
+            )
+        except Exception as e:
+            print(f"Error fetching messages: {e}")
+            return
+
+        by_session = {}
+        for message in messages:
+            by_session.setdefault(message['session_id'], []).append(message)
+
+        for session in session_batch:
+            history = sorted(by_session.get(session['id'], []), key=lambda m: m['created_at'])
+            old = history[:-KEEP_RECENT_MESSAGES]
+            if len(old) >= MIN_MESSAGES_TO_COMPACT:
+                # Of the archived turns, only those inside the replay window were being re-sent
+                replayed = history[-REPLAY_WINDOW_MESSAGES:-KEEP_RECENT_MESSAGES]
+                items.append({
+                    'id': session['id'],
+                    'summary': session.get('summary'),
+                    'messages': old,
+                    'replayed_tokens': sum(estimate_tokens(m['content']) for m in replayed),
+                })
+
+    print(f"{len(items)} sessions have enough old turns to compact.")
+
+    # 3. Summarize several sessions per prompt with a cheap model
+    # Short summaries go to the cheap model (see model_router.TASK_MODELS)
+    model = get_model('summary')
+    compacted_ids = set()
+    archived_tokens = 0    # raw history moved out of the active table
+    replayed_tokens = 0    # replayed turns and previous summaries that the new summaries replace
+    summary_tokens = 0
+    prompt_calls = 0
+
+    for batch in pack_batches(items):
+        if dry_run:
+            prompt_calls += 1
+            for item in batch:
+                archived_tokens += sum(estimate_tokens(m['content']) for m in item['messages'])
+                replayed_tokens += item['replayed_tokens'] + estimate_tokens(item.get('summary'))
+            continue
+
+        try:
+            summaries = summarize_batch(model, batch)
+            prompt_calls += 1
+        except Exception as e:
+            print(f"Error summarizing batch: {e}")
+            continue
+
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        for item in batch:
+            summary = summaries.get(item['id'])
+            if not summary:
+                print(f"  - No summary returned for session {item['id']}")
+                continue
+            try:
+                supabase.table('chat_sessions').update({
+                    'summary': summary,
+                    'summary_updated_at': now,
+                }).eq('id', item['id']).execute()
+                for ids in chunked([m['id'] for m in item['messages']], 100):
+                    supabase.table('chat_messages').update({'archived': True}).in_('id', ids).execute()
+            except Exception as e:
+                print(f"  - Error saving session {item['id']}: {e}")
+                continue
+
+            compacted_ids.add(item['id'])
+            archived_tokens += sum(estimate_tokens(m['content']) for m in item['messages'])
+            replayed_tokens += item['replayed_tokens'] + estimate_tokens(item.get('summary'))
+            summary_tokens += estimate_tokens(summary)
+
+    # 4. Advance the watermark up to the first session that could not be compacted
+    failed_ids = {item['id'] for item in items} - compacted_ids
+    new_watermark = None
+    for session in sessions:
+        if session['id'] in failed_ids:
+            break
+        new_watermark = session['last_updated']
+
+    if dry_run:
+        print(f"\n[DRY RUN] Would compact {len(items)} sessions with {prompt_calls} prompts, "
+              f"archiving ~{archived_tokens} tokens of history (~{replayed_tokens} of them replayed today).")
+        return
+
+    if new_watermark:
+        try:
+            save_watermark(supabase, new_watermark)
+        except Exception as e:
+            print(f"Error saving watermark: {e}")
+
+    print(f"\nCompacted {len(compacted_ids)} sessions with {prompt_calls} prompts.")
+    print(f"Archived ~{archived_tokens} tokens of raw history.")
+    print(f"Replay context: ~{replayed_tokens} replayed tokens replaced by ~{summary_tokens} summary tokens "
+          f"(~{replayed_tokens - summary_tokens} tokens saved per replay, summed over the compacted sessions).")
+    print_usage_report()
+
+
+if __name__ == "__main__":
+    import sys
+    dry_run = "--dry-run" in sys.argv
+    main(dry_run=dry_run)
@@ -1,13 +1,188 @@
 import os
-import json
+import re
+import time
 import datetime
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from archive_events import archive_expired_events
+from batch_utils import chunked
+from prefectures import REGION_SHARDS, prefecture_list_text
+from records import Event, parse_records
+from model_router import get_model, print_usage_report
+from prompt_cache import MIN_CALLS_FOR_CACHE
+from job_lease import LeaseLostError, acquire_job_lease
+from venue_index import VenueIndex, normalize_venue_name
 
 load_dotenv()
 
-def main():
+# Sharded crawl settings
+SHARD_MAX_WORKERS = 4
+SHARD_MIN_INTERVAL_SECONDS = 1.0  # Minimum gap between Gemini request starts
+
+class RateLimiter:
+    """Spaces out request starts across threads by a minimum interval."""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at)
+            self._next_at = start_at + self.min_interval
+        if start_at > now:
+            time.sleep(start_at - now)
+
+def build_instructions():
+    """Fixed part of the prompt (role and format), identical across shards and days so it can be cached."""
+    return f"""
+    あなたは日本国内の美術展の情報を集めるリサーチャーです。
+    依頼で指定された日付の時点で開催中または開催予定の主要な美術展を、依頼された地域と件数でピックアップし、以下のJSON形式で出力してください。
+    終了日がその日付以降のものに限ります。
+    JSON以外の余計なテキストは含めないでください。
+
+    JSON形式:
+    [
+      {{
+        "title": "展覧会名",
+        "venue": "会場名",
+        "prefecture_code": "会場の都道府県コード（2桁、例: 13）",
+        "start_date": "YYYY-MM-DD",
+        "end_date": "YYYY-MM-DD",
+        "description_json": "{{\\"summary\\": \\"展覧会の概要（100文字程度）\\"}}"
+      }}
+    ]
+    """
+
+def build_request(area_text, count, today_str, prefecture_codes=None):
+    prefecture_text = ""
+    if prefecture_codes:
+        prefecture_text = f"\n対象の都道府県（コード:名前）: {prefecture_list_text(prefecture_codes)}"
+
+    return f"{today_str}時点で、日本国内（{area_text}）の美術展を{count}件ピックアップしてください。{prefecture_text}"
+
+def fetch_events(model, prompt):
+    response = model.generate_content(prompt)
+    return parse_records(Event, response.text)
+
+def crawl_sharded(model, shards, today_str, max_workers=SHARD_MAX_WORKERS, min_interval=SHARD_MIN_INTERVAL_SECONDS):
+    """Run one prompt per region shard concurrently and return all events."""
+    limiter = RateLimiter(min_interval)
+
+    def run_shard(shard):
+        limiter.wait()
+        started = time.monotonic()
+        prompt = build_request(shard['label'], shard['count'], today_str, shard['codes'])
+        try:
+            events = fetch_events(model, prompt)
+        except Exception as e:
+            print(f"  [{shard['key']}] Error fetching/parsing from Gemini: {e}")
+            return []
+        for event in events:
+            if event.prefecture_code not in shard['codes']:
+                event.prefecture_code = None
+        print(f"  [{shard['key']}] Got {len(events)} events in {time.monotonic() - started:.1f}s.")
+        return events
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(run_shard, shards))
+
+    return [event for events in results for event in events]
+
+def normalize_title(title):
+    text = unicodedata.normalize("NFKC", title or "")
+    return re.sub(r"[\s「」『』\"'・:：]+", "", text).lower()
+
+def dedup_events(events):
+    """Drop events that several shards returned, keyed on (normalized title, venue)."""
+    unique = {}
+    for event in events:
+        key = (normalize_title(event.title), normalize_venue_name(event.venue))
+        if key[0] and key not in unique:
+            unique[key] = event
+    return list(unique.values())
+
+def event_key(title, venue_id, venue_name):
+    """Match events on title plus the resolved venue, so rows stored under a raw venue notation still match."""
+    return (title, venue_id or normalize_venue_name(venue_name))
+
+def write_events(supabase, rows, action):
+    """Write rows in one request; if the batch is rejected, retry row by row so one bad row does not drop the rest."""
+    def send(batch):
+        if action == 'update':
+            supabase.table('events').upsert(batch, on_conflict='id').execute()
+        else:
+            supabase.table('events').insert(batch).execute()
+
+    try:
+        send(rows)
+        return len(rows)
+    except Exception as e:
+        print(f"Batch {action} of {len(rows)} events failed ({e}). Retrying one by one...")
+
+    written = 0
+    for row in rows:
+        try:
+            send([row])
+            written += 1
+        except Exception as e:
+            print(f"Error writing event {row['title']}: {e}")
+    return written
+
+def upsert_events(supabase, events, venue_index, lease):
+    """Resolve venues in memory, then write all events with one update batch and one insert batch.
+
+    lease.check() runs before every write, so a run that lost its lease stops instead of racing the new holder.
+    """
+    rows = []
+    for event in events:
+        lease.check()
+        try:
+            # --- Venue Handling ---
+            venue_id = venue_index.get_or_create(supabase, event.venue)
+            # Store the canonical name so title+venue matching survives notation variants
+            venue_name = venue_index.canonical_name(venue_id) or event.venue
+
+            rows.append(event.to_row(venue_name, venue_id))
+        except Exception as e:
+            print(f"Error preparing event {event.title}: {e}")
+
+    # --- Event Handling ---
+    # We want to upsert based on title and venue to avoid duplicates.
+    existing_ids = {}
+    titles = sorted({row['title'] for row in rows})
+    for batch in chunked(titles, 100):
+        existing = supabase.table('events').select('id, title, venue, venue_id').in_('title', batch).execute()
+        for item in existing.data:
+            # Older rows were stored under the raw venue name; resolve them the same way as the new rows
+            venue_id = item.get('venue_id') or venue_index.lookup(item['venue'])
+            existing_ids.setdefault(event_key(item['title'], venue_id, item['venue']), item['id'])
+
+    updates = []
+    inserts = []
+    for row in rows:
+        event_id = existing_ids.get(event_key(row['title'], row['venue_id'], row['venue']))
+        if event_id:
+            updates.append({"id": event_id, **row})
+        else:
+            inserts.append(row)
+
+    if updates:
+        lease.check()
+        print(f"Updating {len(updates)} events...")
+        write_events(supabase, updates, 'update')
+    if inserts:
+        lease.check()
+        print(f"Inserting {len(inserts)} events...")
+        write_events(supabase, inserts, 'insert')
+
+def main(sharded=False, shard_keys=None, max_workers=SHARD_MAX_WORKERS):
     # 1. Configuration
     gemini_api_key = os.environ.get("GEMINI_API_KEY")
     supabase_url = os.environ.get("SUPABASE_URL")
@@ -25,101 +200,83 @@ def main():
     genai.configure(api_key=gemini_api_key)
     supabase: Client = create_client(supabase_url, supabase_key)
 
+    # Skip (or wait) if another run is already generating events
+    lease = acquire_job_lease(supabase, 'events')
+    if not lease:
+        return
+
     # 2. Prompt Gemini
-    model = genai.GenerativeModel('gemini-2.5-flash')
     today_str = datetime.date.today().isoformat()
-    prompt = f"""
-    現在（{today_str}時点）、日本国内（東京・大阪中心）で開催中または開催予定の主要な美術展を20件ピックアップし、以下のJSON形式で出力してください。
-    終了日が {today_str} 以降のものに限ります。
-    JSON以外の余計なテキストは含めないでください。
 
-    JSON形式:
-    [
-      {{
-        "title": "展覧会名",
-        "venue": "会場名",
-        "start_date": "YYYY-MM-DD",
-        "end_date": "YYYY-MM-DD",
-        "description_json": "{{\\"summary\\": \\"展覧会の概要（100文字程度）\\"}}"
-      }}
-    ]
-    """
+    if sharded:
+        shards = [s for s in REGION_SHARDS if not shard_keys or s['key'] in shard_keys]
+        print(f"Fetching events from Gemini in {len(shards)} shards (max {max_workers} concurrent)...")
+        started = time.monotonic()
+        # Every shard shares the same instructions, so cache them once for the whole crawl
+        model = get_model('listing', build_instructions(), 'daily_crawler' if len(shards) >= MIN_CALLS_FOR_CACHE else None)
+        events = crawl_sharded(model, shards, today_str, max_workers=max_workers)
+        total = len(events)
+        events = dedup_events(events)
+        print(f"Got {total} events, {len(events)} after cross-shard dedup ({time.monotonic() - started:.1f}s).")
+        if not events:
+            return
+    else:
+        print("Fetching events from Gemini...")
+        try:
+            model = get_model('listing', build_instructions())
+            events = dedup_events(fetch_events(model, build_request("東京・大阪中心", 20, today_str)))
+            print(f"Got {len(events)} events.")
+        except Exception as e:
+            print(f"Error fetching/parsing from Gemini: {e}")
+            return
 
-    print("Fetching events from Gemini...")
+    # 3. Archive Past Events
+    print("Archiving past events...")
     try:
-        response = model.generate_content(prompt)
-        text = response.text
-        # Clean up markdown code blocks if present
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0]
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0]
-        
-        events = json.loads(text.strip())
-        print(f"Got {len(events)} events.")
+        lease.check()
+        # Move events where end_date is before today into events_archive in bounded batches
+        moved, batches, elapsed = archive_expired_events(supabase)
+        print(f"Archived {moved} past events in {batches} batches ({elapsed:.2f}s).")
+    except LeaseLostError as e:
+        print(f"Error: {e}")
+        return
     except Exception as e:
-        print(f"Error fetching/parsing from Gemini: {e}")
+        print(f"Error archiving events: {e}")
+
+    # 4. Upsert to Supabase
+    # Resolve venues against an in-memory index instead of one query per event
+    try:
+        venue_index = VenueIndex.load(supabase)
+    except Exception as e:
+        print(f"Error loading venue index: {e}")
         return
 
-    # 3. Cleanup Past Events
-    print("Cleaning up past events...")
     try:
-        today_str = datetime.date.today().isoformat()
-        # Delete events where end_date is before today
-        supabase.table('events').delete().lt('end_date', today_str).execute()
-        print("Deleted past events.")
+        upsert_events(supabase, events, venue_index, lease)
+    except LeaseLostError as e:
+        print(f"Error: {e}")
+        return
     except Exception as e:
-        print(f"Error cleaning up events: {e}")
+        print(f"Error upserting events: {e}")
 
-    # 4. Upsert to Supabase
-    for event in events:
-        try:
-            # --- Venue Handling ---
-            venue_name = event['venue']
-            venue_id = None
-            
-            # Check if venue exists
-            existing_venue = supabase.table('venues').select('id').eq('name', venue_name).execute()
-            
-            if existing_venue.data and len(existing_venue.data) > 0:
-                venue_id = existing_venue.data[0]['id']
-                print(f"Found existing venue: {venue_name} ({venue_id})")
-            else:
-                # Insert new venue
-                print(f"Inserting new venue: {venue_name}")
-                new_venue = supabase.table('venues').insert({
-                    'name': venue_name,
-                    # 'address': ... # Gemini prompt doesn't ask for address yet, could add later
-                }).execute()
-                if new_venue.data:
-                    venue_id = new_venue.data[0]['id']
-            
-            # --- Event Handling ---
-            # We want to upsert based on title and venue to avoid duplicates.
-            
-            existing_event = supabase.table('events').select('id').eq('title', event['title']).eq('venue', event['venue']).execute()
-            
-            data = {
-                "title": event['title'],
-                "venue": event['venue'],
-                "venue_id": venue_id, # Link to venue
-                "start_date": event['start_date'],
-                "end_date": event['end_date'],
-                "description_json": json.loads(event['description_json']) if isinstance(event['description_json'], str) else event['description_json'],
-            }
-
-            if existing_event.data and len(existing_event.data) > 0:
-                # Update
-                event_id = existing_event.data[0]['id']
-                print(f"Updating event: {event['title']} ({event['start_date']} ~ {event['end_date']})")
-                supabase.table('events').update(data).eq('id', event_id).execute()
-            else:
-                # Insert
-                print(f"Inserting event: {event['title']} ({event['start_date']} ~ {event['end_date']})")
-                supabase.table('events').insert(data).execute()
-                
-        except Exception as e:
-            print(f"Error upserting event {event.get('title')}: {e}")
+    try:
+        lease.check()
+    except LeaseLostError as e:
+        print(f"Error: {e}")
+        return
+    venue_index.save_new_aliases(supabase)
+    venue_index.print_report()
+    print_usage_report()
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Crawl upcoming art exhibitions into the events table.")
+    parser.add_argument("--sharded", action="store_true", help="Crawl nationwide, one prompt per region shard")
+    parser.add_argument("--shards", help="Comma-separated shard keys to run (default: all)")
+    parser.add_argument("--max-workers", type=int, default=SHARD_MAX_WORKERS, help="Concurrent shard prompts")
+    args = parser.parse_args()
+    main(
+        sharded=args.sharded,
+        shard_keys=args.shards.split(",") if args.shards else None,
+        max_workers=args.max_workers,
+    )
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Embed Content - daily_columns / trending_articles / events の本文をベクトル化して content_embeddings に格納
+前回から内容（ハッシュ）が変わった行だけを埋め込むため、変更がなければAPI呼び出しは0回
+"""
+import os
+import json
+from pathlib import Path
+from dotenv import load_dotenv
+import google.generativeai as genai
+from supabase import create_client, Client
+from batch_utils import chunked, content_hash, fetch_all
+
+# Load .env from project root
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(env_path)
+
+EMBEDDING_MODEL = "models/text-embedding-004"  # 768次元
+EMBED_BATCH_SIZE = 100  # batchEmbedContents の1リクエストあたり上限
+UPSERT_BATCH_SIZE = 100
+
+
+def _event_text(row):
+    description = row.get('description_json') or {}
+    if isinstance(description, str):
+        try:
+            description = json.loads(description)
+        except ValueError:
+            pass  # malformed JSON: embed the raw string instead of aborting the job
+    if isinstance(description, dict):
+        description = description.get('summary') or json.dumps(description, ensure_ascii=False, sort_keys=True)
+    elif not isinstance(description, str):
+        description = json.dumps(description, ensure_ascii=False)
+    return "\n".join(filter(None, [row.get('title'), row.get('venue'), description]))
+
+
+# 埋め込み対象のテーブルと、埋め込むテキストの組み立て方
+SOURCES = {
+    'daily_columns': {
+        'columns': 'id, title, artist, content',
+        'text': lambda row: "\n".join(filter(None, [row.get('title'), row.get('artist'), row.get('content')])),
+    },
+    'trending_articles': {
+        'columns': 'id, title, summary, content',
+        'text': lambda row: "\n".join(filter(None, [row.get('title'), row.get('summary'), row.get('content')])),
+    },
+    'events': {
+        'columns': 'id, title, venue, description_json',
+        'text': _event_text,
+    },
+}
+
+
+def embed_texts(texts):
+    """batchEmbedContents でまとめてベクトル化する"""
+    result = genai.embed_content(model=EMBEDDING_MODEL, content=texts, task_type="retrieval_document")
+    return result['embedding']
+
+
+def main(tables=None, dry_run=False):
+    # Configuration
+    gemini_api_key = os.environ.get("GEMINI_API_KEY", "").strip()
+    supabase_url = os.environ.get("SUPABASE_URL", "").strip()
+    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+
+    if not gemini_api_key or not supabase_url or not supabase_key:
+        print("Error: Missing environment variables.")
+        return
+
+    genai.configure(api_key=gemini_api_key)
+    supabase: Client = create_client(supabase_url, supabase_key)
+
+    # Fetch the hashes of what is already embedded (one paged query)
+    try:
+        existing = fetch_all(supabase, 'content_embeddings', 'source_table, source_id, content_hash', order='source_id')
+    except Exception as e:
+        print(f"Error fetching existing embeddings: {e}")
+        return
+    existing_hashes = {(row['source_table'], row['source_id']): row['content_hash'] for row in existing}
+    print(f"Found {len(existing_hashes)} existing embeddings.")
+
+    api_calls = 0
+    embedded = 0
+    for table, source in SOURCES.items():
+        if tables and table not in tables:
+            continue
+
+        try:
+            rows = fetch_all(supabase, table, source['columns'])
+        except Exception as e:
+            print(f"[{table}] Error fetching rows: {e}")
+            continue
+
+        # Only rows whose content changed since the last run
+        pending = []
+        for row in rows:
+            text = source['text'](row).strip()
+            if not text:
+                continue
+            digest = content_hash(EMBEDDING_MODEL, text)
+            if existing_hashes.get((table, row['id'])) != digest:
+                pending.append((row['id'], text, digest))
+
+        live_ids = {row['id'] for row in rows}
+        stale_ids = [source_id for (t, source_id) in existing_hashes if t == table and source_id not in live_ids]
+
+        print(f"[{table}] {len(rows)} rows, {len(pending)} to embed, {len(stale_ids)} stale embeddings.")
+
+        if dry_run:
+            api_calls += -(-len(pending) // EMBED_BATCH_SIZE)
+            continue
+
+        for batch in chunked(pending, EMBED_BATCH_SIZE):
+            try:
+                vectors = embed_texts([text for _, text, _ in batch])
+                api_calls += 1
+            except Exception as e:
+                print(f"[{table}] Error embedding batch: {e}")
+                continue
+
+            upserts = [
+                {
+                    'source_table': table,
+                    'source_id': source_id,
+                    'content_hash': digest,
+                    'model': EMBEDDING_MODEL,
+                    'embedding': vector,
+                }
+                for (source_id, _, digest), vector in zip(batch, vectors)
+            ]
+            for rows_to_write in chunked(upserts, UPSERT_BATCH_SIZE):
+                try:
+                    supabase.table('content_embeddings').upsert(rows_to_write, on_conflict='source_table,source_id').execute()
+                    embedded += len(rows_to_write)
+                except Exception as e:
+                    print(f"[{table}] Error upserting embeddings: {e}")
+
+        # Drop embeddings whose source row has been deleted
+        for ids in chunked(stale_ids, 100):
+            try:
+                supabase.table('content_embeddings').delete().eq('source_table', table).in_('source_id', ids).execute()
+            except Exception as e:
+                print(f"[{table}] Error deleting stale embeddings: {e}")
+
+    if dry_run:
+        print(f"\n[DRY RUN] Would make {api_calls} embedding API calls.")
+    else:
+        print(f"\nEmbedded {embedded} rows with {api_calls} embedding API calls.")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Incrementally embed content into content_embeddings.")
+    parser.add_argument("--tables", help=f"Comma-separated tables to embed (default: {','.join(SOURCES)})")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be embedded")
+    args = parser.parse_args()
+    main(tables=args.tables.split(",") if args.tables else None, dry_run=args.dry_run)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Export Tables - コンテンツ系テーブルをキーセット方式でページングしながら NDJSON / Parquet に書き出す
+1ページずつ書き出すのでメモリ使用量はテーブルの大きさによらず一定
+出力先の _watermarks.json に created_at の最大値を記録し、--incremental で前回以降の行だけを書き出す
+
+Parquet を使う場合の追加の依存: pip install pyarrow
+"""
+import os
+import json
+import gzip
+import datetime
+from pathlib import Path
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Load .env from project root
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(env_path)
+
+TABLES = ['events', 'venues', 'trending_articles', 'daily_columns', 'venue_maps']
+PAGE_SIZE = 1000
+WATERMARK_FILE = '_watermarks.json'
+
+
+def fetch_pages(supabase, table, since=None, page_size=PAGE_SIZE):
+    """キーセット方式で1ページずつ返す。since がなければ id 順、あれば (created_at, id) 順"""
+    last = None
+    while True:
+        query = supabase.table(table).select('*')
+        if since is None:
+            query = query.order('id')
+            if last:
+                query = query.gt('id', last['id'])
+        else:
+            query = query.order('created_at').order('id')
+            if last:
+                created_at = last['created_at']
+                query = query.or_(f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt.{last["id"]})')
+            else:
+                query = query.gt('created_at', since)
+
+        page = query.limit(page_size).execute().data
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+
+class NdjsonWriter:
+    def __init__(self, path, compress=False):
+        self.path = path
+        self._file = gzip.open(path, 'wt', encoding='utf-8') if compress else open(path, 'w', encoding='utf-8')
+
+    def write(self, rows):
+        for row in rows:
+            self._file.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+def _arrow_type(values):
+    """最初のページの値から列の型を決める（JSON・日付・UUIDなどは文字列）
+
+    数値は後のページで小数が出てきても書けるよう、整数でも float64 にする。
+    最初のページがすべて NULL の列は文字列にする（後の値は JSON 文字列として書く）。
+    """
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            return pa.bool_()
+        if isinstance(value, (int, float)):
+            return pa.float64()
+        return pa.string()
+    return pa.string()
+
+
+def _to_column(values, arrow_type):
+    if arrow_type == pa.string():
+        return [v if v is None or isinstance(v, str) else json.dumps(v, ensure_ascii=False) for v in values]
+    if arrow_type == pa.float64():
+        return [None if v is None else float(v) for v in values]
+    return values
+
+
+class ParquetWriter:
+    """最初のページでスキーマを決め、以降のページは row group として追記する"""
+
+    def __init__(self, path):
+        if pq is None:
+            raise RuntimeError("pyarrow is not installed. Run: pip install pyarrow")
+        self.path = path
+        self._writer = None
+        self._schema = None
+
+    def write(self, rows):
+        if self._schema is None:
+            columns = list(rows[0].keys())
+            self._schema = pa.schema([(name, _arrow_type(row.get(name) for row in rows)) for name in columns])
+            self._writer = pq.ParquetWriter(self.path, self._schema, compression='zstd')
+        arrays = {
+            field.name: _to_column([row.get(field.name) for row in rows], field.type)
+            for field in self._schema
+        }
+        self._writer.write_table(pa.table(arrays, schema=self._schema))
+
+    def close(self):
+        if self._writer:
+            self._writer.close()
+
+
+def load_watermarks(output_dir):
+    path = output_dir / WATERMARK_FILE
+    if path.exists():
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_watermarks(output_dir, watermarks):
+    path = output_dir / WATERMARK_FILE
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def export_table(supabase, table, output_dir, fmt, since=None):
+    """1テーブルを書き出して (行数, ファイルパス, created_at の最大値) を返す"""
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    table_dir = output_dir / table
+    table_dir.mkdir(parents=True, exist_ok=True)
+    suffix = {'ndjson': '.ndjson', 'ndjson.gz': '.ndjson.gz', 'parquet': '.parquet'}[fmt]
+    path = table_dir / f"{table}-{stamp}{'-since' if since else ''}{suffix}"
+
+    writer = ParquetWriter(path) if fmt == 'parquet' else NdjsonWriter(path, compress=fmt == 'ndjson.gz')
+    count = 0
+    max_created_at = since
+    try:
+        for page in fetch_pages(supabase, table, since=since):
+            writer.write(page)
+            count += len(page)
+            for row in page:
+                created_at = row.get('created_at')
+                if created_at and (max_created_at is None or created_at > max_created_at):
+                    max_created_at = created_at
+    finally:
+        writer.close()
+
+    if count == 0:
+        path.unlink(missing_ok=True)
+        return 0, None, max_created_at
+    return count, path, max_created_at
+
+
+def main(tables=None, output='exports', fmt='ndjson.gz', incremental=False, since=None):
+    # Configuration
+    supabase_url = os.environ.get("SUPABASE_URL", "").strip()
+    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+
+    if not supabase_url or not supabase_key:
+        print("Error: Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY environment variables.")
+        return
+
+    if fmt == 'parquet' and pq is None:
+        print("Error: pyarrow is not installed. Run: pip install pyarrow")
+        return
+
+    supabase: Client = create_client(supabase_url, supabase_key)
+    output_dir = Path(output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    watermarks = load_watermarks(output_dir)
+
+    for table in tables or TABLES:
+        table_since = since or (watermarks.get(table) if incremental else None)
+        print(f"[{table}] Exporting {'rows created after ' + table_since if table_since else 'all rows'}...")
+        try:
+            count, path, max_created_at = export_table(supabase, table, output_dir, fmt, since=table_since)
+        except Exception as e:
+            print(f"[{table}] Error exporting: {e}")
+            continue
+
+        print(f"[{table}] {count} rows" + (f" -> {path}" if path else ""))
+        if max_created_at:
+            watermarks[table] = max_created_at
+            save_watermarks(output_dir, watermarks)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Stream content tables to NDJSON or Parquet files.")
+    parser.add_argument("--tables", help=f"Comma-separated tables (default: {','.join(TABLES)})")
+    parser.add_argument("--output", default="exports", help="Output directory (default: exports)")
+    parser.add_argument("--format", choices=['ndjson', 'ndjson.gz', 'parquet'], default='ndjson.gz', help="Output format")
+    parser.add_argument("--incremental", action="store_true", help="Only rows created after the saved watermark")
+    parser.add_argument("--since", help="Only rows created after this ISO timestamp (overrides the watermark)")
+    args = parser.parse_args()
+    main(
+        tables=args.tables.split(",") if args.tables else None,
+        output=args.output,
+        fmt=args.format,
+        incremental=args.incremental,
+        since=args.since,
+    )
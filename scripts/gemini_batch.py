@@ -0,0 +1,201 @@
+"""
+Gemini Batch - レイテンシを問わない大量生成を Gemini の Batch API（非同期バッチ予測）で実行する
+プロンプトをJSONLのジョブファイルに書き出して投入し、完了までポーリングして結果を (key, text) で返す
+GEMINI_BATCH_BACKEND=local でローカルの代替実装に切り替えられる（テスト・動作確認用）
+"""
+import os
+import json
+import time
+import datetime
+import urllib.request
+from pathlib import Path
+from prompt_cache import ensure_cache
+
+BATCH_DIR = Path(os.environ.get("GEMINI_BATCH_DIR", Path(__file__).parent.parent / ".gemini_batch"))
+API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+DOWNLOAD_BASE = "https://generativelanguage.googleapis.com/download/v1beta"
+
+POLL_INTERVAL_SECONDS = 30
+POLL_TIMEOUT_SECONDS = 24 * 3600  # Batch API の処理目標は24時間以内
+BATCH_CACHE_TTL = datetime.timedelta(seconds=POLL_TIMEOUT_SECONDS)  # 処理中にキャッシュが切れないように
+
+SUCCEEDED_STATES = {"BATCH_STATE_SUCCEEDED", "JOB_STATE_SUCCEEDED", "SUCCEEDED"}
+FAILED_STATES = {
+    "BATCH_STATE_FAILED", "BATCH_STATE_CANCELLED", "BATCH_STATE_EXPIRED",
+    "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED", "FAILED",
+}
+
+
+def write_job_file(job_name, prompts, instructions=None, cached_content=None):
+    """{key: prompt} をバッチ入力のJSONLとして書き出す
+
+    固定部分は cached_content（キャッシュ名）か instructions（systemInstruction）で全リクエストに共通で付ける。
+    """
+    BATCH_DIR.mkdir(parents=True, exist_ok=True)
+    path = BATCH_DIR / f"{job_name}.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for key, prompt in prompts.items():
+            request = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+            if cached_content:
+                request["cachedContent"] = cached_content
+            elif instructions:
+                request["systemInstruction"] = {"parts": [{"text": instructions}]}
+            f.write(json.dumps({"key": key, "request": request}, ensure_ascii=False) + "\n")
+    return path
+
+
+def read_job_file(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _response_text(response):
+    """GenerateContentResponse(JSON) から本文テキストを取り出す"""
+    candidates = (response or {}).get("candidates") or []
+    if not candidates:
+        return None
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts) or None
+
+
+class GeminiBatchBackend:
+    """Gemini API の batchGenerateContent（インラインリクエスト）を使う実装"""
+
+    def __init__(self, api_key, model):
+        self.api_key = api_key
+        self.model = model
+
+    def _request(self, url, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(url, data=data, method="POST" if data else "GET", headers={
+            "Content-Type": "application/json",
+            "x-goog-api-key": self.api_key,
+        })
+        with urllib.request.urlopen(req) as response:
+            return response.read()
+
+    def submit(self, job_path):
+        entries = read_job_file(job_path)
+        body = {
+            "batch": {
+                "display_name": Path(job_path).stem,
+                "input_config": {
+                    "requests": {
+                        "requests": [
+                            {"request": entry["request"], "metadata": {"key": entry["key"]}}
+                            for entry in entries
+                        ]
+                    }
+                },
+            }
+        }
+        operation = json.loads(self._request(f"{API_BASE}/models/{self.model}:batchGenerateContent", body))
+        return operation["name"]
+
+    def _get(self, job_id):
+        return json.loads(self._request(f"{API_BASE}/{job_id}"))
+
+    def state(self, job_id):
+        operation = self._get(job_id)
+        return operation.get("metadata", {}).get("state") or ("SUCCEEDED" if operation.get("done") else "PENDING")
+
+    def results(self, job_id):
+        operation = self._get(job_id)
+        output = operation.get("response") or operation.get("metadata", {}).get("output") or {}
+
+        if output.get("responsesFile"):
+            raw = self._request(f"{DOWNLOAD_BASE}/{output['responsesFile']}:download?alt=media")
+            for line in raw.decode("utf-8").splitlines():
+                if line.strip():
+                    item = json.loads(line)
+                    yield item.get("key"), _response_text(item.get("response"))
+            return
+
+        inlined = output.get("inlinedResponses") or {}
+        if isinstance(inlined, dict):
+            inlined = inlined.get("inlinedResponses", [])
+        for item in inlined:
+            key = (item.get("metadata") or {}).get("key")
+            if item.get("error"):
+                print(f"  - Batch request {key} failed: {item['error'].get('message')}")
+                yield key, None
+            else:
+                yield key, _response_text(item.get("response"))
+
+
+class LocalBatchBackend:
+    """Batch API の代替。記録済みレスポンス（JSONL: {"key", "text"}）を返すか、生成関数を逐次呼ぶ"""
+
+    def __init__(self, responses_path=None, generate=None):
+        self.responses_path = responses_path
+        self.generate = generate
+
+    def submit(self, job_path):
+        return f"local/{Path(job_path).stem}"
+
+    def state(self, job_id):
+        return "SUCCEEDED"
+
+    def results(self, job_id):
+        entries = read_job_file(BATCH_DIR / f"{job_id.split('/', 1)[1]}.jsonl")
+        if self.responses_path:
+            recorded = {}
+            for item in read_job_file(self.responses_path):
+                recorded[item["key"]] = item["text"]
+            for entry in entries:
+                yield entry["key"], recorded.get(entry["key"])
+            return
+
+        for entry in entries:
+            request = entry["request"]
+            prompt = request["contents"][0]["parts"][0]["text"]
+            if request.get("systemInstruction"):
+                prompt = request["systemInstruction"]["parts"][0]["text"] + "\n" + prompt
+            try:
+                yield entry["key"], self.generate(prompt)
+            except Exception as e:
+                print(f"  - Local batch request {entry['key']} failed: {e}")
+                yield entry["key"], None
+
+
+def get_backend(api_key, model, generate=None):
+    """GEMINI_BATCH_BACKEND=local ならローカル実装、それ以外は Gemini Batch API"""
+    if os.environ.get("GEMINI_BATCH_BACKEND", "").strip() == "local":
+        responses_path = os.environ.get("GEMINI_BATCH_LOCAL_RESPONSES", "").strip() or None
+        print(f"Using local batch backend ({responses_path or 'online generation'}).")
+        return LocalBatchBackend(responses_path=responses_path, generate=generate)
+    return GeminiBatchBackend(api_key, model)
+
+
+def submit_job(backend, job_name, prompts, instructions=None, cache_name=None):
+    """プロンプトをジョブファイルに書き出して投入し、ジョブIDを返す
+
+    instructions は全リクエストに共通の固定部分。cache_name を渡すと Batch API では明示的キャッシュに載せ、
+    ジョブが終わるまで（POLL_TIMEOUT_SECONDS）期限を保つ。
+    """
+    cached_content = None
+    if instructions and cache_name and isinstance(backend, GeminiBatchBackend):
+        cache = ensure_cache(backend.model, instructions, cache_name, ttl=BATCH_CACHE_TTL)
+        cached_content = cache.name if cache else None
+    job_path = write_job_file(job_name, prompts, instructions, cached_content)
+    job_id = backend.submit(job_path)
+    print(f"Submitted batch job {job_id} ({len(prompts)} requests, {job_path}).")
+    return job_id
+
+
+def collect_results(backend, job_id, poll_interval=POLL_INTERVAL_SECONDS, timeout=POLL_TIMEOUT_SECONDS):
+    """ジョブの完了をポーリングで待ち、(key, text) を順に返す。失敗したリクエストの text は None"""
+    started = time.monotonic()
+    while True:
+        state = backend.state(job_id)
+        if state in SUCCEEDED_STATES:
+            break
+        if state in FAILED_STATES:
+            raise RuntimeError(f"Batch job {job_id} ended with {state}")
+        if time.monotonic() - started > timeout:
+            raise TimeoutError(f"Batch job {job_id} did not finish within {timeout}s (state: {state})")
+        print(f"  Batch job {job_id}: {state}. Waiting {poll_interval}s...")
+        time.sleep(poll_interval)
+
+    print(f"Batch job {job_id} finished.")
+    yield from backend.results(job_id)
@@ -0,0 +1,73 @@
+"""
+Geo Utils - PostGIS の GEOGRAPHY(POINT) を扱うためのヘルパー
+"""
+import math
+import struct
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def parse_point(value):
+    """PostgRESTが返す位置情報を (lon, lat) に変換する。解釈できなければNone
+
+    PostGISの列は設定によって EWKB(16進文字列)、WKT("POINT(lon lat)")、
+    GeoJSON({"type": "Point", "coordinates": [lon, lat]}) のいずれかで返る。
+    """
+    if not value:
+        return None
+
+    if isinstance(value, dict):
+        coords = value.get("coordinates")
+        if coords and len(coords) >= 2:
+            return float(coords[0]), float(coords[1])
+        return None
+
+    text = str(value).strip()
+    if "POINT" in text.upper():
+        inner = text[text.index("(") + 1:text.rindex(")")].split()
+        return float(inner[0]), float(inner[1])
+
+    try:
+        data = bytes.fromhex(text)
+        byte_order = "<" if data[0] == 1 else ">"
+        geom_type = struct.unpack(byte_order + "I", data[1:5])[0]
+        offset = 5
+        if geom_type & 0x20000000:  # SRID flag
+            offset += 4
+        if geom_type & 0xFF != 1:  # Point only
+            return None
+        return struct.unpack(byte_order + "dd", data[offset:offset + 16])
+    except (ValueError, IndexError, struct.error):
+        return None
+
+
+def haversine_m(lon1, lat1, lon2, lat2):
+    """2点間の大円距離（メートル）"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def _cell_in_row(lon, row, cell_size_m):
+    cell_lat = cell_size_m / 111320.0
+    row_center_lat = (row + 0.5) * cell_lat
+    cell_lon = cell_size_m / (111320.0 * max(math.cos(math.radians(row_center_lat)), 0.01))
+    return row, int(math.floor(lon / cell_lon))
+
+
+def grid_cell(lon, lat, cell_size_m):
+    """緯度経度を一辺 cell_size_m 程度のグリッドセルに割り当てる"""
+    row = int(math.floor(lat / (cell_size_m / 111320.0)))
+    return _cell_in_row(lon, row, cell_size_m)
+
+
+def neighbor_cells(lon, lat, cell_size_m):
+    """距離 cell_size_m 以内の点が入りうるセル（自セルを含む周囲9セル）"""
+    row, _ = grid_cell(lon, lat, cell_size_m)
+    for r in (row - 1, row, row + 1):
+        _, col = _cell_in_row(lon, r, cell_size_m)
+        for c in (col - 1, col, col + 1):
+            yield r, c
@@ -0,0 +1,115 @@
+"""
+Job Lease - 同じ種類のジョブの同時実行を防ぐリース（job_leases テーブル）
+取得できなければ待つかスキップし、取得後はバックグラウンドのハートビートで期限を延ばす
+プロセスが異常終了してもリースは LEASE_TTL_SECONDS で切れるので、次の実行が取得できる
+書き込みの前に lease.check() を呼び、リースを失っていれば LeaseLostError で中断する
+"""
+import os
+import time
+import uuid
+import atexit
+import socket
+import threading
+
+LEASE_TTL_SECONDS = 600
+HEARTBEAT_SECONDS = 60
+WAIT_POLL_SECONDS = 15
+
+
+class LeaseLostError(RuntimeError):
+    """リースが他の実行に移った（または更新できないまま期限が切れた）"""
+
+
+def _holder_id():
+    run_id = os.environ.get("GITHUB_RUN_ID")
+    base = f"gha-{run_id}" if run_id else socket.gethostname()
+    return f"{base}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class JobLease:
+    def __init__(self, supabase, job, ttl_seconds=LEASE_TTL_SECONDS, heartbeat_seconds=HEARTBEAT_SECONDS):
+        self.supabase = supabase
+        self.job = job
+        self.holder = _holder_id()
+        self.ttl_seconds = ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.lost = False
+        self._renewed_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _call(self, function):
+        params = {'job_name': self.job, 'holder_id': self.holder, 'ttl_seconds': self.ttl_seconds}
+        return bool(self.supabase.rpc(function, params).execute().data)
+
+    def acquire(self, wait_seconds=0):
+        """リースを取得できたら True。wait_seconds の間は空くのを待つ"""
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            if self._call('acquire_job_lease'):
+                self._renewed_at = time.monotonic()
+                self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+                self._thread.start()
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            print(f"Job '{self.job}' is running elsewhere. Waiting {WAIT_POLL_SECONDS}s...")
+            time.sleep(WAIT_POLL_SECONDS)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                if not self._call('renew_job_lease'):
+                    self.lost = True
+                    print(f"WARNING: Lease for job '{self.job}' was lost to another run.")
+                    return
+                self._renewed_at = time.monotonic()
+            except Exception as e:
+                print(f"WARNING: Could not renew lease for job '{self.job}': {e}")
+
+    def check(self):
+        """リースを失っていれば LeaseLostError を送出する（書き込みの直前に呼ぶ）
+
+        更新に失敗し続けて TTL を過ぎた場合も、他の実行が取得できる状態なので失ったとみなす。
+        """
+        if not self.lost and self._renewed_at is not None \
+                and time.monotonic() - self._renewed_at >= self.ttl_seconds:
+            self.lost = True
+        if self.lost:
+            raise LeaseLostError(f"Lease for job '{self.job}' was lost; aborting before writing.")
+
+    def release(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        try:
+            self.supabase.rpc('release_job_lease', {'job_name': self.job, 'holder_id': self.holder}).execute()
+        except Exception as e:
+            print(f"WARNING: Could not release lease for job '{self.job}': {e}")
+
+
+def acquire_job_lease(supabase, job, wait_seconds=None):
+    """リースを取得して返す（プロセス終了時に自動で解放）。取得できなければメッセージを出して None
+
+    wait_seconds を省略すると JOB_LEASE_WAIT_SECONDS（既定 0 = すぐスキップ）を使う。
+    リーステーブルに届かない場合はジョブを止めずに続行する。
+    """
+    if wait_seconds is None:
+        wait_seconds = int(os.environ.get("JOB_LEASE_WAIT_SECONDS", "0") or 0)
+
+    lease = JobLease(supabase, job)
+    try:
+        acquired = lease.acquire(wait_seconds)
+    except Exception as e:
+        print(f"WARNING: Could not check lease for job '{job}', running without it: {e}")
+        return lease
+
+    if not acquired:
+        print(f"Another run of job '{job}' holds the lease. Skipping this run.")
+        return None
+
+    atexit.register(lease.release)
+    print(f"Acquired lease for job '{job}' ({lease.holder}).")
+    return lease
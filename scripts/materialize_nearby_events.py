@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Materialize Nearby Events - 都道府県ごとの「近くの展覧会」を事前計算して prefecture_nearby_events に保存
+daily_crawler の後に実行する。ランキングは PostGIS（rank_nearby_events）で会場からの距離順に計算し、
+内容が変わった都道府県の行だけを書き換える
+前回の実行以降に変わったイベント・会場の周辺の都道府県（changed_nearby_prefectures）だけを再計算する。
+初回と --full のときは全都道府県
+"""
+import os
+import json
+import datetime
+from pathlib import Path
+from dotenv import load_dotenv
+from supabase import create_client, Client
+from batch_utils import chunked, content_hash
+from prefectures import REGION_SHARDS
+
+# Load .env from project root
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(env_path)
+
+MAX_PER_PREFECTURE = 30
+MAX_DISTANCE_KM = 150
+# Look back a little further than the last run for clock skew and writes that were still in flight
+SINCE_MARGIN = datetime.timedelta(minutes=10)
+
+
+def fetch_changed_codes(supabase, all_codes):
+    """前回の実行以降にランキングが変わりうる都道府県コード。前回の記録がなければ全件"""
+    state = supabase.table('nearby_events_state').select('refreshed_through').execute().data
+    if not state:
+        print("No previous run recorded. Recomputing every prefecture.")
+        return list(all_codes)
+
+    since = datetime.datetime.fromisoformat(state[0]['refreshed_through']) - SINCE_MARGIN
+    result = supabase.rpc('changed_nearby_prefectures', {
+        'since': since.isoformat(),
+        'max_distance_km': MAX_DISTANCE_KM,
+    }).execute()
+    changed = {row['prefecture_code'] for row in result.data}
+    print(f"{len(changed)} prefectures have events or venues changed since {since:%Y-%m-%d %H:%M} UTC.")
+    return [code for code in all_codes if code in changed]
+
+
+def fetch_rankings(supabase, codes):
+    """地域シャードごとにランキングを取得する（PostgRESTの行数上限を超えないように分割）"""
+    rankings = {}
+    for shard in REGION_SHARDS:
+        shard_codes = [code for code in shard['codes'] if code in codes]
+        if not shard_codes:
+            continue
+        result = supabase.rpc('rank_nearby_events', {
+            'prefecture_codes': shard_codes,
+            'max_per_prefecture': MAX_PER_PREFECTURE,
+            'max_distance_km': MAX_DISTANCE_KM,
+        }).execute()
+        for row in result.data:
+            rankings.setdefault(row['prefecture_code'], []).append(row)
+
+    for rows in rankings.values():
+        rows.sort(key=lambda r: r['rank'])
+    return rankings
+
+
+def fetch_event_details(supabase, event_ids):
+    """ランキングに含まれるイベントの表示用カラムをまとめて取得する"""
+    details = {}
+    for ids in chunked(sorted(event_ids), 100):
+        result = supabase.table('events') \
+            .select('id, title, venue, venue_id, start_date, end_date, source_url, summary:description_json->>summary') \
+            .in_('id', ids).execute()
+        for row in result.data:
+            details[row['id']] = row
+    return details
+
+
+def main(dry_run=False, full=False):
+    # Configuration
+    supabase_url = os.environ.get("SUPABASE_URL", "").strip()
+    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+
+    if not supabase_url or not supabase_key:
+        print("Error: Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY environment variables.")
+        return
+
+    supabase: Client = create_client(supabase_url, supabase_key)
+    run_started = datetime.datetime.now(datetime.timezone.utc)
+    all_codes = [code for shard in REGION_SHARDS for code in shard['codes']]
+
+    print("Ranking nearby events per prefecture...")
+    try:
+        codes = list(all_codes) if full else fetch_changed_codes(supabase, all_codes)
+        rankings = fetch_rankings(supabase, set(codes))
+        details = fetch_event_details(supabase, {row['event_id'] for rows in rankings.values() for row in rows})
+        current = supabase.table('prefecture_nearby_events').select('prefecture_code, events_hash').execute()
+    except Exception as e:
+        print(f"Error computing rankings: {e}")
+        return
+
+    current_hashes = {row['prefecture_code']: row['events_hash'] for row in current.data}
+
+    updates = []
+    for code in codes:
+        events = []
+        for row in rankings.get(code, []):
+            event = details.get(row['event_id'])
+            if not event:
+                continue
+            distance_m = row.get('distance_m')
+            events.append({
+                **event,
+                "distance_km": round(distance_m / 1000, 1) if distance_m is not None else None,
+            })
+
+        digest = content_hash(json.dumps(events, ensure_ascii=False, sort_keys=True))
+        if current_hashes.get(code) == digest:
+            continue
+
+        updates.append({
+            "prefecture_code": code,
+            "events": events,
+            "event_count": len(events),
+            "events_hash": digest,
+            "refreshed_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        })
+
+    print(f"{len(updates)} of {len(codes)} recomputed prefectures changed ({len(all_codes) - len(codes)} skipped).")
+
+    if dry_run:
+        for row in updates:
+            print(f"  [DRY RUN] {row['prefecture_code']}: {row['event_count']} events")
+        return
+
+    try:
+        if updates:
+            supabase.table('prefecture_nearby_events').upsert(updates, on_conflict='prefecture_code').execute()
+            print(f"Refreshed {len(updates)} prefectures.")
+        # Only advance the checkpoint once the rankings are saved, so a failed run is recomputed next time
+        supabase.table('nearby_events_state').upsert(
+            {'id': True, 'refreshed_through': run_started.isoformat()}, on_conflict='id'
+        ).execute()
+    except Exception as e:
+        print(f"Error saving nearby events: {e}")
+
+
+if __name__ == "__main__":
+    import sys
+    dry_run = "--dry-run" in sys.argv
+    full = "--full" in sys.argv
+    main(dry_run=dry_run, full=full)
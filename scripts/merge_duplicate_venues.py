@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Merge Duplicate Venues - 位置と名前が近い重複会場を検出して1件に統合
+events.venue_id / venue_maps.venue_id / venue_aliases を正規の会場に付け替える
+"""
+import os
+import json
+import argparse
+from difflib import SequenceMatcher
+from pathlib import Path
+from dotenv import load_dotenv
+from supabase import create_client, Client
+from batch_utils import chunked, fetch_all
+from geo_utils import parse_point, haversine_m, grid_cell, neighbor_cells
+from venue_index import normalize_venue_name
+
+# Load .env from project root
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(env_path)
+
+UPDATE_BATCH_SIZE = 100
+
+
+def names_similar(a, b, min_similarity):
+    """正規化後の名前が一致・包含、または類似度が閾値以上なら同一会場とみなす"""
+    key_a = normalize_venue_name(a)
+    key_b = normalize_venue_name(b)
+    if not key_a or not key_b:
+        return False
+    if key_a == key_b or key_a in key_b or key_b in key_a:
+        return True
+    return SequenceMatcher(None, key_a, key_b).ratio() >= min_similarity
+
+
+def find_clusters(venues, radius_m, min_similarity):
+    """グリッドバケットで近傍候補だけを比較し、重複会場のクラスタを返す"""
+    parent = list(range(len(venues)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets = {}
+    for i, venue in enumerate(venues):
+        lon, lat = venue['_point']
+        for cell in neighbor_cells(lon, lat, radius_m):
+            for j in buckets.get(cell, []):
+                other_lon, other_lat = venues[j]['_point']
+                if haversine_m(lon, lat, other_lon, other_lat) > radius_m:
+                    continue
+                if names_similar(venue['name'], venues[j]['name'], min_similarity):
+                    parent[find(i)] = find(j)
+        buckets.setdefault(grid_cell(lon, lat, radius_m), []).append(i)
+
+    groups = {}
+    for i in range(len(venues)):
+        groups.setdefault(find(i), []).append(venues[i])
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def choose_canonical(cluster, ref_counts):
+    """参照数が最も多い会場を正とし、同数なら情報が多く古いものを選ぶ"""
+    return min(cluster, key=lambda v: (
+        -ref_counts.get(v['id'], 0),
+        not v.get('address'),
+        not v.get('website_url'),
+        v.get('created_at') or '',
+    ))
+
+
+def merge_cluster(supabase, canonical, duplicates):
+    """重複会場の参照を正規の会場に付け替えてから削除する"""
+    canonical_id = canonical['id']
+    dup_ids = [v['id'] for v in duplicates]
+
+    # 正規の会場に欠けている情報を重複側から補う
+    patch = {}
+    for field in ('address', 'website_url'):
+        if not canonical.get(field):
+            value = next((v[field] for v in duplicates if v.get(field)), None)
+            if value:
+                patch[field] = value
+    if patch:
+        supabase.table('venues').update(patch).eq('id', canonical_id).execute()
+
+    for ids in chunked(dup_ids, UPDATE_BATCH_SIZE):
+        supabase.table('events').update({
+            'venue_id': canonical_id,
+            'venue': canonical['name'],
+        }).in_('venue_id', ids).execute()
+        supabase.table('venue_maps').update({'venue_id': canonical_id}).in_('venue_id', ids).execute()
+        supabase.table('venue_aliases').update({'venue_id': canonical_id}).in_('venue_id', ids).execute()
+
+    # 重複側の名前は今後の表記揺れとして解決できるようエイリアスに残す
+    aliases = [{'alias': v['name'], 'venue_id': canonical_id} for v in duplicates if v['name'] != canonical['name']]
+    if aliases:
+        supabase.table('venue_aliases').upsert(aliases, on_conflict='alias').execute()
+
+    for ids in chunked(dup_ids, UPDATE_BATCH_SIZE):
+        supabase.table('venues').delete().in_('id', ids).execute()
+
+
+def main(radius_m=150.0, min_similarity=0.6, dry_run=False, report_path=None):
+    # Configuration
+    supabase_url = os.environ.get("SUPABASE_URL", "").strip()
+    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+
+    if not supabase_url or not supabase_key:
+        print("Error: Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY environment variables.")
+        return
+
+    supabase: Client = create_client(supabase_url, supabase_key)
+
+    print("Fetching venues and references...")
+    try:
+        venues = fetch_all(supabase, 'venues', 'id, name, address, location, website_url, created_at')
+        ref_counts = {}
+        for table in ('events', 'venue_maps'):
+            for row in fetch_all(supabase, table, 'id, venue_id'):
+                if row.get('venue_id'):
+                    ref_counts[row['venue_id']] = ref_counts.get(row['venue_id'], 0) + 1
+    except Exception as e:
+        print(f"Error fetching venues: {e}")
+        return
+
+    located = []
+    for venue in venues:
+        point = parse_point(venue.get('location'))
+        if point:
+            venue['_point'] = point
+            located.append(venue)
+
+    print(f"Found {len(venues)} venues ({len(located)} with location). Radius: {radius_m}m")
+
+    clusters = find_clusters(located, radius_m, min_similarity)
+    print(f"Found {len(clusters)} duplicate clusters.")
+
+    report = []
+    for cluster in clusters:
+        canonical = choose_canonical(cluster, ref_counts)
+        duplicates = [v for v in cluster if v['id'] != canonical['id']]
+
+        print(f"\n* {canonical['name']} ({canonical['id']}, refs={ref_counts.get(canonical['id'], 0)})")
+        for v in duplicates:
+            distance = haversine_m(*canonical['_point'], *v['_point'])
+            print(f"  <- {v['name']} ({v['id']}, refs={ref_counts.get(v['id'], 0)}, {distance:.0f}m)")
+
+        report.append({
+            "canonical": {"id": canonical['id'], "name": canonical['name']},
+            "duplicates": [
+                {"id": v['id'], "name": v['name'], "references": ref_counts.get(v['id'], 0)}
+                for v in duplicates
+            ],
+        })
+
+        if dry_run:
+            continue
+
+        try:
+            merge_cluster(supabase, canonical, duplicates)
+            print("  - Merged.")
+        except Exception as e:
+            print(f"  - Error merging cluster: {e}")
+
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({"radius_m": radius_m, "dry_run": dry_run, "clusters": report}, f, ensure_ascii=False, indent=2)
+        print(f"\nReport written to {report_path}")
+
+    merged = sum(len(c['duplicates']) for c in report)
+    prefix = "[DRY RUN] Would merge" if dry_run else "Merged"
+    print(f"\n{prefix} {merged} duplicate venues into {len(report)} canonical venues.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect and merge duplicate venues by location and name.")
+    parser.add_argument("--radius", type=float, default=150.0, help="Clustering radius in meters")
+    parser.add_argument("--min-similarity", type=float, default=0.6, help="Minimum name similarity (0-1)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report clusters, do not merge")
+    parser.add_argument("--report", help="Write the cluster report as JSON to this path")
+    args = parser.parse_args()
+    main(radius_m=args.radius, min_similarity=args.min_similarity, dry_run=args.dry_run, report_path=args.report)
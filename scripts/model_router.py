@@ -0,0 +1,128 @@
+"""
+Model Router - タスクの種類ごとに Gemini のモデルを選び、呼び出しごとのレイテンシ・トークン数・概算コストを記録する
+モデルは GEMINI_MODEL_<TASK>（例: GEMINI_MODEL_ARTICLE=gemini-2.5-pro）で上書きできる
+GEMINI_USAGE_LOG を指定すると呼び出しごとの記録をJSONLで追記する（モデル変更前後の比較用）
+"""
+import os
+import json
+import time
+import datetime
+import threading
+import google.generativeai as genai
+from prompt_cache import cached_model
+
+TASK_MODELS = {
+    "classify": "gemini-2.5-flash-lite",   # yes/no・カテゴリ判定
+    "extract": "gemini-2.5-flash-lite",    # 与えたテキストからの抽出
+    "summary": "gemini-2.5-flash-lite",    # 短い要約（会話履歴の圧縮など）
+    "translate": "gemini-2.5-flash",       # 記事の多言語化
+    "listing": "gemini-2.5-flash",         # 展覧会・美術館などの一覧生成（日付や住所の正確さが必要）
+    "article": "gemini-2.5-flash",         # 今日の一枚・特集記事などの読み物（Pro は上書きで選ぶ）
+}
+
+# USD per 1M tokens: (input, output, cached input)
+MODEL_PRICING = {
+    "gemini-2.5-flash-lite": (0.10, 0.40, 0.025),
+    "gemini-2.5-flash": (0.30, 2.50, 0.075),
+    "gemini-2.5-pro": (1.25, 10.00, 0.31),
+}
+
+
+def model_for(task):
+    """タスクに割り当てられたモデル名（環境変数の上書きを優先）"""
+    if task not in TASK_MODELS:
+        raise ValueError(f"Unknown task type: {task}")
+    return os.environ.get(f"GEMINI_MODEL_{task.upper()}", "").strip() or TASK_MODELS[task]
+
+
+def estimate_cost(model_name, input_tokens, output_tokens, cached_tokens=0):
+    pricing = MODEL_PRICING.get(model_name)
+    if not pricing:
+        return None
+    input_price, output_price, cached_price = pricing
+    return ((input_tokens - cached_tokens) * input_price + cached_tokens * cached_price
+            + output_tokens * output_price) / 1_000_000
+
+
+class UsageLog:
+    """呼び出しの記録をスレッドセーフに集計する"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = []
+
+    def record(self, task, model_name, latency, usage):
+        entry = {
+            "task": task,
+            "model": model_name,
+            "latency_s": round(latency, 3),
+            "input_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+            "cached_tokens": getattr(usage, "cached_content_token_count", 0) or 0,
+        }
+        entry["cost_usd"] = estimate_cost(model_name, entry["input_tokens"], entry["output_tokens"], entry["cached_tokens"])
+        with self._lock:
+            self.records.append(entry)
+
+        log_path = os.environ.get("GEMINI_USAGE_LOG", "").strip()
+        if log_path:
+            line = dict(entry, at=datetime.datetime.now(datetime.timezone.utc).isoformat())
+            with self._lock, open(log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(line) + "\n")
+
+    def print_report(self):
+        if not self.records:
+            return
+        groups = {}
+        for entry in self.records:
+            groups.setdefault((entry["task"], entry["model"]), []).append(entry)
+
+        print("\nGemini usage by task:")
+        print(f"  {'task':<9} {'model':<22} {'calls':>5} {'p50 s':>7} {'max s':>7} {'in tok':>9} {'out tok':>8} {'cached':>8} {'cost $':>9}")
+        total_cost = 0.0
+        for (task, model_name), entries in sorted(groups.items()):
+            latencies = sorted(e["latency_s"] for e in entries)
+            costs = [e["cost_usd"] for e in entries if e["cost_usd"] is not None]
+            cost = sum(costs)
+            total_cost += cost
+            print(f"  {task:<9} {model_name:<22} {len(entries):>5} {latencies[len(latencies) // 2]:>7.2f} {latencies[-1]:>7.2f} "
+                  f"{sum(e['input_tokens'] for e in entries):>9} {sum(e['output_tokens'] for e in entries):>8} "
+                  f"{sum(e['cached_tokens'] for e in entries):>8} {cost if costs else float('nan'):>9.4f}")
+        print(f"  Estimated total: ${total_cost:.4f}")
+
+
+usage_log = UsageLog()
+
+
+class RoutedModel:
+    """GenerativeModel と同じ generate_content を持ち、呼び出しを usage_log に記録する"""
+
+    def __init__(self, task, model_name, model):
+        self.task = task
+        self.model_name = model_name
+        self._model = model
+
+    def generate_content(self, *args, **kwargs):
+        started = time.monotonic()
+        response = self._model.generate_content(*args, **kwargs)
+        usage_log.record(self.task, self.model_name, time.monotonic() - started, getattr(response, "usage_metadata", None))
+        return response
+
+
+def get_model(task, instructions=None, cache_name=None):
+    """タスク用のモデルを返す。instructions は system_instruction として渡す
+
+    cache_name も渡すと instructions を明示的キャッシュに載せる（同じ固定部分で何度も呼ぶ場合だけ）。
+    """
+    model_name = model_for(task)
+    if instructions and cache_name:
+        model = cached_model(model_name, instructions, cache_name)
+    elif instructions:
+        model = genai.GenerativeModel(model_name, system_instruction=instructions)
+    else:
+        model = genai.GenerativeModel(model_name)
+    return RoutedModel(task, model_name, model)
+
+
+def print_usage_report():
+    usage_log.print_report()
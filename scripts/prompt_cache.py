@@ -0,0 +1,69 @@
+"""
+Prompt Cache - プロンプトの固定部分（役割・出力形式の指示と除外リスト）を Gemini の明示的キャッシュに載せる
+キャッシュ名は内容のハッシュなので、除外リストが変わらない限り同じキャッシュを再利用し、必要なら期限を延長する。
+日付・件数・テーマなど呼び出しごとに変わる値はキャッシュに入れず、各呼び出しの本文で渡す
+キャッシュできない場合（トークン数不足・APIエラー）は同じ指示を system_instruction に入れた通常のモデルを返す
+"""
+import datetime
+import google.generativeai as genai
+from google.generativeai import caching
+from batch_utils import content_hash
+
+CACHE_TTL = datetime.timedelta(hours=1)
+
+MIN_CACHE_TOKENS = 1024   # これより短いプレフィックスはキャッシュできない
+CHARS_PER_TOKEN = 1.5     # 日本語混じりの文章の概算
+MIN_CALLS_FOR_CACHE = 3   # 呼び出しがこれより少なければ作成コストの方が高い
+
+
+def _estimate_tokens(text):
+    return int(len(text or "") / CHARS_PER_TOKEN)
+
+
+def _cache_name(prefix_name, model_name, instructions):
+    return f"{prefix_name}-{content_hash(model_name, instructions)[:16]}"
+
+
+def ensure_cache(model_name, instructions, prefix_name, ttl=CACHE_TTL):
+    """instructions のキャッシュを返す（なければ作る）。キャッシュできなければ None
+
+    同じジョブの内容違いのキャッシュは削除しない（重なって動いている実行が使っているかもしれないため、TTLで切れるのを待つ）。
+    """
+    if _estimate_tokens(instructions) < MIN_CACHE_TOKENS:
+        return None
+
+    display_name = _cache_name(prefix_name, model_name, instructions)
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    try:
+        cache = None
+        for existing in caching.CachedContent.list():
+            if existing.display_name == display_name and existing.expire_time > now:
+                cache = existing
+                break
+
+        if cache:
+            if cache.expire_time - now < ttl:
+                # Make sure this run can use it for the whole ttl
+                cache.update(ttl=ttl)
+            print(f"Reusing prompt cache {display_name} (expires {cache.expire_time:%H:%M} UTC).")
+        else:
+            cache = caching.CachedContent.create(
+                model=f"models/{model_name}",
+                display_name=display_name,
+                system_instruction=instructions,
+                ttl=ttl,
+            )
+            print(f"Created prompt cache {display_name} ({cache.usage_metadata.total_token_count} tokens).")
+        return cache
+    except Exception as e:
+        print(f"Prompt cache unavailable, sending instructions inline: {e}")
+        return None
+
+
+def cached_model(model_name, instructions, prefix_name, ttl=CACHE_TTL):
+    """instructions をキャッシュしたモデルを返す。以降の generate_content には可変部分だけを渡す"""
+    cache = ensure_cache(model_name, instructions, prefix_name, ttl)
+    if cache is None:
+        return genai.GenerativeModel(model_name, system_instruction=instructions)
+    return genai.GenerativeModel.from_cached_content(cached_content=cache)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Publish Home Feed - ホーム画面のデータ（今日の一枚・トレンド記事・開催予定の展覧会）を
+1つのgzip済みJSONスナップショットにまとめて Supabase Storage に公開する
+アプリは複数のクエリの代わりにキャッシュ可能なGETを1回行うだけで済む
+"""
+import os
+import gzip
+import json
+import hashlib
+import datetime
+from pathlib import Path
+from dotenv import load_dotenv
+from supabase import create_client, Client
+from batch_utils import upload_object
+
+# Load .env from project root
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(env_path)
+
+BUCKET = 'home_feed'
+FEED_SCHEMA_VERSION = 1
+LATEST_PATH = f"v{FEED_SCHEMA_VERSION}/latest.json.gz"
+VERSIONS_DIR = f"v{FEED_SCHEMA_VERSION}/versions"
+KEEP_VERSIONS = 5
+
+TRENDING_LIMIT = 10
+EVENTS_LIMIT = 30
+
+LATEST_CACHE_CONTROL = "300"          # latest は短め（クライアントはETagで再検証）
+VERSION_CACHE_CONTROL = "31536000"    # 版付きオブジェクトは不変
+
+
+def build_feed(supabase, today):
+    """ホーム画面で使う3種類のデータを取得する（アプリと同じ条件・並び順）"""
+    today_str = today.isoformat()
+
+    # Today's column, or the latest one before today if it is missing
+    daily = supabase.table('daily_columns').select('*') \
+        .lte('display_date', today_str) \
+        .order('display_date', desc=True).limit(1).execute()
+
+    trending = supabase.table('trending_articles').select('*') \
+        .eq('is_published', True) \
+        .order('published_at', desc=True).limit(TRENDING_LIMIT).execute()
+
+    events = supabase.table('events') \
+        .select('id, title, venue, venue_id, location, description_json, source_url, start_date, end_date') \
+        .gte('end_date', today_str) \
+        .order('start_date').limit(EVENTS_LIMIT).execute()
+
+    return {
+        "version": FEED_SCHEMA_VERSION,
+        "date": today_str,
+        "daily_column": daily.data[0] if daily.data else None,
+        "trending": trending.data,
+        "events": events.data,
+    }
+
+
+def encode_feed(feed):
+    """決定的なバイト列にしてハッシュを取る（内容が同じなら同じETagになる）"""
+    body = json.dumps(feed, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    etag = hashlib.sha256(body).hexdigest()[:16]
+    stamped = dict(feed, etag=etag, generated_at=datetime.datetime.now(datetime.timezone.utc).isoformat())
+    payload = json.dumps(stamped, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return etag, gzip.compress(payload, compresslevel=9, mtime=0)
+
+
+def list_versions(supabase):
+    """保存済みの版を新しい順に返す（ファイル名は <timestamp>-<etag>.json.gz）"""
+    objects = supabase.storage.from_(BUCKET).list(VERSIONS_DIR, {"limit": 1000})
+    names = [obj['name'] for obj in objects if obj.get('name', '').endswith('.json.gz')]
+    return sorted(names, reverse=True)
+
+
+def main(dry_run=False, force=False):
+    # Configuration
+    supabase_url = os.environ.get("SUPABASE_URL", "").strip()
+    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+
+    if not supabase_url or not supabase_key:
+        print("Error: Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY environment variables.")
+        return
+
+    supabase: Client = create_client(supabase_url, supabase_key)
+
+    print("Building home feed snapshot...")
+    try:
+        feed = build_feed(supabase, datetime.date.today())
+    except Exception as e:
+        print(f"Error building home feed: {e}")
+        return
+
+    etag, data = encode_feed(feed)
+    print(f"Snapshot: {len(feed['trending'])} articles, {len(feed['events'])} events, "
+          f"{len(data)} bytes gzipped, etag={etag}")
+
+    try:
+        versions = list_versions(supabase)
+    except Exception as e:
+        print(f"Error listing versions: {e}")
+        versions = []
+
+    if versions and versions[0].endswith(f"-{etag}.json.gz") and not force:
+        print("Content unchanged since the last snapshot. Nothing to publish.")
+        return
+
+    version_name = f"{datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{etag}.json.gz"
+
+    if dry_run:
+        print(f"[DRY RUN] Would publish {LATEST_PATH} and {VERSIONS_DIR}/{version_name}")
+        return
+
+    try:
+        upload_object(supabase, BUCKET, f"{VERSIONS_DIR}/{version_name}", data, "application/gzip", VERSION_CACHE_CONTROL)
+        upload_object(supabase, BUCKET, LATEST_PATH, data, "application/gzip", LATEST_CACHE_CONTROL)
+        print(f"Published {LATEST_PATH} ({version_name}).")
+    except Exception as e:
+        print(f"Error uploading snapshot: {e}")
+        return
+
+    # Keep only the newest KEEP_VERSIONS snapshots
+    old_versions = ([version_name] + versions)[KEEP_VERSIONS:]
+    if old_versions:
+        try:
+            supabase.storage.from_(BUCKET).remove([f"{VERSIONS_DIR}/{name}" for name in old_versions])
+            print(f"Removed {len(old_versions)} old snapshots.")
+        except Exception as e:
+            print(f"Error removing old snapshots: {e}")
+
+
+if __name__ == "__main__":
+    import sys
+    dry_run = "--dry-run" in sys.argv
+    force = "--force" in sys.argv
+    main(dry_run=dry_run, force=force)
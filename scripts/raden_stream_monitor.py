@@ -10,6 +10,7 @@ from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import google.generativeai as genai
 from supabase import create_client, Client
+from model_router import get_model, print_usage_report
 
 # Load .env from project root
 env_path = Path(__file__).parent.parent / '.env'
@@ -144,7 +145,7 @@ def main(dry_run=False):
         return
 
     # Use Gemini to extract artworks mentioned
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    model = get_model('extract')
     
     for video in art_videos[:3]:  # Process up to 3 videos at a time
         print(f"\nAnalyzing: {video['title']}")
@@ -215,6 +216,7 @@ def main(dry_run=False):
         except Exception as e:
             print(f"  - Error processing video: {e}")
 
+    print_usage_report()
     print("\nRaden stream monitoring completed.")
 
 
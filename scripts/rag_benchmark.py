@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+RAG Benchmark - Scan & Guide 用コーパスでHNSWのレイテンシと再現率を計測
+daily_columns / trending_articles をチャンク化してローカルにHNSWインデックスを構築し、
+ブルートフォース検索を正解として M / ef_construction / ef_search ごとの recall@k を比較、
+pgvector のインデックス設定を推奨する。
+
+追加の依存: pip install numpy hnswlib
+"""
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+
+try:
+    import numpy as np
+    import hnswlib
+except ImportError:
+    np = None
+    hnswlib = None
+
+# Load .env from project root
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(env_path)
+
+EMBEDDING_MODEL = "models/text-embedding-004"
+EMBED_BATCH_SIZE = 100
+
+CHUNK_SIZE = 300     # 文字数（日本語なので文字単位で区切る）
+CHUNK_OVERLAP = 50
+
+M_VALUES = [8, 16, 32]
+EF_CONSTRUCTION_VALUES = [64, 128]
+EF_SEARCH_VALUES = [10, 20, 40, 80, 160, 320]
+
+
+def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """句点の位置を優先して、重なりを持たせた固定長チャンクに分割する"""
+    text = (text or "").strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            cut = text.rfind("。", start + size // 2, end)
+            if cut != -1:
+                end = cut + 1
+        chunks.append(text[start:end])
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def export_corpus(supabase):
+    """記事本文をチャンク化し、(chunks, queries) を返す。クエリには各記事のタイトルを使う"""
+    from batch_utils import fetch_all
+
+    chunks = []
+    queries = []
+    sources = [
+        ('daily_columns', 'id, title, artist, content', ('artist', 'content')),
+        ('trending_articles', 'id, title, summary, content', ('summary', 'content')),
+    ]
+    for table, columns, body_fields in sources:
+        for row in fetch_all(supabase, table, columns):
+            body = "\n".join(filter(None, [row.get(field) for field in body_fields]))
+            for i, chunk in enumerate(chunk_text(body)):
+                chunks.append({"id": f"{table}:{row['id']}:{i}", "text": f"{row['title']}\n{chunk}"})
+            if row.get('title'):
+                queries.append({"id": f"{table}:{row['id']}", "text": row['title']})
+    return chunks, queries
+
+
+def embed(texts, task_type):
+    import google.generativeai as genai
+
+    vectors = []
+    for i in range(0, len(texts), EMBED_BATCH_SIZE):
+        result = genai.embed_content(model=EMBEDDING_MODEL, content=texts[i:i + EMBED_BATCH_SIZE], task_type=task_type)
+        vectors.extend(result['embedding'])
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def load_corpus_from_db():
+    import google.generativeai as genai
+    from supabase import create_client
+
+    gemini_api_key = os.environ.get("GEMINI_API_KEY", "").strip()
+    supabase_url = os.environ.get("SUPABASE_URL", "").strip()
+    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+    if not gemini_api_key or not supabase_url or not supabase_key:
+        raise RuntimeError("Missing environment variables.")
+
+    genai.configure(api_key=gemini_api_key)
+    supabase = create_client(supabase_url, supabase_key)
+
+    print("Exporting and chunking corpus...")
+    chunks, queries = export_corpus(supabase)
+    print(f"  {len(chunks)} chunks, {len(queries)} queries. Embedding...")
+    data = embed([c["text"] for c in chunks], "retrieval_document")
+    query_vectors = embed([q["text"] for q in queries], "retrieval_query")
+    return data, query_vectors
+
+
+def synthetic_corpus(size, dim, query_count, seed=0):
+    """APIなしで試すための、クラスタ構造を持つ合成ベクトル"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(size // 50, 1), dim))
+    data = centers[rng.integers(0, len(centers), size)] + rng.normal(scale=0.5, size=(size, dim))
+    queries = data[rng.integers(0, size, query_count)] + rng.normal(scale=0.2, size=(query_count, dim))
+    return data.astype(np.float32), queries.astype(np.float32)
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def brute_force(data, queries, k):
+    """コサイン類似度の全件比較（正解セットとベースラインのレイテンシ）"""
+    latencies = []
+    results = []
+    for q in queries:
+        started = time.perf_counter()
+        scores = data @ q
+        top = np.argpartition(-scores, k - 1)[:k]
+        latencies.append(time.perf_counter() - started)
+        results.append(set(top.tolist()))
+    return results, latencies
+
+
+def percentile_ms(latencies, pct):
+    return float(np.percentile(latencies, pct) * 1000)
+
+
+def benchmark(data, queries, k, target_recall):
+    data = normalize(data)
+    queries = normalize(queries)
+    k = min(k, len(data))
+
+    truth, bf_latencies = brute_force(data, queries, k)
+    baseline = {
+        "p50_ms": percentile_ms(bf_latencies, 50),
+        "p95_ms": percentile_ms(bf_latencies, 95),
+    }
+    print(f"Brute force: p50={baseline['p50_ms']:.3f}ms p95={baseline['p95_ms']:.3f}ms")
+
+    # hnswlib needs ef >= k; clamp the grid instead of skipping it so every M/efC gets measured
+    ef_values = sorted({max(ef, k) for ef in EF_SEARCH_VALUES})
+
+    results = []
+    for m in M_VALUES:
+        for ef_construction in EF_CONSTRUCTION_VALUES:
+            index = hnswlib.Index(space='cosine', dim=data.shape[1])
+            started = time.perf_counter()
+            index.init_index(max_elements=len(data), ef_construction=ef_construction, M=m)
+            index.add_items(data, np.arange(len(data)))
+            build_s = time.perf_counter() - started
+
+            for ef_search in ef_values:
+                index.set_ef(ef_search)
+                latencies = []
+                hits = 0
+                for q, expected in zip(queries, truth):
+                    started = time.perf_counter()
+                    labels, _ = index.knn_query(q, k=k)
+                    latencies.append(time.perf_counter() - started)
+                    hits += len(expected & set(labels[0].tolist()))
+
+                result = {
+                    "m": m,
+                    "ef_construction": ef_construction,
+                    "ef_search": ef_search,
+                    "build_s": build_s,
+                    "recall": hits / (k * len(queries)),
+                    "p50_ms": percentile_ms(latencies, 50),
+                    "p95_ms": percentile_ms(latencies, 95),
+                    "p99_ms": percentile_ms(latencies, 99),
+                }
+                results.append(result)
+                print(f"M={m:<3} efC={ef_construction:<4} ef={ef_search:<4} "
+                      f"recall@{k}={result['recall']:.3f} p50={result['p50_ms']:.3f}ms "
+                      f"p95={result['p95_ms']:.3f}ms build={build_s:.2f}s")
+
+    # 目標再現率を満たす中で最もp95が小さい設定（同程度なら小さいM/efCを優先）
+    candidates = [r for r in results if r["recall"] >= target_recall] or [max(results, key=lambda r: r["recall"])]
+    best = min(candidates, key=lambda r: (round(r["p95_ms"], 2), r["m"], r["ef_construction"], r["ef_search"]))
+    return baseline, results, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HNSW retrieval latency and recall for the RAG corpus.")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query (recall@k)")
+    parser.add_argument("--target-recall", type=float, default=0.95, help="Minimum acceptable recall@k")
+    parser.add_argument("--synthetic", type=int, help="Use N synthetic vectors instead of the database")
+    parser.add_argument("--dim", type=int, default=768, help="Dimension for synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Query count for synthetic vectors")
+    parser.add_argument("--corpus", help="Load embedded corpus from .npz (skips export and embedding)")
+    parser.add_argument("--save-corpus", help="Save the embedded corpus to .npz for later runs")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    if np is None or hnswlib is None:
+        print("Error: numpy and hnswlib are required. Run: pip install numpy hnswlib")
+        return
+
+    if args.corpus:
+        loaded = np.load(args.corpus)
+        data, queries = loaded["data"], loaded["queries"]
+    elif args.synthetic:
+        data, queries = synthetic_corpus(args.synthetic, args.dim, args.queries)
+    else:
+        try:
+            data, queries = load_corpus_from_db()
+        except Exception as e:
+            print(f"Error building corpus: {e}")
+            return
+
+    if args.save_corpus:
+        np.savez_compressed(args.save_corpus, data=data, queries=queries)
+
+    if len(data) == 0 or len(queries) == 0:
+        print("Error: empty corpus.")
+        return
+    if args.k < 1:
+        print("Error: --k must be at least 1.")
+        return
+
+    print(f"Corpus: {len(data)} vectors x {data.shape[1]} dims, {len(queries)} queries")
+    baseline, results, best = benchmark(data, queries, args.k, args.target_recall)
+
+    print("\n--- Recommended pgvector settings ---")
+    print(f"recall@{args.k}={best['recall']:.3f}, p95={best['p95_ms']:.3f}ms (local hnswlib)")
+    print("CREATE INDEX IF NOT EXISTS content_embeddings_embedding_hnsw_idx ON content_embeddings")
+    print(f"    USING hnsw (embedding vector_cosine_ops) WITH (m = {best['m']}, ef_construction = {best['ef_construction']});")
+    print(f"SET hnsw.ef_search = {best['ef_search']};")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                "corpus_size": int(len(data)),
+                "dim": int(data.shape[1]),
+                "query_count": int(len(queries)),
+                "k": args.k,
+                "target_recall": args.target_recall,
+                "brute_force": baseline,
+                "results": results,
+                "recommended": best,
+            }, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Records - Gemini が返すJSON（展覧会・美術館・記事・今日の一枚）を型付きのレコードに変換する共通モジュール
+__slots__ クラスで、検証とPostgREST用の行への変換を1か所にまとめる（速度・メモリは辞書とほぼ同じ。bench_records.py）
+"""
+import json
+import datetime
+from abc import ABC, abstractmethod
+from prefectures import PREFECTURES
+
+_decoder = json.JSONDecoder()
+_fromisoformat = datetime.date.fromisoformat
+
+
+def strip_code_fence(text):
+    """```json ... ``` で囲まれた応答から中身を取り出す"""
+    if isinstance(text, bytes):
+        text = text.decode("utf-8")
+    # Slice once instead of split()-ing (which copies the whole response twice)
+    start = text.find("```json")
+    if start != -1:
+        start += 7
+    else:
+        start = text.find("```")
+        if start != -1:
+            start += 3
+    if start != -1:
+        end = text.find("```", start)
+        text = text[start:end] if end != -1 else text[start:]
+    return text.strip()
+
+
+def _text(data, field, required=True):
+    value = data.get(field)
+    if value.__class__ is not str:
+        value = "" if value is None else str(value)
+    value = value.strip()
+    if required and not value:
+        raise ValueError(f"missing {field}")
+    return value
+
+
+def _date(data, field):
+    value = data.get(field)
+    if value.__class__ is not str or len(value) != 10:
+        value = _text(data, field)
+        if len(value) != 10:
+            raise ValueError(f"{field} is not YYYY-MM-DD: {value!r}")
+    _fromisoformat(value)  # raises ValueError for an invalid calendar date
+    return value
+
+
+def _prefecture_code(value):
+    if value.__class__ is str and value in PREFECTURES:
+        return value
+    if value is None or value == "":
+        return None
+    code = str(value).strip().zfill(2)
+    return code if code in PREFECTURES else None
+
+
+def _json_object(value):
+    """埋め込みJSON文字列をデコードする。オブジェクトでなければ {"summary": 元の文字列}"""
+    text = value.strip()
+    if text[:1] == "{":
+        try:
+            # raw_decode skips json.loads' type and whitespace checks (the text is already stripped)
+            decoded, end = _decoder.raw_decode(text)
+            if end == len(text) and decoded.__class__ is dict:
+                return decoded
+        except ValueError:
+            pass
+    return {"summary": value}
+
+
+class Record(ABC):
+    __slots__ = ()
+
+    @classmethod
+    @abstractmethod
+    def from_dict(cls, data):
+        """Gemini の応答の1要素（辞書）を検証してレコードにする。不正なら ValueError などを送出する"""
+
+    def to_dict(self):
+        """ジャーナルなどに保存するための辞書（from_dict で復元できる）"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class Event(Record):
+    """展覧会（daily_crawler の応答）"""
+    __slots__ = ('title', 'venue', 'prefecture_code', 'start_date', 'end_date', 'description')
+
+    def __init__(self, title, venue, start_date, end_date, prefecture_code=None, description=None):
+        self.title = title
+        self.venue = venue
+        self.start_date = start_date
+        self.end_date = end_date
+        self.prefecture_code = prefecture_code
+        self.description = description or {}
+
+    @classmethod
+    def from_dict(cls, data):
+        description = data.get('description_json')
+        if description is None:
+            description = data.get('description')
+        if description.__class__ is str:
+            description = _json_object(description)
+        elif description.__class__ is not dict:
+            description = {}
+
+        start_date = _date(data, 'start_date')
+        end_date = _date(data, 'end_date')
+        if end_date < start_date:
+            raise ValueError(f"end_date {end_date} is before start_date {start_date}")
+
+        record = cls.__new__(cls)
+        record.title = _text(data, 'title')
+        record.venue = _text(data, 'venue')
+        record.start_date = start_date
+        record.end_date = end_date
+        record.prefecture_code = _prefecture_code(data.get('prefecture_code'))
+        record.description = description
+        return record
+
+    def to_row(self, venue_name=None, venue_id=None):
+        """events テーブルの行"""
+        return {
+            "title": self.title,
+            "venue": venue_name or self.venue,
+            "venue_id": venue_id,
+            "prefecture_code": self.prefecture_code,
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+            "description_json": self.description,
+        }
+
+
+class Venue(Record):
+    """美術館・博物館（seed_venues の応答）"""
+    __slots__ = ('name', 'address', 'lat', 'lon', 'website_url')
+
+    def __init__(self, name, address, lat, lon, website_url=""):
+        self.name = name
+        self.address = address
+        self.lat = lat
+        self.lon = lon
+        self.website_url = website_url
+
+    @classmethod
+    def from_dict(cls, data):
+        lat = float(data['lat'])
+        lon = float(data['lon'])
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"invalid coordinates ({lat}, {lon})")
+        return cls(
+            name=_text(data, 'name'),
+            address=_text(data, 'address', required=False),
+            lat=lat,
+            lon=lon,
+            website_url=_text(data, 'website_url', required=False),
+        )
+
+    def to_row(self, name=None):
+        """venues テーブルの行"""
+        return {
+            "name": name or self.name,
+            "address": self.address,
+            "location": f"POINT({self.lon} {self.lat})",  # PostGIS format
+            "website_url": self.website_url,
+        }
+
+
+class Article(Record):
+    """トレンド記事（seed_trends / trend_art_crawler の応答）"""
+    __slots__ = ('title', 'summary', 'content', 'keyword', 'image_search_query', 'source_url')
+
+    def __init__(self, title, summary, content, keyword="", image_search_query="", source_url=""):
+        self.title = title
+        self.summary = summary
+        self.content = content
+        self.keyword = keyword
+        self.image_search_query = image_search_query
+        self.source_url = source_url
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            title=_text(data, 'title'),
+            summary=_text(data, 'summary', required=False),
+            content=_text(data, 'content'),
+            keyword=_text(data, 'keyword', required=False),
+            image_search_query=_text(data, 'image_search_query', required=False),
+            source_url=_text(data, 'source_url', required=False),
+        )
+
+    def to_row(self, image_url="", is_published=True):
+        """trending_articles テーブルの行"""
+        return {
+            "title": self.title,
+            "summary": self.summary,
+            "content": self.content,
+            "image_url": image_url,
+            "keyword": self.keyword,
+            "source_url": self.source_url,
+            "is_published": is_published,
+        }
+
+
+class DailyArt(Record):
+    """今日の一枚（seed_daily_art の応答）"""
+    __slots__ = ('title', 'artist', 'content', 'image_search_query')
+
+    def __init__(self, title, artist, content, image_search_query=""):
+        self.title = title
+        self.artist = artist
+        self.content = content
+        self.image_search_query = image_search_query
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            title=_text(data, 'title'),
+            artist=_text(data, 'artist'),
+            content=_text(data, 'content'),
+            image_search_query=_text(data, 'image_search_query', required=False),
+        )
+
+    def to_row(self, image_url, display_date):
+        """daily_columns テーブルの行"""
+        return {
+            "title": self.title,
+            "artist": self.artist,
+            "image_url": image_url,
+            "content": self.content,
+            "display_date": display_date.isoformat(),
+        }
+
+
+def decode_records(cls, items, label=None):
+    """辞書のリストをレコードに変換する。不正な要素は件数と最初のエラーを表示して捨てる"""
+    records = []
+    errors = []
+    from_dict = cls.from_dict
+    append = records.append
+    for item in items:
+        try:
+            append(from_dict(item))
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            errors.append(e)
+    if errors:
+        print(f"  - Skipped {len(errors)} invalid {label or cls.__name__} records (first: {errors[0]!r})")
+    return records
+
+
+def parse_records(cls, text, label=None):
+    """Gemini の応答（str / bytes）をデコードして検証済みのレコードのリストを返す"""
+    data = json.loads(strip_code_fence(text))
+    if isinstance(data, dict):
+        data = [data]
+    return decode_records(cls, data, label)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Render Static Pages - 公開済みの trending_articles / daily_columns を軽量な静的HTMLにして Storage に公開する
+検索エンジンからの流入はDBを経由せず静的ファイルだけで配信される（閲覧1回あたりのDB読み取りはゼロ）
+ページごとの内容ハッシュを manifest.json に記録し、変わったページだけを再生成・アップロードする
+一覧ページ（index.html）と sitemap.xml は、いずれかのページが増減・変更されたときだけ作り直す
+削除や一覧・サイトマップのアップロードに失敗した場合は manifest に残し、次回の実行でやり直す
+
+公開URLは STATIC_SITE_BASE_URL（カスタムドメインやCDNの前段など）。未設定なら Storage の公開URL
+"""
+import os
+import json
+import datetime
+from html import escape
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from dotenv import load_dotenv
+from supabase import create_client, Client
+from batch_utils import content_hash, fetch_all, upload_object, chunked
+
+# Load .env from project root
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(env_path)
+
+BUCKET = 'static_site'
+MANIFEST_PATH = 'manifest.json'
+TEMPLATE_VERSION = 1  # テンプレートを変えたら上げる（全ページを再生成する）
+
+SITE_NAME = "EnCura"
+PAGE_CACHE_CONTROL = "604800"   # 記事ページは1週間（内容が変わったときだけ上書きされる）
+INDEX_CACHE_CONTROL = "3600"    # index.html / sitemap.xml は新着を早めに反映する
+INDEX_LIMIT = 100
+UPLOAD_WORKERS = 8
+
+# ページ化するテーブル（パスの接頭辞・取得する列・公開済みの条件。条件には実行日（UTC）を渡す）
+SOURCES = {
+    'trending_articles': {
+        'prefix': 'articles',
+        'columns': 'id, title, summary, content, keyword, image_url, published_at',
+        'filters': lambda q, today: q.eq('is_published', True),
+    },
+    'daily_columns': {
+        'prefix': 'columns',
+        'columns': 'id, title, artist, content, image_url, display_date',
+        'filters': lambda q, today: q.lte('display_date', today),
+    },
+}
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title} | {site}</title>
+<meta name="description" content="{description}">
+<link rel="canonical" href="{url}">
+<meta property="og:type" content="article">
+<meta property="og:site_name" content="{site}">
+<meta property="og:title" content="{title}">
+<meta property="og:description" content="{description}">
+<meta property="og:url" content="{url}">
+{og_image}<script type="application/ld+json">{json_ld}</script>
+<style>body{{max-width:42rem;margin:0 auto;padding:1rem;font-family:sans-serif;line-height:1.8;color:#222}}img{{max-width:100%;height:auto}}.meta{{color:#666;font-size:.9rem}}</style>
+</head>
+<body>
+<p><a href="{home}">{site}</a></p>
+<article>
+<h1>{title}</h1>
+<p class="meta">{meta}</p>
+{image}{body}
+</article>
+</body>
+</html>
+"""
+
+INDEX_TEMPLATE = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{site} - アートのトレンドと今日の一枚</title>
+<link rel="canonical" href="{url}">
+<style>body{{max-width:42rem;margin:0 auto;padding:1rem;font-family:sans-serif;line-height:1.8}}.meta{{color:#666;font-size:.9rem}}</style>
+</head>
+<body>
+<h1>{site}</h1>
+<ul>
+{items}
+</ul>
+</body>
+</html>
+"""
+
+
+def page_fields(table, row):
+    """ページに表示する値をまとめる（ハッシュもこの値から作る）"""
+    if table == 'trending_articles':
+        meta = " / ".join(part for part in [row.get('keyword'), (row.get('published_at') or "")[:10]] if part)
+        return {
+            "title": row.get('title') or "",
+            "description": row.get('summary') or "",
+            "meta": meta,
+            "content": row.get('content') or row.get('summary') or "",
+            "image_url": row.get('image_url'),
+            "date": (row.get('published_at') or "")[:10],
+        }
+    meta = " / ".join(part for part in [row.get('artist'), row.get('display_date')] if part)
+    return {
+        "title": row.get('title') or "",
+        "description": ((row.get('content') or "")[:120]),
+        "meta": meta,
+        "content": row.get('content') or "",
+        "image_url": row.get('image_url'),
+        "date": row.get('display_date') or "",
+    }
+
+
+def render_body(text):
+    """本文の改行を段落に変換する（空行・改行のどちらも段落の区切りとして扱う）"""
+    paragraphs = [line.strip() for line in text.splitlines() if line.strip()]
+    return "\n".join(f"<p>{escape(p)}</p>" for p in paragraphs)
+
+
+def render_page(fields, url, base_url):
+    json_ld = {
+        "@context": "https://schema.org",
+        "@type": "Article",
+        "headline": fields["title"],
+        "description": fields["description"],
+        "url": url,
+        "publisher": {"@type": "Organization", "name": SITE_NAME},
+    }
+    if fields["date"]:
+        json_ld["datePublished"] = fields["date"]
+    if fields["image_url"]:
+        json_ld["image"] = fields["image_url"]
+
+    image_url = fields["image_url"]
+    return PAGE_TEMPLATE.format(
+        site=SITE_NAME,
+        title=escape(fields["title"]),
+        description=escape(fields["description"]),
+        url=escape(url),
+        home=escape(f"{base_url}/index.html"),
+        meta=escape(fields["meta"]),
+        og_image=f'<meta property="og:image" content="{escape(image_url)}">\n' if image_url else "",
+        image=f'<img src="{escape(image_url)}" alt="{escape(fields["title"])}" loading="lazy">\n' if image_url else "",
+        body=render_body(fields["content"]),
+        # "</" inside JSON would end the script element early
+        json_ld=json.dumps(json_ld, ensure_ascii=False).replace("</", "<\\/"),
+    )
+
+
+def render_index(pages, base_url):
+    newest = sorted(pages.items(), key=lambda kv: kv[1]["date"], reverse=True)[:INDEX_LIMIT]
+    items = "\n".join(
+        f'<li><a href="{escape(f"{base_url}/{path}")}">{escape(page["title"])}</a> '
+        f'<span class="meta">{escape(page["date"])}</span></li>'
+        for path, page in newest
+    )
+    return INDEX_TEMPLATE.format(site=SITE_NAME, url=escape(f"{base_url}/index.html"), items=items)
+
+
+def render_sitemap(pages, base_url):
+    entries = [f"<url><loc>{escape(base_url)}/index.html</loc></url>"]
+    for path in sorted(pages):
+        entries.append(f"<url><loc>{escape(f'{base_url}/{path}')}</loc><lastmod>{pages[path]['lastmod']}</lastmod></url>")
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            + "\n".join(entries) + "\n</urlset>\n")
+
+
+def load_manifest(supabase):
+    try:
+        return json.loads(supabase.storage.from_(BUCKET).download(MANIFEST_PATH))
+    except Exception:
+        return {"pages": {}}
+
+
+def main(dry_run=False, force=False, output=None):
+    # Configuration
+    supabase_url = os.environ.get("SUPABASE_URL", "").strip()
+    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+
+    if not supabase_url or not supabase_key:
+        print("Error: Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY environment variables.")
+        return
+
+    base_url = (os.environ.get("STATIC_SITE_BASE_URL", "").strip()
+                or f"{supabase_url.rstrip('/')}/storage/v1/object/public/{BUCKET}").rstrip('/')
+    supabase: Client = create_client(supabase_url, supabase_key)
+
+    manifest = load_manifest(supabase)
+    old_pages = {} if force or manifest.get("template_version") != TEMPLATE_VERSION else manifest.get("pages", {})
+    today = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+    pages = {}
+    changed = {}
+    for table, source in SOURCES.items():
+        try:
+            rows = fetch_all(supabase, table, source['columns'],
+                             apply_filters=lambda q, source=source: source['filters'](q, today))
+        except Exception as e:
+            print(f"[{table}] Error fetching rows: {e}")
+            return
+
+        for row in rows:
+            path = f"{source['prefix']}/{row['id']}.html"
+            fields = page_fields(table, row)
+            page_hash = content_hash(TEMPLATE_VERSION, base_url, *fields.values())
+            previous = old_pages.get(path)
+            if previous and previous.get("hash") == page_hash:
+                pages[path] = previous
+                continue
+            pages[path] = {"hash": page_hash, "title": fields["title"], "date": fields["date"], "lastmod": today}
+            changed[path] = render_page(fields, f"{base_url}/{path}", base_url)
+        print(f"[{table}] {len(rows)} published rows.")
+
+    # Removals that failed last time are retried along with pages that left the source tables
+    removed = sorted((set(manifest.get("pages", {})) | set(manifest.get("pending_removals", []))) - set(pages))
+    print(f"{len(changed)} pages to render, {len(pages) - len(changed)} unchanged, {len(removed)} to remove.")
+    if not changed and not removed and not manifest.get("needs_rebuild"):
+        print("Nothing to publish.")
+        return
+
+    if output or dry_run:
+        files = dict(changed)
+        files["index.html"] = render_index(pages, base_url)
+        files["sitemap.xml"] = render_sitemap(pages, base_url)
+
+    if output:
+        for path, html in files.items():
+            target = Path(output) / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(html, encoding="utf-8")
+        print(f"Wrote {len(files)} files to {output}")
+
+    if dry_run:
+        print(f"[DRY RUN] Would upload {len(files)} files and remove {len(removed)} pages.")
+        return
+
+    def upload(item):
+        path, text = item
+        if path == "sitemap.xml":
+            content_type, cache_control = "application/xml", INDEX_CACHE_CONTROL
+        else:
+            content_type = "text/html; charset=utf-8"
+            cache_control = INDEX_CACHE_CONTROL if path == "index.html" else PAGE_CACHE_CONTROL
+        try:
+            upload_object(supabase, BUCKET, path, text.encode("utf-8"), content_type, cache_control)
+            return None
+        except Exception as e:
+            return f"{path}: {e}"
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+        errors = [e for e in executor.map(upload, changed.items()) if e]
+    failed = {error.split(":", 1)[0] for error in errors}
+    # Failed pages are left out of the manifest (so the next run retries them) and out of
+    # the index and sitemap, which are rendered only now so they never point at a missing page
+    for path in failed:
+        pages.pop(path, None)
+    for path, text in (("index.html", render_index(pages, base_url)),
+                       ("sitemap.xml", render_sitemap(pages, base_url))):
+        error = upload((path, text))
+        if error:
+            errors.append(error)
+            failed.add(path)
+
+    for error in errors:
+        print(f"  - Upload failed: {error}")
+
+    # Only forget a removed page once its file is gone; failed chunks are retried next run
+    pending_removals = []
+    for paths in chunked(removed, 100):
+        try:
+            supabase.storage.from_(BUCKET).remove(paths)
+        except Exception as e:
+            print(f"Error removing pages: {e}")
+            pending_removals.extend(paths)
+
+    new_manifest = {
+        "template_version": TEMPLATE_VERSION,
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "pages": pages,
+        "pending_removals": pending_removals,
+        # A failed index/sitemap upload has no page of its own to retry, so force a rebuild next run
+        "needs_rebuild": bool(failed & {"index.html", "sitemap.xml"}),
+    }
+    try:
+        upload_object(supabase, BUCKET, MANIFEST_PATH, json.dumps(new_manifest, ensure_ascii=False).encode("utf-8"),
+                      "application/json", "no-cache")
+    except Exception as e:
+        print(f"Error uploading manifest: {e}")
+        return
+
+    print(f"Published {len(changed) - len(failed & set(changed))} pages, removed {len(removed) - len(pending_removals)}. "
+          f"Sitemap: {base_url}/sitemap.xml")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Render published articles to static HTML and a sitemap.")
+    parser.add_argument("--dry-run", action="store_true", help="Render but do not upload")
+    parser.add_argument("--force", action="store_true", help="Re-render every page")
+    parser.add_argument("--output", help="Also write the rendered files under this local directory")
+    args = parser.parse_args()
+    main(dry_run=args.dry_run, force=args.force, output=args.output)
@@ -0,0 +1,182 @@
+"""
+Run Journal - クローラー実行の進捗を追記専用で記録し、失敗した実行を途中から再開する
+生成結果（Geminiのレスポンス）と各アイテムの完了ステージを残すことで、
+再実行時に完了済みの外部呼び出しを繰り返さない
+
+記録先は run_journal_entries テーブル（CIのランナーは実行ごとに消えるため）。
+テーブルに届かない場合はローカルの JSONL（RUN_JOURNAL_DIR）に記録する。
+--dry-run の実行は本番の実行とは別の記録として扱い、互いに再開しない。
+"""
+import os
+import json
+import time
+import uuid
+import datetime
+from pathlib import Path
+from batch_utils import fetch_all
+
+JOURNAL_DIR = Path(os.environ.get("RUN_JOURNAL_DIR", Path(__file__).parent.parent / ".run_journal"))
+JOURNAL_TABLE = 'run_journal_entries'
+RESUME_MAX_AGE_HOURS = 24  # これより古い未完了の実行は再開しない
+RETENTION_DAYS = 7         # テーブルに残す期間
+MAX_ITEM_ATTEMPTS = 3      # アイテムがこの回数失敗したら諦め、実行の完了を妨げない
+
+RUN_ITEM = "_run"
+
+
+def _is_completed(entries):
+    return any(e["item"] == RUN_ITEM and e["stage"] == "completed" for e in entries)
+
+
+class _FileStore:
+    """ローカルの JSONL（1実行1ファイル）"""
+
+    def __init__(self, job, dry_run):
+        self.job_dir = JOURNAL_DIR / (f"{job}-dry-run" if dry_run else job)
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+
+    def find_unfinished(self):
+        cutoff = time.time() - RESUME_MAX_AGE_HOURS * 3600
+        candidates = sorted(
+            (p for p in self.job_dir.glob("*.jsonl") if p.stat().st_mtime >= cutoff),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        for path in candidates:
+            entries = self._read(path)
+            if not _is_completed(entries):
+                return path.stem, entries
+        return None, []
+
+    @staticmethod
+    def _read(path):
+        entries = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 書き込み途中で落ちた最終行は無視する
+                    break
+        return entries
+
+    def append(self, run_id, entry):
+        """1行ごとにfsyncしてクラッシュに備える"""
+        with open(self.job_dir / f"{run_id}.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class _TableStore:
+    """run_journal_entries テーブル（1ステージ1行）"""
+
+    def __init__(self, supabase, job, dry_run):
+        self.supabase = supabase
+        self.job = job
+        self.dry_run = dry_run
+
+    def find_unfinished(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cutoff = (now - datetime.timedelta(hours=RESUME_MAX_AGE_HOURS)).isoformat()
+        # Paginate in insertion order (id) so the newest runs are never cut off by the row limit
+        rows = fetch_all(
+            self.supabase, JOURNAL_TABLE, 'run_id, item, stage, payload, created_at',
+            apply_filters=lambda q: q.eq('job', self.job).eq('dry_run', self.dry_run).gte('created_at', cutoff),
+        )
+
+        runs = {}
+        for row in rows:
+            runs.setdefault(row['run_id'], []).append(row)
+        # Newest run first (dicts keep insertion order, so the last key has the newest first entry)
+        for run_id in reversed(list(runs)):
+            if not _is_completed(runs[run_id]):
+                return run_id, runs[run_id]
+        return None, []
+
+    def append(self, run_id, entry):
+        self.supabase.table(JOURNAL_TABLE).insert({
+            "job": self.job,
+            "run_id": run_id,
+            "dry_run": self.dry_run,
+            "item": entry["item"],
+            "stage": entry["stage"],
+            "payload": entry["payload"],
+        }).execute()
+
+    def prune(self):
+        cutoff = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=RETENTION_DAYS)).isoformat()
+        self.supabase.table(JOURNAL_TABLE).delete().eq('job', self.job).lt('created_at', cutoff).execute()
+
+
+class RunJournal:
+    def __init__(self, job, run_id, store, entries=None):
+        self.job = job
+        self.run_id = run_id
+        self.store = store
+        self._stages = {}
+        for entry in entries or []:
+            self._stages[(entry["item"], entry["stage"])] = entry.get("payload")
+
+    @classmethod
+    def open(cls, job, resume=True, supabase=None, dry_run=False):
+        """未完了の直近の実行があれば再開し、なければ新しい実行を始める
+
+        supabase を渡すとテーブルに記録する（届かなければローカルファイルに切り替える）。
+        """
+        store = None
+        run_id, entries = None, []
+        if supabase is not None:
+            store = _TableStore(supabase, job, dry_run)
+            try:
+                store.prune()
+                if resume:
+                    run_id, entries = store.find_unfinished()
+            except Exception as e:
+                print(f"WARNING: Could not read the run journal table, using local files: {e}")
+                store = None
+        if store is None:
+            store = _FileStore(job, dry_run)
+            if resume:
+                run_id, entries = store.find_unfinished()
+
+        label = " (dry run)" if dry_run else ""
+        if run_id:
+            print(f"Resuming run {run_id}{label} ({len(entries)} journal entries).")
+            return cls(job, run_id, store, entries)
+
+        run_id = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        print(f"Starting run {run_id}{label}.")
+        return cls(job, run_id, store)
+
+    def has(self, item, stage):
+        return (item, stage) in self._stages
+
+    def get(self, item, stage, default=None):
+        return self._stages.get((item, stage), default)
+
+    def record(self, item, stage, payload=None):
+        """ステージの完了を追記する"""
+        entry = {"item": item, "stage": stage, "payload": payload, "at": time.time()}
+        try:
+            self.store.append(self.run_id, entry)
+        except Exception as e:
+            # Keep going: losing a journal entry only means that stage is repeated on resume
+            print(f"WARNING: Could not write journal entry {item}/{stage}: {e}")
+        self._stages[(item, stage)] = payload
+
+    def record_failure(self, item, error):
+        """アイテムの失敗を記録して、これまでの失敗回数を返す"""
+        attempts = self.failures(item) + 1
+        self.record(item, "failed", {"attempts": attempts, "error": str(error)[:500]})
+        return attempts
+
+    def failures(self, item):
+        return (self.get(item, "failed") or {}).get("attempts", 0)
+
+    def gave_up(self, item):
+        """MAX_ITEM_ATTEMPTS 回失敗したアイテム（再開しても再試行しない）"""
+        return self.failures(item) >= MAX_ITEM_ATTEMPTS
+
+    def complete(self):
+        self.record(RUN_ITEM, "completed")
@@ -2,62 +2,26 @@
 """
 Seasonal Exhibitions - 毎年恒例の展示会を季節に応じて自動生成
 正倉院展、院展、日展などの定期開催展覧会を特集記事化
+開催日と告知開始日は seasonal_exhibitions テーブルで管理し、記事を出すべき回をまとめて1回のリクエストで生成する
 """
 import os
 import json
 from pathlib import Path
-from datetime import datetime
+from datetime import date, datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import google.generativeai as genai
 from supabase import create_client, Client
+from model_router import get_model, print_usage_report
+from job_lease import LeaseLostError, acquire_job_lease
+from records import Article, strip_code_fence
 
 # Load .env from project root
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(env_path)
 
-# 毎年恒例の展示会リスト
-SEASONAL_EXHIBITIONS = [
-    {
-        "name": "正倉院展",
-        "month": 10,  # 10-11月
-        "venue": "奈良国立博物館",
-        "description": "正倉院宝物を年に一度だけ公開する特別展。奈良時代の国宝級宝物が間近で見られる貴重な機会。",
-        "official_url": "https://www.narahaku.go.jp/",
-        "image_query": "Shosoin treasure Japan"
-    },
-    {
-        "name": "日展",
-        "month": 11,  # 10-12月
-        "venue": "国立新美術館",
-        "description": "日本最大規模の総合美術展。日本画、洋画、彫刻、工芸、書の5部門で構成される公募展。",
-        "official_url": "https://nitten.or.jp/",
-        "image_query": "Nitten art exhibition Japan"
-    },
-    {
-        "name": "院展",
-        "month": 9,
-        "venue": "東京都美術館",
-        "description": "日本美術院主催の日本画公募展。横山大観らが創設した伝統ある展覧会。",
-        "official_url": "https://nihonbijutsuin.or.jp/",
-        "image_query": "Inten Japanese painting exhibition"
-    },
-    {
-        "name": "二科展",
-        "month": 9,
-        "venue": "国立新美術館",
-        "description": "1914年創設の歴史ある洋画・彫刻・デザインの公募展。",
-        "official_url": "https://www.nika.or.jp/",
-        "image_query": "Nika art exhibition Japan"
-    },
-    {
-        "name": "東京国立博物館 新春特別公開",
-        "month": 1,
-        "venue": "東京国立博物館",
-        "description": "国宝・重要文化財を含む特別な作品を新年に公開する恒例行事。",
-        "official_url": "https://www.tnm.jp/",
-        "image_query": "Tokyo National Museum treasure"
-    },
-]
+# Wikimedia の画像検索を並列で行う数
+IMAGE_LOOKUP_WORKERS = 4
 
 
 def get_wikimedia_image_url(query):
@@ -103,6 +67,38 @@ def get_wikimedia_image_url(query):
     return ""
 
 
+def article_title(exhibition):
+    year = date.fromisoformat(exhibition['starts_on']).year
+    return f"【特集】{year}年 {exhibition['name']}の見どころ"
+
+
+def build_prompt(exhibitions):
+    sections = []
+    for exhibition in exhibitions:
+        sections.append(f"""
+        ### id: {exhibition['id']}
+        展覧会: {date.fromisoformat(exhibition['starts_on']).year}年の「{exhibition['name']}」
+        会期: {exhibition['starts_on']} 〜 {exhibition['ends_on']}
+        会場: {exhibition['venue']}
+        概要: {exhibition['description']}
+        公式サイト: {exhibition['official_url']}
+        """)
+
+    return f"""
+    以下の{len(exhibitions)}件の展覧会について、それぞれの情報をもとに詳細な特集記事を作成してください。
+
+    {"".join(sections)}
+
+    以下のJSON形式で、id ごとに出力してください。JSON以外の余計なテキストは含めないでください。
+    {{
+      "<id>": {{
+        "summary": "今年の見どころを50文字程度で",
+        "content": "今年の開催情報、注目の展示品、混雑予想、おすすめの鑑賞ポイントなど300-400文字で詳しく解説"
+      }}
+    }}
+    """
+
+
 def main(dry_run=False):
     # Configuration
     gemini_api_key = os.environ.get("GEMINI_API_KEY", "").strip()
@@ -116,93 +112,97 @@ def main(dry_run=False):
     genai.configure(api_key=gemini_api_key)
     supabase: Client = create_client(supabase_url, supabase_key)
 
-    current_month = datetime.now().month
-    next_month = (current_month % 12) + 1
+    # Skip (or wait) if another run is already generating trending articles
+    lease = acquire_job_lease(supabase, 'trending_articles')
+    if not lease:
+        return
 
-    print(f"Current month: {current_month}, Next month: {next_month}")
-    print("Checking for seasonal exhibitions...")
+    today = date.today()
+    print(f"Checking for seasonal exhibitions due on {today}...")
 
-    # Check existing articles
+    # Exhibitions whose feature window (lead time .. closing day) contains today
     try:
-        existing_data = supabase.table('trending_articles').select('title').execute()
-        existing_titles = [item['title'] for item in existing_data.data]
+        due = supabase.rpc('due_seasonal_exhibitions', {'on_date': today.isoformat()}).execute().data
+    except Exception as e:
+        print(f"Error fetching the seasonal calendar: {e}")
+        return
+
+    # Articles published before the calendar tracked article_published_at
+    try:
+        titles = [article_title(ex) for ex in due]
+        existing = supabase.table('trending_articles').select('title').in_('title', titles).execute() if titles else None
+        existing_titles = {item['title'] for item in existing.data} if existing else set()
     except Exception as e:
         print(f"Error fetching existing articles: {e}")
-        existing_titles = []
+        existing_titles = set()
 
-    # Filter exhibitions for current or next month
-    relevant_exhibitions = [
-        ex for ex in SEASONAL_EXHIBITIONS 
-        if ex['month'] in [current_month, next_month]
-    ]
+    relevant_exhibitions = []
+    for exhibition in due:
+        if article_title(exhibition) in existing_titles:
+            print(f"Skipping (already exists): {article_title(exhibition)}")
+        else:
+            relevant_exhibitions.append(exhibition)
 
     if not relevant_exhibitions:
         print("No seasonal exhibitions for this period.")
         return
 
-    print(f"Found {len(relevant_exhibitions)} relevant exhibitions.")
-
-    # Use Gemini to generate detailed articles
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    year = datetime.now().year
+    print(f"Found {len(relevant_exhibitions)} relevant exhibitions. Generating all articles in one request...")
 
-    for exhibition in relevant_exhibitions:
-        article_title = f"【特集】{year}年 {exhibition['name']}の見どころ"
-        
-        if article_title in existing_titles:
-            print(f"Skipping (already exists): {article_title}")
-            continue
-
-        print(f"Generating article for: {exhibition['name']}")
-
-        prompt = f"""
-        {year}年の「{exhibition['name']}」について、以下の情報をもとに詳細な記事を作成してください。
-
-        会場: {exhibition['venue']}
-        概要: {exhibition['description']}
-        公式サイト: {exhibition['official_url']}
-
-        以下のJSON形式で出力してください：
-        {{
-          "title": "{article_title}",
-          "summary": "今年の見どころを50文字程度で",
-          "content": "今年の開催情報、注目の展示品、混雑予想、おすすめの鑑賞ポイントなど300-400文字で詳しく解説"
-        }}
-        """
+    # Look up images in parallel while Gemini writes the articles
+    with ThreadPoolExecutor(max_workers=IMAGE_LOOKUP_WORKERS) as executor:
+        image_futures = {
+            ex['id']: executor.submit(get_wikimedia_image_url, ex['image_query'])
+            for ex in relevant_exhibitions
+        }
 
+        model = get_model('article')
         try:
-            response = model.generate_content(prompt)
-            text = response.text
-            
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0]
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0]
-            
-            article = json.loads(text.strip())
+            response = model.generate_content(build_prompt(relevant_exhibitions))
+            generated = json.loads(strip_code_fence(response.text))
+            if not isinstance(generated, dict):
+                raise ValueError("expected a JSON object keyed by id")
+        except Exception as e:
+            print(f"Error generating articles: {e}")
+            return
 
-            # Get image
-            image_url = get_wikimedia_image_url(exhibition['image_query'])
+        image_urls = {ex_id: future.result() for ex_id, future in image_futures.items()}
 
-            data = {
-                "title": article['title'],
-                "summary": article['summary'],
-                "content": article['content'],
-                "image_url": image_url,
-                "source_url": exhibition['official_url'],
+    rows = []
+    published_ids = []
+    for exhibition in relevant_exhibitions:
+        try:
+            article = Article.from_dict({
+                **(generated.get(str(exhibition['id'])) or {}),
+                "title": article_title(exhibition),
                 "keyword": "特集",
-                "is_published": True
-            }
-
-            if dry_run:
-                print(f"  [DRY RUN] Would insert: {data['title']}")
-            else:
-                supabase.table('trending_articles').insert(data).execute()
-                print(f"  - Inserted: {data['title']}")
+                "source_url": exhibition['official_url'],
+            })
+        except (TypeError, ValueError) as e:
+            print(f"  - No usable article for {exhibition['name']}: {e}")
+            continue
+        rows.append(article.to_row(image_urls.get(exhibition['id'], "")))
+        published_ids.append(exhibition['id'])
 
+    if dry_run:
+        for row in rows:
+            print(f"  [DRY RUN] Would insert: {row['title']}")
+    elif rows:
+        try:
+            lease.check()
+            supabase.table('trending_articles').insert(rows).execute()
+            supabase.table('seasonal_exhibitions').update({
+                'article_published_at': datetime.now(timezone.utc).isoformat(),
+            }).in_('id', published_ids).execute()
+            for row in rows:
+                print(f"  - Inserted: {row['title']}")
+        except LeaseLostError as e:
+            print(f"Error: {e}")
+            return
         except Exception as e:
-            print(f"  - Error generating article: {e}")
+            print(f"  - Error saving articles: {e}")
 
+    print_usage_report()
     print("\nSeasonal exhibitions update completed.")
 
 
@@ -1,10 +1,35 @@
 import os
 import json
+import math
 import datetime
 import urllib.request
 import urllib.parse
 import google.generativeai as genai
 from supabase import create_client, Client
+from batch_utils import fetch_all
+from run_journal import RunJournal, RUN_ITEM
+from gemini_batch import get_backend, submit_job, collect_results
+from model_router import get_model, model_for, print_usage_report
+from job_lease import acquire_job_lease
+from records import DailyArt, decode_records, parse_records
+
+# How many days ahead the calendar should be filled
+SCHEDULE_HORIZON_DAYS = 30
+# Extra works requested to absorb duplicates that get skipped
+OVERGENERATION_RATIO = 0.2
+
+# Batch mode: works per prompt, and themes rotated across prompts to avoid overlap
+BATCH_WORKS_PER_PROMPT = 30
+BATCH_THEMES = [
+    "印象派・ポスト印象派",
+    "日本美術（浮世絵・日本画）",
+    "ルネサンス",
+    "バロック・ロココ",
+    "ロマン主義・写実主義",
+    "近代・現代美術",
+    "北方ヨーロッパ絵画",
+    "アジア・その他の地域の名作",
+]
 
 def get_wikimedia_image_url(query):
     if not query:
@@ -52,7 +77,80 @@ def get_wikimedia_image_url(query):
         print(f"Error searching Wikimedia for '{query}': {e}")
     return ""
 
-def main():
+def plan_missing_dates(supabase, start_date, horizon_days):
+    """Return the dates in [start_date, start_date + horizon_days) that have no column yet."""
+    end_date = start_date + datetime.timedelta(days=horizon_days - 1)
+    scheduled = supabase.table('daily_columns').select('display_date') \
+        .gte('display_date', start_date.isoformat()) \
+        .lte('display_date', end_date.isoformat()) \
+        .execute()
+    taken = {row['display_date'] for row in scheduled.data}
+
+    return [
+        start_date + datetime.timedelta(days=i)
+        for i in range(horizon_days)
+        if (start_date + datetime.timedelta(days=i)).isoformat() not in taken
+    ]
+
+def build_instructions(exclusion_text=""):
+    """Cached prefix of the prompt: role, format and the exclusion list.
+
+    The exclusion list is by far the largest part, and it only changes when works are added,
+    so it belongs in the cache (keyed by content hash) rather than in every request.
+    """
+    return f"""
+    あなたは西洋・日本を含む世界の名画を紹介する美術キュレーターです。
+    依頼された数の作品を、有名どころ（ゴッホ、モネ、北斎など）を中心に選んでください。
+    {exclusion_text}
+
+    各作品について、以下のJSON形式で出力してください。
+    JSON以外の余計なテキストは含めないでください。
+
+    JSON形式:
+    [
+      {{
+        "title": "作品名",
+        "artist": "画家名",
+        "image_search_query": "Wikimedia Commonsで画像を検索するためのキーワード（例: The Starry Night Van Gogh）。",
+        "content": "なぜ名画なのかを解説する200文字程度の文章"
+      }}
+    ]
+    """
+
+def build_request(count, theme=None):
+    """Per-call part of the prompt: count and theme."""
+    theme_text = f"今回は「{theme}」の作品から選んでください。" if theme else ""
+    return f"世界の名画を{count}作品選んでください。{theme_text}"
+
+def generate_arts_in_batch(gemini_api_key, model, request_count, instructions, journal):
+    """Split the request into themed prompts and run them as one Gemini batch job."""
+    backend = get_backend(gemini_api_key, model_for('article'), generate=lambda p: model.generate_content(p).text)
+
+    # Poll the job submitted by an interrupted run instead of submitting again
+    job_id = journal.get(RUN_ITEM, 'batch_job')
+    if not job_id:
+        prompts = {}
+        for i, offset in enumerate(range(0, request_count, BATCH_WORKS_PER_PROMPT)):
+            count = min(BATCH_WORKS_PER_PROMPT, request_count - offset)
+            prompts[f"part-{i:03d}"] = build_request(count, BATCH_THEMES[i % len(BATCH_THEMES)])
+        job_id = submit_job(backend, f"seed_daily_art-{journal.run_id}", prompts,
+                            instructions=instructions, cache_name='seed_daily_art')
+        journal.record(RUN_ITEM, 'batch_job', job_id)
+
+    arts = []
+    for key, text in collect_results(backend, job_id):
+        if not text:
+            continue
+        try:
+            parsed = parse_records(DailyArt, text)
+        except Exception as e:
+            print(f"  - Error parsing batch result {key}: {e}")
+            continue
+        print(f"  - {key}: {len(parsed)} art pieces")
+        arts.extend(parsed)
+    return arts
+
+def main(horizon_days=SCHEDULE_HORIZON_DAYS, dry_run=False, fresh=False, batch=False):
     # ... (Configuration)
     gemini_api_key = os.environ.get("GEMINI_API_KEY", "").strip()
     supabase_url = os.environ.get("SUPABASE_URL", "").strip()
@@ -65,110 +163,136 @@ def main():
     genai.configure(api_key=gemini_api_key)
     supabase: Client = create_client(supabase_url, supabase_key)
 
-    # 2. Fetch existing data and last date
-    print("Fetching existing data to avoid duplicates and determine start date...")
-    start_date = datetime.date.today() + datetime.timedelta(days=1)
+    # Skip (or wait) if another run is already generating the daily art calendar
+    lease = acquire_job_lease(supabase, 'daily_columns')
+    if not lease:
+        return
+
+    # 2. Fetch existing titles and plan the missing dates
+    print("Fetching existing data to avoid duplicates and find unscheduled dates...")
+    start_date = datetime.date.today()
     existing_titles = []
     
     try:
         # Fetch titles
-        existing_data = supabase.table('daily_columns').select('title').execute()
-        existing_titles = [item['title'] for item in existing_data.data]
+        existing_titles = [item['title'] for item in fetch_all(supabase, 'daily_columns', 'id, title')]
         print(f"Found {len(existing_titles)} existing art pieces.")
 
-        # Fetch max date
-        # Note: Supabase/PostgREST doesn't support max() directly in select without rpc or complex query sometimes.
-        # We can order by display_date desc limit 1.
-        last_date_data = supabase.table('daily_columns').select('display_date').order('display_date', desc=True).limit(1).execute()
-        if last_date_data.data:
-            last_date_str = last_date_data.data[0]['display_date']
-            # Parse YYYY-MM-DD
-            last_date = datetime.datetime.strptime(last_date_str, "%Y-%m-%d").date()
-            if last_date >= datetime.date.today():
-                start_date = last_date + datetime.timedelta(days=1)
-                print(f"Found future schedule. Starting from {start_date}")
+        # Fetch the scheduled dates of the horizon in one query and compute the holes
+        missing_dates = plan_missing_dates(supabase, start_date, horizon_days)
     except Exception as e:
         print(f"Error fetching existing data: {e}")
+        return
+
+    if not missing_dates:
+        print(f"Calendar is already filled for the next {horizon_days} days. Nothing to do.")
+        return
+
+    # Resume an unfinished run so finished Gemini/Wikimedia calls are not repeated
+    journal = RunJournal.open('seed_daily_art', resume=not fresh, supabase=supabase, dry_run=dry_run)
+
+    request_count = math.ceil(len(missing_dates) * (1 + OVERGENERATION_RATIO))
+    print(f"Found {len(missing_dates)} unscheduled dates ({missing_dates[0]} ~ {missing_dates[-1]}). Requesting {request_count} works.")
 
     exclusion_text = ""
     if existing_titles:
-        exclusion_list = ", ".join(existing_titles)
+        # Sorted so the cached prefix (and its hash) only changes when the set of works changes
+        exclusion_list = ", ".join(sorted(set(existing_titles)))
         exclusion_text = f"以下の作品は既に存在するため、絶対に生成しないでください: {exclusion_list}"
+    instructions = build_instructions(exclusion_text)
 
     # 3. Prompt Gemini
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    prompt = f"""
-    西洋・日本を含む世界の名画を30作品選んでください。有名どころ（ゴッホ、モネ、北斎など）を中心に。
-    
-    {exclusion_text}
+    model = get_model('article')
 
-    各作品について、以下のJSON形式で出力してください。
-    JSON以外の余計なテキストは含めないでください。
-
-    JSON形式:
-    [
-      {{
-        "title": "作品名",
-        "artist": "画家名",
-        "image_search_query": "Wikimedia Commonsで画像を検索するためのキーワード（例: The Starry Night Van Gogh）。",
-        "content": "なぜ名画なのかを解説する200文字程度の文章"
-      }}
-    ]
-    """
+    if journal.has(RUN_ITEM, 'generate'):
+        arts = decode_records(DailyArt, journal.get(RUN_ITEM, 'generate'))
+        print(f"Reusing {len(arts)} art pieces generated by the interrupted run.")
+    else:
+        try:
+            if batch:
+                print("Generating daily art data with a Gemini batch job...")
+                arts = generate_arts_in_batch(gemini_api_key, model, request_count, instructions, journal)
+            else:
+                print("Fetching daily art data from Gemini...")
+                # Reuses the cached prefix while the exclusion list is unchanged (e.g. a retried run)
+                model = get_model('article', instructions, 'seed_daily_art')
+                response = model.generate_content(build_request(request_count))
+                arts = parse_records(DailyArt, response.text)
+            print(f"Got {len(arts)} art pieces.")
+        except Exception as e:
+            print(f"Error fetching/parsing from Gemini: {e}")
+            return
+        journal.record(RUN_ITEM, 'generate', [art.to_dict() for art in arts])
 
-    print("Fetching daily art data from Gemini...")
-    try:
-        response = model.generate_content(prompt)
-        text = response.text
-        # Clean up markdown code blocks if present
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0]
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0]
-        
-        arts = json.loads(text.strip())
-        print(f"Got {len(arts)} art pieces.")
-    except Exception as e:
-        print(f"Error fetching/parsing from Gemini: {e}")
-        return
+    # 4. Assign works densely to the missing dates and upsert in one batch
+    rows = []
+    seen_titles = set(existing_titles)
+    remaining_dates = list(missing_dates)
 
-    # 4. Upsert to Supabase
-    
-    for i, art in enumerate(arts):
+    for art in arts:
+        if not remaining_dates:
+            break
         try:
-            display_date = start_date + datetime.timedelta(days=i)
-            print(f"Processing: {art['title']} for {display_date}")
-            
-            # Check duplicate title locally
-            if art['title'] in existing_titles:
-                print(f"Skipping duplicate: {art['title']}")
+            # Check duplicate title locally (against the DB and this batch)
+            if art.title in seen_titles:
+                print(f"Skipping duplicate: {art.title}")
                 continue
 
-            # Search Wikimedia for image URL
-            search_query = art.get('image_search_query', f"{art['title']} {art['artist']}")
-            image_url = get_wikimedia_image_url(search_query)
-            
-            if not image_url:
-                print(f"  - No image found for '{search_query}', trying title...")
-                image_url = get_wikimedia_image_url(art['title'])
+            print(f"Processing: {art.title}")
+
+            if journal.has(art.title, 'image'):
+                image_url = journal.get(art.title, 'image')
+            else:
+                # Search Wikimedia for image URL
+                search_query = art.image_search_query or f"{art.title} {art.artist}"
+                image_url = get_wikimedia_image_url(search_query)
+                
+                if not image_url:
+                    print(f"  - No image found for '{search_query}', trying title...")
+                    image_url = get_wikimedia_image_url(art.title)
+
+                journal.record(art.title, 'image', image_url)
 
             print(f"  - Image URL: {image_url}")
 
-            data = {
-                "title": art['title'],
-                "artist": art['artist'],
-                "image_url": image_url,
-                "content": art['content'],
-                "display_date": display_date.isoformat()
-            }
+            # Take a date only once the work is fully prepared, so a failure never leaves a hole
+            display_date = remaining_dates.pop(0)
+            seen_titles.add(art.title)
+            rows.append(art.to_row(image_url, display_date))
+            print(f"  - Scheduled for {display_date}")
+                
+        except Exception as e:
+            print(f"Error preparing daily art {art.title}: {e}")
 
+    if dry_run:
+        print(f"[DRY RUN] Would upsert {len(rows)} daily art pieces.")
+        # Close the dry run so the next dry run generates fresh works instead of resuming this one
+        journal.complete()
+    else:
+        try:
+            # Abort if another run took over the calendar while this one was generating
+            lease.check()
             # Upsert based on display_date
-            supabase.table('daily_columns').upsert(data, on_conflict='display_date').execute()
-                
+            if rows:
+                supabase.table('daily_columns').upsert(rows, on_conflict='display_date').execute()
+                print(f"Upserted {len(rows)} daily art pieces.")
+            journal.complete()
         except Exception as e:
-            print(f"Error upserting daily art {art.get('title')}: {e}")
+            print(f"Error upserting daily art: {e}")
+            print(f"Run {journal.run_id} can be resumed by running the script again.")
+
+    if remaining_dates:
+        print(f"Warning: {len(remaining_dates)} dates are still unscheduled (not enough unique works). Run again to fill them.")
 
+    print_usage_report()
     print("Daily art seeding completed.")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Fill unscheduled daily_columns dates with generated art pieces.")
+    parser.add_argument("--horizon", type=int, default=SCHEDULE_HORIZON_DAYS, help="Number of days ahead to fill")
+    parser.add_argument("--dry-run", action="store_true", help="Generate and report without writing")
+    parser.add_argument("--fresh", action="store_true", help="Do not resume an unfinished run")
+    parser.add_argument("--batch", action="store_true", help="Generate through the Gemini batch API (offline, cheaper)")
+    args = parser.parse_args()
+    main(horizon_days=args.horizon, dry_run=args.dry_run, fresh=args.fresh, batch=args.batch)
@@ -1,9 +1,26 @@
 import os
 import json
+import datetime
 import urllib.request
 import urllib.parse
 import google.generativeai as genai
 from supabase import create_client, Client
+from gemini_batch import get_backend, submit_job, collect_results
+from model_router import get_model, model_for, print_usage_report
+from job_lease import LeaseLostError, acquire_job_lease
+from records import Article, parse_records
+
+TOPICS_PER_PROMPT = 10
+
+# Batch mode: one prompt per focus so the topics do not overlap
+BATCH_FOCUSES = [
+    "実は怖い絵画・描かれた悲劇",
+    "画家の意外な副業・私生活",
+    "修復の失敗事例・保存の裏側",
+    "盗難・贋作事件",
+    "作品に隠された暗号やモチーフ",
+    "美術館・展覧会の知られざる歴史",
+]
 
 def get_wikimedia_image_url(query):
     if not query:
@@ -52,42 +69,11 @@ def get_wikimedia_image_url(query):
         print(f"Error searching Wikimedia for '{query}': {e}")
     return ""
 
-def main():
-    # 1. Configuration
-    gemini_api_key = os.environ.get("GEMINI_API_KEY", "").strip()
-    supabase_url = os.environ.get("SUPABASE_URL", "").strip()
-    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "").strip()
-
-    if not gemini_api_key or not supabase_url or not supabase_key:
-        print("Error: Missing environment variables.")
-        return
-
-    genai.configure(api_key=gemini_api_key)
-    supabase: Client = create_client(supabase_url, supabase_key)
-
-    # 2. Fetch existing data to avoid duplicates
-    print("Fetching existing topics to avoid duplicates...")
-    try:
-        existing_data = supabase.table('trending_articles').select('title').execute()
-        existing_titles = [item['title'] for item in existing_data.data]
-        print(f"Found {len(existing_titles)} existing topics.")
-    except Exception as e:
-        print(f"Error fetching existing topics: {e}")
-        existing_titles = []
-
-    exclusion_text = ""
-    if existing_titles:
-        # Limit to last 50 to avoid cluttering prompt too much if list is huge, 
-        # or send all if reasonable. Gemini 2.5 Flash has large context, so sending all is likely fine for now.
-        # Let's send all for now.
-        exclusion_list = ", ".join(existing_titles)
-        exclusion_text = f"以下のトピックは既に存在するため、絶対に生成しないでください: {exclusion_list}"
-
-    # 3. Prompt Gemini
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    prompt = f"""
-    「実は怖い絵画」「画家の意外な副業」「修復の失敗事例」など、SNSでバズりそうな美術ミステリーやトリビアを10個作成してください。
-    
+def build_instructions(exclusion_text=""):
+    """Cached prefix of the prompt: role, format and the exclusion list (the large, rarely changing part)."""
+    return f"""
+    あなたはSNSでバズりそうな美術ミステリーやトリビアを書く編集者です。
+    「実は怖い絵画」「画家の意外な副業」「修復の失敗事例」などのトピックを、依頼された数だけ作成してください。
     {exclusion_text}
 
     各トピックについて、以下のJSON形式で出力してください。
@@ -105,59 +91,124 @@ def main():
     ]
     """
 
-    print("Fetching trending topics from Gemini...")
-    try:
-        response = model.generate_content(prompt)
-        text = response.text
-        # Clean up markdown code blocks if present
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0]
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0]
-        
-        topics = json.loads(text.strip())
-        print(f"Got {len(topics)} topics.")
-    except Exception as e:
-        print(f"Error fetching/parsing from Gemini: {e}")
-        return
+def build_request(count, focus=None):
+    """Per-call part of the prompt: count and focus."""
+    focus_text = f"今回は「{focus}」をテーマにしてください。" if focus else ""
+    return f"美術ミステリーやトリビアを{count}個作成してください。{focus_text}"
 
-    # 4. Insert to Supabase
+def insert_topics(supabase, topics, existing_titles, lease):
+    """Insert topics whose titles are not in existing_titles (updated in place). Stops if the lease is lost."""
     # Removed clearing logic to preserve history
-    
     for topic in topics:
         try:
-            print(f"Processing: {topic['title']}")
+            print(f"Processing: {topic.title}")
             
             # Check for duplicate title again just in case
-            if topic['title'] in existing_titles:
-                print(f"Skipping duplicate: {topic['title']}")
+            if topic.title in existing_titles:
+                print(f"Skipping duplicate: {topic.title}")
                 continue
 
             # Search Wikimedia for image URL
-            search_query = topic.get('image_search_query', topic['title'])
+            search_query = topic.image_search_query or topic.title
             image_url = get_wikimedia_image_url(search_query)
             
             if not image_url:
                 print(f"  - No image found for '{search_query}', trying title...")
-                image_url = get_wikimedia_image_url(topic['title'])
+                image_url = get_wikimedia_image_url(topic.title)
 
             print(f"  - Image URL: {image_url}")
 
-            data = {
-                "title": topic['title'],
-                "summary": topic['summary'],
-                "content": topic['content'],
-                "image_url": image_url,
-                "keyword": topic['keyword'],
-                "is_published": True
-            }
-
-            supabase.table('trending_articles').insert(data).execute()
+            lease.check()
+            supabase.table('trending_articles').insert(topic.to_row(image_url)).execute()
+            existing_titles.add(topic.title)
                 
+        except LeaseLostError:
+            raise
         except Exception as e:
-            print(f"Error inserting trending topic {topic.get('title')}: {e}")
+            print(f"Error inserting trending topic {topic.title}: {e}")
+
+def main(batch=False):
+    # 1. Configuration
+    gemini_api_key = os.environ.get("GEMINI_API_KEY", "").strip()
+    supabase_url = os.environ.get("SUPABASE_URL", "").strip()
+    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+
+    if not gemini_api_key or not supabase_url or not supabase_key:
+        print("Error: Missing environment variables.")
+        return
+
+    genai.configure(api_key=gemini_api_key)
+    supabase: Client = create_client(supabase_url, supabase_key)
+
+    # Skip (or wait) if another run is already generating trending articles
+    lease = acquire_job_lease(supabase, 'trending_articles')
+    if not lease:
+        return
+
+    # 2. Fetch existing data to avoid duplicates
+    print("Fetching existing topics to avoid duplicates...")
+    try:
+        existing_data = supabase.table('trending_articles').select('title').execute()
+        existing_titles = {item['title'] for item in existing_data.data}
+        print(f"Found {len(existing_titles)} existing topics.")
+    except Exception as e:
+        print(f"Error fetching existing topics: {e}")
+        existing_titles = set()
+
+    exclusion_text = ""
+    if existing_titles:
+        # Limit to last 50 to avoid cluttering prompt too much if list is huge, 
+        # or send all if reasonable. Gemini 2.5 Flash has large context, so sending all is likely fine for now.
+        # Let's send all for now.
+        # Sorted so the cached prefix (and its hash) only changes when the set of topics changes
+        exclusion_list = ", ".join(sorted(existing_titles))
+        exclusion_text = f"以下のトピックは既に存在するため、絶対に生成しないでください: {exclusion_list}"
+    instructions = build_instructions(exclusion_text)
+
+    # 3. Prompt Gemini
+    model = get_model('article')
+
+    try:
+        if batch:
+            print("Generating trending topics with a Gemini batch job...")
+            backend = get_backend(gemini_api_key, model_for('article'), generate=lambda p: model.generate_content(p).text)
+            prompts = {
+                f"focus-{i:02d}": build_request(TOPICS_PER_PROMPT, focus)
+                for i, focus in enumerate(BATCH_FOCUSES)
+            }
+            job_id = submit_job(backend, f"seed_trends-{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}", prompts,
+                                instructions=instructions, cache_name='seed_trends')
+
+            # Ingest each prompt's topics as soon as its result is read
+            for key, text in collect_results(backend, job_id):
+                if not text:
+                    continue
+                try:
+                    topics = parse_records(Article, text)
+                except Exception as e:
+                    print(f"  - Error parsing batch result {key}: {e}")
+                    continue
+                print(f"{key}: got {len(topics)} topics.")
+                insert_topics(supabase, topics, existing_titles, lease)
+        else:
+            print("Fetching trending topics from Gemini...")
+            # Reuses the cached prefix while the exclusion list is unchanged (e.g. a retried run)
+            model = get_model('article', instructions, 'seed_trends')
+            response = model.generate_content(build_request(TOPICS_PER_PROMPT))
+            topics = parse_records(Article, response.text)
+            print(f"Got {len(topics)} topics.")
+            insert_topics(supabase, topics, existing_titles, lease)
+    except LeaseLostError as e:
+        print(f"Error: {e}")
+        return
+    except Exception as e:
+        print(f"Error fetching/parsing from Gemini: {e}")
+        return
 
+    print_usage_report()
     print("Trending topics seeding completed.")
 
 if __name__ == "__main__":
-    main()
+    import sys
+    batch = "--batch" in sys.argv
+    main(batch=batch)
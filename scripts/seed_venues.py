@@ -1,85 +1,130 @@
 import os
-import json
+import datetime
 import google.generativeai as genai
 from supabase import create_client, Client
+from venue_index import VenueIndex
+from prefectures import REGION_SHARDS, prefecture_list_text
+from gemini_batch import get_backend, submit_job, collect_results
+from model_router import get_model, model_for, print_usage_report
+from job_lease import LeaseLostError, acquire_job_lease
+from records import Venue, parse_records
 
-def main():
-    # 1. Configuration
-    gemini_api_key = os.environ.get("GEMINI_API_KEY")
-    supabase_url = os.environ.get("SUPABASE_URL")
-    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-
-    if not gemini_api_key or not supabase_url or not supabase_key:
-        print("Error: Missing environment variables.")
-        print("Please ensure GEMINI_API_KEY, SUPABASE_URL, and SUPABASE_SERVICE_ROLE_KEY are set.")
-        return
-
-    genai.configure(api_key=gemini_api_key)
-    supabase: Client = create_client(supabase_url, supabase_key)
+VENUES_PER_REGION = 15
 
-    # 2. Prompt Gemini
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    prompt = """
-    日本国内（東京、大阪、京都、愛知、金沢など）の主要な美術館・博物館を30ヶ所リストアップしてください。
+def build_prompt(count, area_text="東京、大阪、京都、愛知、金沢など"):
+    return f"""
+    日本国内（{area_text}）の主要な美術館・博物館を{count}ヶ所リストアップしてください。
     以下のJSON形式で出力してください。JSON以外の余計なテキストは含めないでください。
 
     JSON形式:
     [
-      {
+      {{
         "name": "美術館名",
         "address": "住所",
         "lat": 35.1234,
         "lon": 139.5678,
         "website_url": "https://example.com"
-      }
+      }}
     ]
     """
 
-    print("Fetching venue data from Gemini...")
-    try:
-        response = model.generate_content(prompt)
-        text = response.text
-        # Clean up markdown code blocks if present
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0]
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0]
-        
-        venues = json.loads(text.strip())
-        print(f"Got {len(venues)} venues.")
-    except Exception as e:
-        print(f"Error fetching/parsing from Gemini: {e}")
-        return
-
-    # 3. Upsert to Supabase
+def upsert_venues(supabase, venues, venue_index, lease):
+    """Update or insert each venue. Raises LeaseLostError before writing if another run took over."""
     for venue in venues:
         try:
-            print(f"Processing: {venue['name']}")
-            
-            # Check if venue exists by name
-            existing_venue = supabase.table('venues').select('id').eq('name', venue['name']).execute()
+            print(f"Processing: {venue.name}")
             
-            data = {
-                "name": venue['name'],
-                "address": venue['address'],
-                "location": f"POINT({venue['lon']} {venue['lat']})", # PostGIS format
-                "website_url": venue['website_url']
-            }
+            # Check if venue exists (notation variants resolve to the same venue)
+            venue_id = venue_index.resolve(venue.name)
 
-            if existing_venue.data and len(existing_venue.data) > 0:
-                # Update
-                venue_id = existing_venue.data[0]['id']
+            if venue_id:
+                # Update, keeping the canonical name
                 print(f"  Updating existing venue (ID: {venue_id})")
+                data = venue.to_row(venue_index.canonical_name(venue_id))
+                lease.check()
                 supabase.table('venues').update(data).eq('id', venue_id).execute()
             else:
                 # Insert
                 print(f"  Inserting new venue")
-                supabase.table('venues').insert(data).execute()
+                lease.check()
+                new_venue = supabase.table('venues').insert(venue.to_row()).execute()
+                if new_venue.data:
+                    venue_index.add(venue.name, new_venue.data[0]['id'])
                 
+        except LeaseLostError:
+            raise
         except Exception as e:
-            print(f"Error upserting venue {venue.get('name')}: {e}")
+            print(f"Error upserting venue {venue.name}: {e}")
+
+def main(batch=False):
+    # 1. Configuration
+    gemini_api_key = os.environ.get("GEMINI_API_KEY")
+    supabase_url = os.environ.get("SUPABASE_URL")
+    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+
+    if not gemini_api_key or not supabase_url or not supabase_key:
+        print("Error: Missing environment variables.")
+        print("Please ensure GEMINI_API_KEY, SUPABASE_URL, and SUPABASE_SERVICE_ROLE_KEY are set.")
+        return
+
+    genai.configure(api_key=gemini_api_key)
+    supabase: Client = create_client(supabase_url, supabase_key)
+
+    # Skip (or wait) if another run is already generating venues
+    lease = acquire_job_lease(supabase, 'venues')
+    if not lease:
+        return
+
+    # 2. Load the venue index (notation variants resolve to the same venue)
+    try:
+        venue_index = VenueIndex.load(supabase)
+    except Exception as e:
+        print(f"Error loading venue index: {e}")
+        return
+
+    # 3. Prompt Gemini and upsert to Supabase
+    model = get_model('listing')
+
+    try:
+        if batch:
+            print("Generating venue data with a Gemini batch job (one prompt per region)...")
+            backend = get_backend(gemini_api_key, model_for('listing'), generate=lambda p: model.generate_content(p).text)
+            prompts = {
+                shard['key']: build_prompt(VENUES_PER_REGION, prefecture_list_text(shard['codes']))
+                for shard in REGION_SHARDS
+            }
+            job_id = submit_job(backend, f"seed_venues-{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}", prompts)
+
+            for key, text in collect_results(backend, job_id):
+                if not text:
+                    continue
+                try:
+                    venues = parse_records(Venue, text)
+                except Exception as e:
+                    print(f"  - Error parsing batch result {key}: {e}")
+                    continue
+                print(f"{key}: got {len(venues)} venues.")
+                upsert_venues(supabase, venues, venue_index, lease)
+        else:
+            print("Fetching venue data from Gemini...")
+            response = model.generate_content(build_prompt(30))
+            venues = parse_records(Venue, response.text)
+            print(f"Got {len(venues)} venues.")
+            upsert_venues(supabase, venues, venue_index, lease)
+        lease.check()
+    except LeaseLostError as e:
+        print(f"Error: {e}")
+        return
+    except Exception as e:
+        print(f"Error fetching/parsing from Gemini: {e}")
+        return
 
+    venue_index.save_new_aliases(supabase)
+    venue_index.print_report()
+    print_usage_report()
     print("Venue seeding completed.")
 
 if __name__ == "__main__":
-    main()
+    import sys
+    batch = "--batch" in sys.argv
+    main(batch=batch)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Translate Articles - 公開済みの trending_articles と daily_columns を英語・中国語・韓国語に事前翻訳して article_translations に格納
+1回のリクエストに複数の記事をまとめ、原文（ハッシュ）が変わった記事だけを翻訳する
+"""
+import os
+import json
+from pathlib import Path
+from dotenv import load_dotenv
+import google.generativeai as genai
+from supabase import create_client, Client
+from batch_utils import chunked, content_hash, fetch_all
+from model_router import get_model, model_for, print_usage_report
+from prompt_cache import MIN_CALLS_FOR_CACHE
+
+# Load .env from project root
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(env_path)
+
+LANGUAGES = {
+    'en': 'English',
+    'zh': 'Simplified Chinese (简体中文)',
+    'ko': 'Korean (한국어)',
+}
+
+# 翻訳対象のテーブルとフィールド
+SOURCES = {
+    'trending_articles': ['title', 'summary', 'content'],
+    'daily_columns': ['title', 'artist', 'content'],
+}
+
+# 公開済みの行だけを翻訳する（非公開になった記事の翻訳は削除対象になる）
+SOURCE_FILTERS = {
+    'trending_articles': lambda q: q.eq('is_published', True),
+}
+
+ARTICLES_PER_PROMPT = 10
+MAX_CHARS_PER_PROMPT = 12000
+UPSERT_BATCH_SIZE = 100
+
+
+def source_fields(row, fields):
+    return {field: row[field] for field in fields if row.get(field)}
+
+
+def build_instructions(language_name):
+    return f"""
+    あなたは美術館の多言語ガイドを担当する翻訳者です。
+    日本語の美術記事を {language_name} に翻訳してください。
+    作品名・画家名は、その言語で一般的に使われている表記があればそれを使ってください。
+    入力はJSON配列で、各要素は "id" と翻訳するフィールドを持ちます。
+    以下のJSON形式で、すべての記事のすべてのフィールドを翻訳して出力してください。
+    JSON以外の余計なテキストは含めないでください。
+    {{"<id>": {{"<field>": "翻訳文", ...}}, ...}}
+    """
+
+
+def translate_batch(model, batch):
+    payload = [{"id": source_id, **fields} for source_id, fields, _ in batch]
+    response = model.generate_content(json.dumps(payload, ensure_ascii=False))
+    text = response.text
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0]
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0]
+    return json.loads(text.strip())
+
+
+def pack_batches(items):
+    """1プロンプトあたりの記事数と文字数に収まるようにまとめる"""
+    batches = []
+    current = []
+    size = 0
+    for item in items:
+        item_size = sum(len(value) for value in item[1].values())
+        if current and (len(current) >= ARTICLES_PER_PROMPT or size + item_size > MAX_CHARS_PER_PROMPT):
+            batches.append(current)
+            current = []
+            size = 0
+        current.append(item)
+        size += item_size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def main(languages=None, tables=None, dry_run=False):
+    # Configuration
+    gemini_api_key = os.environ.get("GEMINI_API_KEY", "").strip()
+    supabase_url = os.environ.get("SUPABASE_URL", "").strip()
+    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+
+    if not gemini_api_key or not supabase_url or not supabase_key:
+        print("Error: Missing environment variables.")
+        return
+
+    genai.configure(api_key=gemini_api_key)
+    supabase: Client = create_client(supabase_url, supabase_key)
+
+    # Fetch the source hashes of what is already translated (one paged query)
+    try:
+        existing = fetch_all(supabase, 'article_translations', 'source_table, source_id, language, source_hash', order='source_id')
+    except Exception as e:
+        print(f"Error fetching existing translations: {e}")
+        return
+    existing_hashes = {(row['source_table'], row['source_id'], row['language']): row['source_hash'] for row in existing}
+    print(f"Found {len(existing_hashes)} existing translations.")
+
+    languages = languages or list(LANGUAGES)
+    prompt_calls = 0
+    translated = 0
+
+    for table, fields in SOURCES.items():
+        if tables and table not in tables:
+            continue
+
+        try:
+            rows = fetch_all(supabase, table, 'id, ' + ', '.join(fields), apply_filters=SOURCE_FILTERS.get(table))
+        except Exception as e:
+            print(f"[{table}] Error fetching rows: {e}")
+            continue
+
+        items = []
+        for row in rows:
+            values = source_fields(row, fields)
+            if values:
+                items.append((row['id'], values, content_hash(json.dumps(values, ensure_ascii=False, sort_keys=True))))
+
+        live_ids = {row['id'] for row in rows}
+        stale_ids = sorted({source_id for (t, source_id, _) in existing_hashes if t == table and source_id not in live_ids})
+
+        for language in languages:
+            # Only articles that are new or whose source text changed
+            pending = [item for item in items if existing_hashes.get((table, item[0], language)) != item[2]]
+            batches = pack_batches(pending)
+            print(f"[{table}/{language}] {len(items)} articles, {len(pending)} to translate in {len(batches)} prompts.")
+
+            if dry_run:
+                prompt_calls += len(batches)
+                continue
+            if not batches:
+                continue
+
+            # Cache the instructions only when this language needs several prompts
+            cache_name = f"translate_{language}" if len(batches) >= MIN_CALLS_FOR_CACHE else None
+            model = get_model('translate', build_instructions(LANGUAGES[language]), cache_name)
+            upserts = []
+            for batch in batches:
+                try:
+                    result = translate_batch(model, batch)
+                    prompt_calls += 1
+                except Exception as e:
+                    print(f"[{table}/{language}] Error translating batch: {e}")
+                    continue
+
+                for source_id, values, digest in batch:
+                    translation = result.get(str(source_id)) or {}
+                    if set(values) - set(translation):
+                        print(f"  - Incomplete translation for {source_id}, will retry next run")
+                        continue
+                    upserts.append({
+                        'source_table': table,
+                        'source_id': source_id,
+                        'language': language,
+                        'source_hash': digest,
+                        'fields': {field: translation[field] for field in values},
+                        'model': model_for('translate'),
+                    })
+
+            for rows_to_write in chunked(upserts, UPSERT_BATCH_SIZE):
+                try:
+                    supabase.table('article_translations').upsert(rows_to_write, on_conflict='source_table,source_id,language').execute()
+                    translated += len(rows_to_write)
+                except Exception as e:
+                    print(f"[{table}/{language}] Error saving translations: {e}")
+
+        if dry_run:
+            continue
+
+        # Drop translations whose source article has been deleted
+        for ids in chunked(stale_ids, 100):
+            try:
+                supabase.table('article_translations').delete().eq('source_table', table).in_('source_id', ids).execute()
+            except Exception as e:
+                print(f"[{table}] Error deleting stale translations: {e}")
+
+    if dry_run:
+        print(f"\n[DRY RUN] Would make {prompt_calls} translation prompts.")
+    else:
+        print(f"\nSaved {translated} translations with {prompt_calls} prompts.")
+        print_usage_report()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Pre-translate articles into article_translations.")
+    parser.add_argument("--languages", help=f"Comma-separated language codes (default: {','.join(LANGUAGES)})")
+    parser.add_argument("--tables", help=f"Comma-separated tables to translate (default: {','.join(SOURCES)})")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be translated")
+    args = parser.parse_args()
+    main(
+        languages=args.languages.split(",") if args.languages else None,
+        tables=args.tables.split(",") if args.tables else None,
+        dry_run=args.dry_run,
+    )
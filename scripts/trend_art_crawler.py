@@ -8,6 +8,10 @@ from pathlib import Path
 from dotenv import load_dotenv
 import google.generativeai as genai
 from supabase import create_client, Client
+from model_router import get_model, print_usage_report
+from job_lease import LeaseLostError, acquire_job_lease
+from records import Article, decode_records, parse_records
+from run_journal import RunJournal, RUN_ITEM, MAX_ITEM_ATTEMPTS
 
 # Load .env from project root
 env_path = Path(__file__).parent.parent / '.env'
@@ -61,7 +65,7 @@ def get_wikimedia_image_url(query):
     return ""
 
 
-def main(dry_run=False):
+def main(dry_run=False, fresh=False):
     # Configuration
     gemini_api_key = os.environ.get("GEMINI_API_KEY", "").strip()
     supabase_url = os.environ.get("SUPABASE_URL", "").strip()
@@ -74,6 +78,11 @@ def main(dry_run=False):
     genai.configure(api_key=gemini_api_key)
     supabase: Client = create_client(supabase_url, supabase_key)
 
+    # Skip (or wait) if another run is already generating trending articles
+    lease = acquire_job_lease(supabase, 'trending_articles')
+    if not lease:
+        return
+
     # Fetch existing titles to avoid duplicates
     print("Fetching existing articles to avoid duplicates...")
     try:
@@ -90,7 +99,7 @@ def main(dry_run=False):
         exclusion_text = f"以下のトピックは既に存在するため、生成しないでください: {exclusion_list}"
 
     # Prompt Gemini for trending art topics
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    model = get_model('article')
     prompt = f"""
     現在SNSやニュースで話題の美術展・作品・アートトピックを5件作成してください。
     以下のカテゴリから幅広く選んでください：
@@ -119,64 +128,89 @@ def main(dry_run=False):
     ]
     """
 
-    print("Fetching trending art topics from Gemini...")
-    try:
-        response = model.generate_content(prompt)
-        text = response.text
-        
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0]
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0]
-        
-        topics = json.loads(text.strip())
-        print(f"Got {len(topics)} trending topics.")
-    except Exception as e:
-        print(f"Error fetching/parsing from Gemini: {e}")
-        return
+    # Resume an unfinished run so finished Gemini/Wikimedia calls are not repeated
+    journal = RunJournal.open('trend_art_crawler', resume=not fresh, supabase=supabase, dry_run=dry_run)
+
+    if journal.has(RUN_ITEM, 'generate'):
+        topics = decode_records(Article, journal.get(RUN_ITEM, 'generate'))
+        print(f"Reusing {len(topics)} trending topics generated by the interrupted run.")
+    else:
+        print("Fetching trending art topics from Gemini...")
+        try:
+            response = model.generate_content(prompt)
+            topics = parse_records(Article, response.text)
+            print(f"Got {len(topics)} trending topics.")
+        except Exception as e:
+            print(f"Error fetching/parsing from Gemini: {e}")
+            return
+        journal.record(RUN_ITEM, 'generate', [topic.to_dict() for topic in topics])
 
     # Insert to Supabase
+    retryable = False
     for topic in topics:
         try:
-            print(f"Processing: {topic['title']}")
+            print(f"Processing: {topic.title}")
             
-            if topic['title'] in existing_titles:
-                print(f"  - Skipping duplicate: {topic['title']}")
+            if journal.has(topic.title, 'insert'):
+                print(f"  - Already inserted by the interrupted run")
                 continue
 
-            # Get image from Wikimedia
-            search_query = topic.get('image_search_query', topic['title'])
-            image_url = get_wikimedia_image_url(search_query)
-            
-            if not image_url:
-                print(f"  - No image found for '{search_query}', trying title...")
-                image_url = get_wikimedia_image_url(topic['title'])
+            if journal.gave_up(topic.title):
+                print(f"  - Gave up after {journal.failures(topic.title)} failed attempts")
+                continue
+
+            if topic.title in existing_titles:
+                print(f"  - Skipping duplicate: {topic.title}")
+                continue
+
+            if journal.has(topic.title, 'image'):
+                image_url = journal.get(topic.title, 'image')
+            else:
+                # Get image from Wikimedia
+                search_query = topic.image_search_query or topic.title
+                image_url = get_wikimedia_image_url(search_query)
+                
+                if not image_url:
+                    print(f"  - No image found for '{search_query}', trying title...")
+                    image_url = get_wikimedia_image_url(topic.title)
+
+                journal.record(topic.title, 'image', image_url)
 
             print(f"  - Image URL: {image_url[:50]}..." if image_url else "  - No image found")
 
-            data = {
-                "title": topic['title'],
-                "summary": topic['summary'],
-                "content": topic['content'],
-                "image_url": image_url,
-                "keyword": topic['keyword'],
-                "source_url": topic.get('source_url', ''),
-                "is_published": True
-            }
+            data = topic.to_row(image_url)
 
             if dry_run:
                 print(f"  [DRY RUN] Would insert: {data['title']}")
             else:
+                # Stop if seed_trends/seasonal_exhibitions took over trending_articles meanwhile
+                lease.check()
                 supabase.table('trending_articles').insert(data).execute()
+                journal.record(topic.title, 'insert')
                 print(f"  - Inserted successfully!")
                 
+        except LeaseLostError as e:
+            # Leave the journal open so the next run resumes from here
+            print(f"Error: {e}")
+            return
         except Exception as e:
-            print(f"Error inserting topic {topic.get('title')}: {e}")
-
+            print(f"Error inserting topic {topic.title}: {e}")
+            # A topic that keeps failing is given up so it does not hold the run open
+            if journal.record_failure(topic.title, e) < MAX_ITEM_ATTEMPTS:
+                retryable = True
+
+    if retryable:
+        print(f"Some topics failed. Run {journal.run_id} can be resumed by running the script again.")
+    else:
+        # Dry runs complete too, so the next dry run generates fresh topics
+        journal.complete()
+
+    print_usage_report()
     print("Trend art crawling completed.")
 
 
 if __name__ == "__main__":
     import sys
     dry_run = "--dry-run" in sys.argv
-    main(dry_run=dry_run)
+    fresh = "--fresh" in sys.argv
+    main(dry_run=dry_run, fresh=fresh)
@@ -0,0 +1,121 @@
+"""
+Venue Index - 会場名の正規化とエイリアス解決
+表記揺れ（全角/半角、括弧書きの補足など）を吸収し、venuesの重複作成を防ぐ
+"""
+import re
+import unicodedata
+from batch_utils import fetch_all
+
+# 括弧書きの補足（例: 「東京都美術館（上野）」の「（上野）」）
+# NFKC後は全角括弧も半角になるため、半角と和文の括弧だけを見ればよい
+_PARENTHETICAL_RE = re.compile(r"\([^()]*\)|【[^【】]*】|〔[^〔〕]*〕|\[[^\[\]]*\]")
+_SEPARATOR_RE = re.compile(r"[\s・･\-‐－—–_.,、。·]+")
+
+
+def normalize_venue_name(name):
+    """会場名を照合用のキーに正規化する（NFKC、括弧書き除去、空白・記号除去、小文字化）"""
+    if not name:
+        return ""
+
+    text = unicodedata.normalize("NFKC", name)
+    stripped = _PARENTHETICAL_RE.sub("", text)
+    # 括弧書きしかない名前は、括弧を外して中身を使う
+    if not stripped.strip():
+        stripped = re.sub(r"[()【】〔〕\[\]]", "", text)
+
+    return _SEPARATOR_RE.sub("", stripped).lower()
+
+
+class VenueIndex:
+    """venues / venue_aliases をメモリ上の辞書に展開し、会場名をO(1)で解決する"""
+
+    def __init__(self):
+        self._ids_by_key = {}
+        self._names_by_id = {}
+        self._known_aliases = set()
+        self.new_aliases = {}  # alias -> venue_id（今回の実行で初めて見た表記）
+        self.new_venues = []
+
+    @classmethod
+    def load(cls, supabase):
+        """起動時に一度だけ venues と venue_aliases を読み込む"""
+        index = cls()
+
+        for venue in fetch_all(supabase, 'venues', 'id, name'):
+            index._register(venue['name'], venue['id'])
+            index._names_by_id[venue['id']] = venue['name']
+
+        try:
+            for alias in fetch_all(supabase, 'venue_aliases', 'alias, venue_id', order='alias'):
+                index._register(alias['alias'], alias['venue_id'])
+                index._known_aliases.add(alias['alias'])
+        except Exception as e:
+            print(f"Warning: could not load venue_aliases ({e}). Using venue names only.")
+
+        print(f"Loaded venue index: {len(index._names_by_id)} venues, {len(index._ids_by_key)} keys.")
+        return index
+
+    def _register(self, name, venue_id):
+        key = normalize_venue_name(name)
+        if key:
+            self._ids_by_key.setdefault(key, venue_id)
+
+    def __len__(self):
+        return len(self._names_by_id)
+
+    def lookup(self, name):
+        """会場名からvenue_idを返す（resolve と違い、新しい表記を記録しない）。未知の会場ならNone"""
+        return self._ids_by_key.get(normalize_venue_name(name))
+
+    def resolve(self, name):
+        """会場名からvenue_idを返す。未知の会場ならNone"""
+        venue_id = self._ids_by_key.get(normalize_venue_name(name))
+        if venue_id and name != self._names_by_id.get(venue_id) and name not in self._known_aliases:
+            self.new_aliases[name] = venue_id
+        return venue_id
+
+    def canonical_name(self, venue_id):
+        return self._names_by_id.get(venue_id)
+
+    def add(self, name, venue_id):
+        """新規に作成した会場をインデックスに追加する"""
+        self._register(name, venue_id)
+        self._names_by_id[venue_id] = name
+        self.new_venues.append(name)
+
+    def get_or_create(self, supabase, name):
+        """会場を解決し、見つからなければvenuesに1件作成する"""
+        venue_id = self.resolve(name)
+        if venue_id:
+            return venue_id
+
+        print(f"Inserting new venue: {name}")
+        new_venue = supabase.table('venues').insert({'name': name}).execute()
+        if new_venue.data:
+            venue_id = new_venue.data[0]['id']
+            self.add(name, venue_id)
+        return venue_id
+
+    def save_new_aliases(self, supabase, dry_run=False):
+        """今回見つかった表記揺れを venue_aliases に一括登録する"""
+        if not self.new_aliases:
+            return
+
+        rows = [{'alias': alias, 'venue_id': venue_id} for alias, venue_id in self.new_aliases.items()]
+        if dry_run:
+            print(f"[DRY RUN] Would save {len(rows)} venue aliases.")
+            return
+
+        try:
+            supabase.table('venue_aliases').upsert(rows, on_conflict='alias').execute()
+        except Exception as e:
+            print(f"Error saving venue aliases: {e}")
+
+    def print_report(self):
+        print("\n--- Venue resolution report ---")
+        print(f"New venues: {len(self.new_venues)}")
+        for name in self.new_venues:
+            print(f"  + {name}")
+        print(f"Newly seen aliases: {len(self.new_aliases)}")
+        for alias, venue_id in self.new_aliases.items():
+            print(f"  ~ {alias} -> {self.canonical_name(venue_id)} ({venue_id})")
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Verify Venue Maps - 未検証の venue_maps の画像が館内マップ・フロアガイドかを Gemini でまとめて判定する
+画像は image_optimizer（/process）で縮小してから、1リクエストに複数枚ずつ送る
+地図と判定された行は is_verified = TRUE、そうでない行は verification_checked_at だけを記録する
+取得できない・大きすぎる・対応していない形式の画像は verification_failures を数え、
+MAX_FETCH_FAILURES 回失敗した行は対象から外す
+"""
+import os
+import json
+import uuid
+import datetime
+import urllib.request
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import google.generativeai as genai
+from supabase import create_client, Client
+from batch_utils import chunked
+from model_router import get_model, print_usage_report
+from job_lease import LeaseLostError, acquire_job_lease
+from records import strip_code_fence
+
+# Load .env from project root
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(env_path)
+
+IMAGE_OPTIMIZER_URL = os.environ.get(
+    "IMAGE_OPTIMIZER_URL", "https://encura-993497231174.europe-west1.run.app/process"
+).strip()
+
+PAGE_SIZE = 100
+IMAGES_PER_REQUEST = 8
+FETCH_WORKERS = 8      # 画像の取得・縮小の同時実行数
+MODEL_WORKERS = 2      # Gemini リクエストの同時実行数
+HTTP_TIMEOUT_SECONDS = 30
+# Gemini のインライン画像はリクエスト全体で20MBまで（base64で約4/3倍になる）
+MAX_INLINE_IMAGE_BYTES = 1536 * 1024
+MAX_FETCH_FAILURES = 3
+
+PROMPT = """
+以下の{count}枚の画像それぞれについて、美術館・博物館の館内マップ、フロアプラン、会場案内図かどうかを判定してください。
+画像は「Image 1」から順に並んでいます。
+以下のJSON形式で出力してください。JSON以外の余計なテキストは含めないでください。
+{{"results": [{{"index": 1, "is_map": true}}, ...]}}
+"""
+
+
+def download(url):
+    req = urllib.request.Request(url, headers={'User-Agent': 'EnCura/1.0'})
+    with urllib.request.urlopen(req, timeout=HTTP_TIMEOUT_SECONDS) as response:
+        return response.read()
+
+
+def sniff_mime_type(data):
+    """Gemini が受け付ける形式（JPEG / PNG / WebP）なら MIME タイプ、それ以外は None"""
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def optimize_image(image_bytes):
+    """image_optimizer で長辺1024px・JPEGに縮小する。失敗したら元の画像を返す"""
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="image"; filename="upload.jpg"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + image_bytes + f"\r\n--{boundary}--\r\n".encode()
+    req = urllib.request.Request(IMAGE_OPTIMIZER_URL, data=body, method="POST", headers={
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+    })
+    try:
+        with urllib.request.urlopen(req, timeout=HTTP_TIMEOUT_SECONDS) as response:
+            return response.read()
+    except Exception as e:
+        print(f"  - Image optimizer failed, sending the original: {e}")
+        return image_bytes
+
+
+def fetch_image(row):
+    """(id, 画像, MIMEタイプ) を返す。送れない画像は (id, None, None)"""
+    try:
+        data = optimize_image(download(row['image_url']))
+    except Exception as e:
+        print(f"  - Could not fetch {row['image_url']}: {e}")
+        return row['id'], None, None
+
+    # The optimizer fallback returns the original bytes, so label them by their actual format
+    mime_type = sniff_mime_type(data)
+    if mime_type is None:
+        print(f"  - Unsupported image format: {row['image_url']}")
+        return row['id'], None, None
+    if len(data) > MAX_INLINE_IMAGE_BYTES:
+        print(f"  - Image too large to send inline ({len(data) // 1024} KB): {row['image_url']}")
+        return row['id'], None, None
+    return row['id'], data, mime_type
+
+
+def classify_batch(model, images):
+    """[(id, bytes, mime_type)] を1リクエストで判定して {id: is_map} を返す"""
+    parts = [PROMPT.format(count=len(images))]
+    for i, (_, data, mime_type) in enumerate(images, start=1):
+        parts.append(f"Image {i}:")
+        parts.append({"mime_type": mime_type, "data": data})
+
+    response = model.generate_content(parts, generation_config={"response_mime_type": "application/json"})
+    results = json.loads(strip_code_fence(response.text)).get("results", [])
+
+    verdicts = {}
+    for result in results:
+        index = result.get("index")
+        if isinstance(index, int) and 1 <= index <= len(images):
+            verdicts[images[index - 1][0]] = bool(result.get("is_map"))
+    return verdicts
+
+
+def _safe_classify(model, batch):
+    try:
+        return classify_batch(model, batch)
+    except Exception as e:
+        print(f"  - Error classifying batch: {e}")
+        return None
+
+
+def main(dry_run=False, limit=None):
+    # Configuration
+    gemini_api_key = os.environ.get("GEMINI_API_KEY", "").strip()
+    supabase_url = os.environ.get("SUPABASE_URL", "").strip()
+    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+
+    if not gemini_api_key or not supabase_url or not supabase_key:
+        print("Error: Missing environment variables.")
+        return
+
+    genai.configure(api_key=gemini_api_key)
+    supabase: Client = create_client(supabase_url, supabase_key)
+
+    lease = acquire_job_lease(supabase, 'venue_maps')
+    if not lease:
+        return
+
+    model = get_model('classify')
+    verified = 0
+    rejected = 0
+    skipped = 0
+    requests = 0
+    last_id = None
+
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as fetch_pool, \
+            ThreadPoolExecutor(max_workers=MODEL_WORKERS) as model_pool:
+        while limit is None or verified + rejected + skipped < limit:
+            # Keyset pagination over rows that were never checked (and have not failed too often)
+            query = supabase.table('venue_maps').select('id, image_url, verification_failures') \
+                .eq('is_verified', False).is_('verification_checked_at', 'null') \
+                .lt('verification_failures', MAX_FETCH_FAILURES).order('id')
+            if last_id:
+                query = query.gt('id', last_id)
+            page_size = PAGE_SIZE if limit is None else min(PAGE_SIZE, limit - verified - rejected - skipped)
+            try:
+                rows = query.limit(page_size).execute().data
+            except Exception as e:
+                print(f"Error fetching venue maps: {e}")
+                break
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+
+            fetched = list(fetch_pool.map(fetch_image, rows))
+            images = [image for image in fetched if image[1]]
+            failed_ids = {row_id for row_id, data, _ in fetched if not data}
+            failed_rows = [row for row in rows if row['id'] in failed_ids]
+            skipped += len(failed_rows)
+
+            verdicts = {}
+            batches = list(chunked(images, IMAGES_PER_REQUEST))
+            for batch, result in zip(batches, model_pool.map(lambda b: _safe_classify(model, b), batches)):
+                requests += 1
+                if result is None:
+                    skipped += len(batch)
+                    continue
+                verdicts.update(result)
+                skipped += len(batch) - len(result)
+
+            map_ids = [row_id for row_id, is_map in verdicts.items() if is_map]
+            other_ids = [row_id for row_id, is_map in verdicts.items() if not is_map]
+            verified += len(map_ids)
+            rejected += len(other_ids)
+            print(f"Page: {len(rows)} rows, {len(map_ids)} maps, {len(other_ids)} not maps, "
+                  f"{len(failed_rows)} unreadable images, {len(batches)} requests.")
+
+            if dry_run:
+                continue
+
+            now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            try:
+                lease.check()
+                for ids in chunked(map_ids, 100):
+                    supabase.table('venue_maps').update({'is_verified': True, 'verification_checked_at': now}).in_('id', ids).execute()
+                for ids in chunked(other_ids, 100):
+                    supabase.table('venue_maps').update({'verification_checked_at': now}).in_('id', ids).execute()
+                # Count failed fetches so unreadable images stop being downloaded after MAX_FETCH_FAILURES runs
+                failed_by_count = {}
+                for row in failed_rows:
+                    failed_by_count.setdefault((row.get('verification_failures') or 0) + 1, []).append(row['id'])
+                for failures, ids in failed_by_count.items():
+                    for id_batch in chunked(ids, 100):
+                        supabase.table('venue_maps').update({
+                            'verification_failures': failures,
+                            'verification_failed_at': now,
+                        }).in_('id', id_batch).execute()
+            except LeaseLostError as e:
+                print(f"Error: {e}")
+                break
+            except Exception as e:
+                print(f"Error saving verification results: {e}")
+
+    prefix = "[DRY RUN] " if dry_run else ""
+    print(f"\n{prefix}Verified {verified} maps, rejected {rejected}, left {skipped} unchecked "
+          f"({requests} Gemini requests for {verified + rejected + skipped} rows).")
+    print_usage_report()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Verify unverified venue_maps images in batched Gemini requests.")
+    parser.add_argument("--dry-run", action="store_true", help="Classify but do not update rows")
+    parser.add_argument("--limit", type=int, help="Stop after this many rows")
+    args = parser.parse_args()
+    main(dry_run=args.dry_run, limit=args.limit)
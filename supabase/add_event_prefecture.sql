@@ -0,0 +1,4 @@
+-- Prefecture of the event venue (JIS X 0401, same codes as users.prefecture_code)
+ALTER TABLE events ADD COLUMN IF NOT EXISTS prefecture_code VARCHAR(2);
+
+CREATE INDEX IF NOT EXISTS events_prefecture_code_idx ON events (prefecture_code);
@@ -0,0 +1,11 @@
+-- Backfill verification for venue_maps (scripts/verify_venue_maps.py)
+-- 判定済みの行（地図でないと判定されたものを含む）は verification_checked_at で区別し、再判定しない
+ALTER TABLE venue_maps ADD COLUMN IF NOT EXISTS verification_checked_at TIMESTAMPTZ;
+
+-- 画像を取得・送信できなかった回数と最後の失敗時刻（MAX_FETCH_FAILURES 回で対象から外す）
+ALTER TABLE venue_maps ADD COLUMN IF NOT EXISTS verification_failures INT NOT NULL DEFAULT 0;
+ALTER TABLE venue_maps ADD COLUMN IF NOT EXISTS verification_failed_at TIMESTAMPTZ;
+
+DROP INDEX IF EXISTS venue_maps_unchecked_idx;
+CREATE INDEX venue_maps_unchecked_idx ON venue_maps (id)
+    WHERE NOT is_verified AND verification_checked_at IS NULL AND verification_failures < 3;
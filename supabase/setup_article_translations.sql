@@ -0,0 +1,19 @@
+-- Pre-translated variants of trending_articles / daily_columns
+-- 翻訳は translate_articles.py がバッチで作成し、アプリは (source_table, source_id, language) で読むだけ
+CREATE TABLE IF NOT EXISTS article_translations (
+    source_table TEXT NOT NULL,   -- 'trending_articles' | 'daily_columns'
+    source_id UUID NOT NULL,
+    language TEXT NOT NULL,       -- 'en' | 'zh' | 'ko'
+    source_hash TEXT NOT NULL,    -- 翻訳元フィールドのSHA-256（原文が変わったら再翻訳）
+    fields JSONB NOT NULL,        -- 翻訳済みフィールド（title, summary, content, artist など）
+    model TEXT,
+    translated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (source_table, source_id, language)
+);
+
+-- Enable RLS
+ALTER TABLE article_translations ENABLE ROW LEVEL SECURITY;
+
+-- Public read access (writes are done by the batch job with the service role key)
+CREATE POLICY "Public read access" ON article_translations
+    FOR SELECT USING (true);
@@ -0,0 +1,21 @@
+-- Chat history compaction (scripts/compact_chat_history.py)
+-- 古いターンをセッションごとの要約にまとめ、生メッセージはアーカイブ扱いにする
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary_updated_at TIMESTAMPTZ;
+
+ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS archived BOOLEAN DEFAULT FALSE;
+
+-- The curator only replays non-archived messages
+CREATE INDEX IF NOT EXISTS chat_messages_active_idx ON chat_messages (session_id, created_at)
+    WHERE NOT archived;
+CREATE INDEX IF NOT EXISTS chat_sessions_last_updated_idx ON chat_sessions (last_updated);
+
+-- Watermarks for incremental batch jobs
+CREATE TABLE IF NOT EXISTS job_watermarks (
+    job TEXT PRIMARY KEY,
+    watermark TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Enable RLS (no public policy: only batch jobs use it)
+ALTER TABLE job_watermarks ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,36 @@
+-- Content embeddings for RAG (pgvector)
+-- daily_columns / trending_articles / events の本文ベクトルを1テーブルで管理する
+CREATE EXTENSION IF NOT EXISTS "vector";
+
+CREATE TABLE IF NOT EXISTS content_embeddings (
+    source_table TEXT NOT NULL,
+    source_id UUID NOT NULL,
+    content_hash TEXT NOT NULL,   -- 埋め込み元テキスト＋モデル名のSHA-256（差分検知用）
+    model TEXT NOT NULL,
+    embedding vector(768) NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (source_table, source_id)
+);
+
+-- Enable RLS
+ALTER TABLE content_embeddings ENABLE ROW LEVEL SECURITY;
+
+-- Public read access (writes are done by the batch job with the service role key)
+CREATE POLICY "Public read access" ON content_embeddings
+    FOR SELECT USING (true);
+
+-- Similarity search (cosine distance)
+CREATE OR REPLACE FUNCTION match_content_embeddings(
+    query_embedding vector(768),
+    match_count INT DEFAULT 5,
+    source_tables TEXT[] DEFAULT NULL
+)
+RETURNS TABLE (source_table TEXT, source_id UUID, similarity FLOAT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT ce.source_table, ce.source_id, 1 - (ce.embedding <=> query_embedding) AS similarity
+    FROM content_embeddings ce
+    WHERE source_tables IS NULL OR ce.source_table = ANY(source_tables)
+    ORDER BY ce.embedding <=> query_embedding
+    LIMIT match_count;
+$$;
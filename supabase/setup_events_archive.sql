@@ -0,0 +1,55 @@
+-- Archive of expired events (moved by scripts/archive_events.py / daily_crawler.py)
+-- 終了した展覧会を削除せず、件数上限つきのバッチで events_archive に移す
+CREATE TABLE IF NOT EXISTS events_archive (
+    LIKE events INCLUDING DEFAULTS,
+    archived_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (id)
+);
+
+CREATE INDEX IF NOT EXISTS events_archive_end_date_idx ON events_archive (end_date);
+CREATE INDEX IF NOT EXISTS events_end_date_idx ON events (end_date);
+
+-- Enable RLS (no public policy: the archive is for analytics only)
+ALTER TABLE events_archive ENABLE ROW LEVEL SECURITY;
+
+-- Move up to batch_size events that ended before cutoff. Returns the number of rows moved.
+-- Rows are matched by column name, so columns added to events later are simply dropped
+-- until they are also added to events_archive.
+CREATE OR REPLACE FUNCTION archive_expired_events(
+    cutoff DATE DEFAULT CURRENT_DATE,
+    batch_size INT DEFAULT 500
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    batch_ids UUID[];
+BEGIN
+    SELECT array_agg(id) INTO batch_ids
+    FROM (
+        SELECT id FROM events
+        WHERE end_date < cutoff
+        ORDER BY end_date
+        LIMIT batch_size
+        FOR UPDATE SKIP LOCKED
+    ) batch;
+
+    IF batch_ids IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    -- Keep user-uploaded maps that are already linked to a venue (event_id cascades on delete)
+    UPDATE venue_maps SET event_id = NULL
+    WHERE event_id = ANY(batch_ids) AND venue_id IS NOT NULL;
+
+    WITH moved AS (
+        DELETE FROM events WHERE id = ANY(batch_ids) RETURNING *
+    )
+    INSERT INTO events_archive
+    SELECT (jsonb_populate_record(NULL::events_archive, to_jsonb(moved) || jsonb_build_object('archived_at', NOW()))).*
+    FROM moved
+    ON CONFLICT (id) DO NOTHING;
+
+    RETURN cardinality(batch_ids);
+END;
+$$;
@@ -0,0 +1,8 @@
+-- Storage bucket for precomputed home-feed snapshots (written by scripts/publish_home_feed.py)
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('home_feed', 'home_feed', true)
+ON CONFLICT (id) DO NOTHING;
+
+-- Public read access (uploads are done with the service role key)
+CREATE POLICY "Public read home_feed" ON storage.objects
+  FOR SELECT USING (bucket_id = 'home_feed');
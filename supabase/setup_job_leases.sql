@@ -0,0 +1,53 @@
+-- Run leases for batch jobs (scripts/job_lease.py)
+-- 同じ種類のジョブが同時に動かないよう、ジョブごとに1行のリースを持つ。
+-- 保持者はハートビートで expires_at を延ばし、止まったリースは期限切れで他の実行が取得できる
+CREATE TABLE IF NOT EXISTS job_leases (
+    job TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    acquired_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+-- Enable RLS (no public policy: only batch jobs use it)
+ALTER TABLE job_leases ENABLE ROW LEVEL SECURITY;
+
+-- 空いているか期限切れなら取得する（同じ holder なら延長）。取得できたら TRUE
+CREATE OR REPLACE FUNCTION acquire_job_lease(job_name TEXT, holder_id TEXT, ttl_seconds INT)
+RETURNS BOOLEAN
+LANGUAGE sql
+AS $$
+    WITH acquired AS (
+        INSERT INTO job_leases AS l (job, holder, acquired_at, heartbeat_at, expires_at)
+        VALUES (job_name, holder_id, NOW(), NOW(), NOW() + make_interval(secs => ttl_seconds))
+        ON CONFLICT (job) DO UPDATE
+            SET holder = EXCLUDED.holder,
+                acquired_at = CASE WHEN l.holder = EXCLUDED.holder THEN l.acquired_at ELSE NOW() END,
+                heartbeat_at = NOW(),
+                expires_at = EXCLUDED.expires_at
+            WHERE l.expires_at < NOW() OR l.holder = EXCLUDED.holder
+        RETURNING 1
+    )
+    SELECT EXISTS (SELECT 1 FROM acquired);
+$$;
+
+-- 保持中のリースを延長する。他の実行に奪われていたら FALSE
+CREATE OR REPLACE FUNCTION renew_job_lease(job_name TEXT, holder_id TEXT, ttl_seconds INT)
+RETURNS BOOLEAN
+LANGUAGE sql
+AS $$
+    WITH renewed AS (
+        UPDATE job_leases
+        SET heartbeat_at = NOW(), expires_at = NOW() + make_interval(secs => ttl_seconds)
+        WHERE job = job_name AND holder = holder_id
+        RETURNING 1
+    )
+    SELECT EXISTS (SELECT 1 FROM renewed);
+$$;
+
+CREATE OR REPLACE FUNCTION release_job_lease(job_name TEXT, holder_id TEXT)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    DELETE FROM job_leases WHERE job = job_name AND holder = holder_id;
+$$;
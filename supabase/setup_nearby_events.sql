@@ -0,0 +1,207 @@
+-- Per-prefecture nearby events (written by scripts/materialize_nearby_events.py)
+-- 「近くの展覧会」を都道府県ごとに事前計算し、ユーザーの読み込みを1回の主キー検索にする
+
+-- Prefectures with a reference point (prefectural office) for distance ranking
+CREATE TABLE IF NOT EXISTS prefectures (
+    code VARCHAR(2) PRIMARY KEY,  -- JIS X 0401, same as users.prefecture_code
+    name TEXT NOT NULL,
+    centroid GEOGRAPHY(POINT) NOT NULL
+);
+
+INSERT INTO prefectures (code, name, centroid) VALUES
+('01', '北海道', 'POINT(141.3469 43.0642)'),
+('02', '青森県', 'POINT(140.7400 40.8244)'),
+('03', '岩手県', 'POINT(141.1527 39.7036)'),
+('04', '宮城県', 'POINT(140.8721 38.2688)'),
+('05', '秋田県', 'POINT(140.1024 39.7186)'),
+('06', '山形県', 'POINT(140.3633 38.2404)'),
+('07', '福島県', 'POINT(140.4676 37.7503)'),
+('08', '茨城県', 'POINT(140.4468 36.3418)'),
+('09', '栃木県', 'POINT(139.8836 36.5657)'),
+('10', '群馬県', 'POINT(139.0608 36.3911)'),
+('11', '埼玉県', 'POINT(139.6489 35.8569)'),
+('12', '千葉県', 'POINT(140.1233 35.6046)'),
+('13', '東京都', 'POINT(139.6917 35.6895)'),
+('14', '神奈川県', 'POINT(139.6425 35.4478)'),
+('15', '新潟県', 'POINT(139.0236 37.9026)'),
+('16', '富山県', 'POINT(137.2113 36.6953)'),
+('17', '石川県', 'POINT(136.6256 36.5947)'),
+('18', '福井県', 'POINT(136.2216 36.0652)'),
+('19', '山梨県', 'POINT(138.5684 35.6642)'),
+('20', '長野県', 'POINT(138.1810 36.6513)'),
+('21', '岐阜県', 'POINT(136.7223 35.3912)'),
+('22', '静岡県', 'POINT(138.3831 34.9769)'),
+('23', '愛知県', 'POINT(136.9066 35.1802)'),
+('24', '三重県', 'POINT(136.5086 34.7303)'),
+('25', '滋賀県', 'POINT(135.8686 35.0045)'),
+('26', '京都府', 'POINT(135.7556 35.0214)'),
+('27', '大阪府', 'POINT(135.5200 34.6863)'),
+('28', '兵庫県', 'POINT(135.1830 34.6913)'),
+('29', '奈良県', 'POINT(135.8329 34.6851)'),
+('30', '和歌山県', 'POINT(135.1675 34.2260)'),
+('31', '鳥取県', 'POINT(134.2377 35.5039)'),
+('32', '島根県', 'POINT(133.0505 35.4723)'),
+('33', '岡山県', 'POINT(133.9350 34.6618)'),
+('34', '広島県', 'POINT(132.4596 34.3966)'),
+('35', '山口県', 'POINT(131.4714 34.1859)'),
+('36', '徳島県', 'POINT(134.5593 34.0658)'),
+('37', '香川県', 'POINT(134.0434 34.3401)'),
+('38', '愛媛県', 'POINT(132.7657 33.8416)'),
+('39', '高知県', 'POINT(133.5311 33.5597)'),
+('40', '福岡県', 'POINT(130.4181 33.6064)'),
+('41', '佐賀県', 'POINT(130.2988 33.2494)'),
+('42', '長崎県', 'POINT(129.8737 32.7448)'),
+('43', '熊本県', 'POINT(130.7417 32.7898)'),
+('44', '大分県', 'POINT(131.6126 33.2382)'),
+('45', '宮崎県', 'POINT(131.4239 31.9111)'),
+('46', '鹿児島県', 'POINT(130.5581 31.5602)'),
+('47', '沖縄県', 'POINT(127.6809 26.2124)')
+ON CONFLICT (code) DO UPDATE SET
+    name = EXCLUDED.name,
+    centroid = EXCLUDED.centroid;
+
+-- Precomputed ranking per prefecture
+CREATE TABLE IF NOT EXISTS prefecture_nearby_events (
+    prefecture_code VARCHAR(2) PRIMARY KEY REFERENCES prefectures(code),
+    events JSONB NOT NULL DEFAULT '[]'::jsonb,
+    event_count INT NOT NULL DEFAULT 0,
+    events_hash TEXT,
+    refreshed_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Enable RLS
+ALTER TABLE prefectures ENABLE ROW LEVEL SECURITY;
+ALTER TABLE prefecture_nearby_events ENABLE ROW LEVEL SECURITY;
+
+-- Public read access
+CREATE POLICY "Public read access" ON prefectures
+    FOR SELECT USING (true);
+CREATE POLICY "Public read access" ON prefecture_nearby_events
+    FOR SELECT USING (true);
+
+-- Indexes used by the ranking: each candidate branch below filters on one of these
+CREATE INDEX IF NOT EXISTS venues_location_idx ON venues USING GIST (location);
+CREATE INDEX IF NOT EXISTS events_location_idx ON events USING GIST (location);
+CREATE INDEX IF NOT EXISTS events_venue_id_idx ON events (venue_id);
+CREATE INDEX IF NOT EXISTS events_end_date_idx ON events (end_date);
+
+-- Change tracking so only prefectures near changed events are recomputed
+ALTER TABLE events ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+ALTER TABLE venues ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+CREATE INDEX IF NOT EXISTS events_updated_at_idx ON events (updated_at);
+CREATE INDEX IF NOT EXISTS venues_updated_at_idx ON venues (updated_at);
+
+-- Bump updated_at only when the row actually changed (the crawler re-upserts unchanged events every day)
+CREATE OR REPLACE FUNCTION touch_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF ROW(NEW.*) IS DISTINCT FROM ROW(OLD.*) THEN
+        NEW.updated_at = NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS events_touch_updated_at ON events;
+CREATE TRIGGER events_touch_updated_at BEFORE UPDATE ON events
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+DROP TRIGGER IF EXISTS venues_touch_updated_at ON venues;
+CREATE TRIGGER venues_touch_updated_at BEFORE UPDATE ON venues
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+-- When the materializer last finished (the next run recomputes what changed after it)
+CREATE TABLE IF NOT EXISTS nearby_events_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    refreshed_through TIMESTAMPTZ NOT NULL
+);
+ALTER TABLE nearby_events_state ENABLE ROW LEVEL SECURITY;
+
+-- Active and upcoming events near each prefecture, ranked by distance from the venue
+-- Candidates come from three index-usable branches (venue location, event location without a venue
+-- location, same prefecture); the distance is only computed for those candidates.
+CREATE OR REPLACE FUNCTION rank_nearby_events(
+    prefecture_codes TEXT[],
+    max_per_prefecture INT DEFAULT 30,
+    max_distance_km FLOAT DEFAULT 150
+)
+RETURNS TABLE (prefecture_code VARCHAR(2), event_id UUID, distance_m FLOAT, rank BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT p.code, ranked.id, ranked.distance_m, ranked.rank
+    FROM prefectures p
+    CROSS JOIN LATERAL (
+        SELECT
+            c.id,
+            c.distance_m,
+            ROW_NUMBER() OVER (ORDER BY c.distance_m NULLS LAST, c.start_date) AS rank
+        FROM (
+            SELECT e.id, e.start_date, ST_Distance(v.location, p.centroid) AS distance_m
+            FROM venues v
+            JOIN events e ON e.venue_id = v.id
+            WHERE ST_DWithin(v.location, p.centroid, max_distance_km * 1000)
+              AND e.end_date >= CURRENT_DATE
+            UNION
+            SELECT e.id, e.start_date, ST_Distance(e.location, p.centroid)
+            FROM events e
+            LEFT JOIN venues v ON v.id = e.venue_id
+            WHERE ST_DWithin(e.location, p.centroid, max_distance_km * 1000)
+              AND v.location IS NULL
+              AND e.end_date >= CURRENT_DATE
+            UNION
+            SELECT e.id, e.start_date, ST_Distance(COALESCE(v.location, e.location), p.centroid)
+            FROM events e
+            LEFT JOIN venues v ON v.id = e.venue_id
+            WHERE e.prefecture_code = p.code
+              AND e.end_date >= CURRENT_DATE
+        ) c
+        ORDER BY rank
+        LIMIT max_per_prefecture
+    ) ranked
+    WHERE p.code = ANY(prefecture_codes);
+$$;
+
+-- Prefectures whose ranking may have changed since the given time:
+-- near (or in the prefecture of) an event or venue that changed or expired, or already listing such an event
+CREATE OR REPLACE FUNCTION changed_nearby_prefectures(
+    since TIMESTAMPTZ,
+    max_distance_km FLOAT DEFAULT 150
+)
+RETURNS TABLE (prefecture_code VARCHAR(2))
+LANGUAGE sql STABLE
+AS $$
+    WITH changed AS (
+        SELECT e.id, COALESCE(v.location, e.location) AS location, e.prefecture_code
+        FROM events e
+        LEFT JOIN venues v ON v.id = e.venue_id
+        WHERE e.updated_at >= since
+        UNION ALL
+        SELECT e.id, v.location, e.prefecture_code
+        FROM venues v
+        JOIN events e ON e.venue_id = v.id
+        WHERE v.updated_at >= since
+        UNION ALL
+        -- Ended since the last run (the ranking only lists events that have not ended)
+        SELECT e.id, NULL::geography, NULL
+        FROM events e
+        WHERE e.end_date >= since::date - 1 AND e.end_date < CURRENT_DATE
+        UNION ALL
+        SELECT a.id, NULL::geography, NULL
+        FROM events_archive a
+        WHERE a.archived_at >= since
+    )
+    SELECT p.code
+    FROM prefectures p
+    WHERE EXISTS (
+        SELECT 1 FROM changed c
+        WHERE c.prefecture_code = p.code
+           OR ST_DWithin(c.location, p.centroid, max_distance_km * 1000)
+    )
+    OR EXISTS (
+        SELECT 1
+        FROM prefecture_nearby_events n, jsonb_array_elements(n.events) listed
+        WHERE n.prefecture_code = p.code
+          AND (listed->>'id')::uuid IN (SELECT id FROM changed)
+    );
+$$;
@@ -0,0 +1,18 @@
+-- Run journal for resumable batch jobs (scripts/run_journal.py)
+-- CI のランナーは実行ごとに消えるので、進捗はDBに残してタイムアウト・異常終了した実行を次の実行で再開する
+CREATE TABLE IF NOT EXISTS run_journal_entries (
+    id BIGSERIAL PRIMARY KEY,
+    job TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    dry_run BOOLEAN NOT NULL DEFAULT FALSE,  -- --dry-run の実行は本番の実行と混ざらないよう区別する
+    item TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    payload JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS run_journal_entries_job_idx
+    ON run_journal_entries (job, dry_run, created_at DESC);
+
+-- Enable RLS (no public policy: only batch jobs use it)
+ALTER TABLE run_journal_entries ENABLE ROW LEVEL SECURITY;
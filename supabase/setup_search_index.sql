@@ -0,0 +1,8 @@
+-- Storage bucket for the prebuilt article search index (written by scripts/build_search_index.py)
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('search_index', 'search_index', true)
+ON CONFLICT (id) DO NOTHING;
+
+-- Public read access (uploads are done with the service role key)
+CREATE POLICY "Public read search_index" ON storage.objects
+  FOR SELECT USING (bucket_id = 'search_index');
@@ -0,0 +1,66 @@
+-- Seasonal exhibition calendar (read by scripts/seasonal_exhibitions.py)
+-- 毎年恒例の展覧会を「回」ごとに1行で持つ。開催日は公式発表に合わせて毎年追加・更新する
+CREATE TABLE IF NOT EXISTS seasonal_exhibitions (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    name TEXT NOT NULL,
+    venue TEXT NOT NULL,
+    description TEXT,
+    official_url TEXT,
+    image_query TEXT,
+    starts_on DATE NOT NULL,
+    ends_on DATE NOT NULL,
+    lead_days INT NOT NULL DEFAULT 30,   -- 開幕の何日前から特集記事を出すか
+    -- 特集記事を出す期間（開幕 lead_days 日前〜会期末）
+    feature_window DATERANGE GENERATED ALWAYS AS (daterange(starts_on - lead_days, ends_on, '[]')) STORED,
+    article_published_at TIMESTAMPTZ,    -- 特集記事を公開した日時（NULL = 未公開）
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (name, starts_on),
+    CHECK (ends_on >= starts_on)
+);
+
+CREATE INDEX IF NOT EXISTS idx_seasonal_exhibitions_window
+    ON seasonal_exhibitions USING GIST (feature_window);
+
+-- Enable RLS
+ALTER TABLE seasonal_exhibitions ENABLE ROW LEVEL SECURITY;
+
+-- Public read access (writes are done with the service role key)
+CREATE POLICY "Public read access" ON seasonal_exhibitions
+    FOR SELECT USING (true);
+
+-- 指定日に特集記事を出すべきで、まだ記事のない回
+CREATE OR REPLACE FUNCTION due_seasonal_exhibitions(on_date DATE DEFAULT CURRENT_DATE)
+RETURNS SETOF seasonal_exhibitions
+LANGUAGE sql STABLE
+AS $$
+    SELECT *
+    FROM seasonal_exhibitions
+    WHERE feature_window @> on_date
+      AND article_published_at IS NULL
+    ORDER BY starts_on;
+$$;
+
+-- 旧 SEASONAL_EXHIBITIONS（seasonal_exhibitions.py）からの移行分
+INSERT INTO seasonal_exhibitions (name, venue, description, official_url, image_query, starts_on, ends_on, lead_days)
+VALUES
+    ('院展', '東京都美術館',
+     '日本美術院主催の日本画公募展。横山大観らが創設した伝統ある展覧会。',
+     'https://nihonbijutsuin.or.jp/', 'Inten Japanese painting exhibition',
+     '2026-09-01', '2026-09-17', 30),
+    ('二科展', '国立新美術館',
+     '1914年創設の歴史ある洋画・彫刻・デザインの公募展。',
+     'https://www.nika.or.jp/', 'Nika art exhibition Japan',
+     '2026-09-02', '2026-09-14', 30),
+    ('正倉院展', '奈良国立博物館',
+     '正倉院宝物を年に一度だけ公開する特別展。奈良時代の国宝級宝物が間近で見られる貴重な機会。',
+     'https://www.narahaku.go.jp/', 'Shosoin treasure Japan',
+     '2026-10-24', '2026-11-09', 45),
+    ('日展', '国立新美術館',
+     '日本最大規模の総合美術展。日本画、洋画、彫刻、工芸、書の5部門で構成される公募展。',
+     'https://nitten.or.jp/', 'Nitten art exhibition Japan',
+     '2026-10-30', '2026-11-22', 30),
+    ('東京国立博物館 新春特別公開', '東京国立博物館',
+     '国宝・重要文化財を含む特別な作品を新年に公開する恒例行事。',
+     'https://www.tnm.jp/', 'Tokyo National Museum treasure',
+     '2027-01-02', '2027-01-26', 30)
+ON CONFLICT (name, starts_on) DO NOTHING;
@@ -0,0 +1,8 @@
+-- Storage bucket for pre-rendered article pages and sitemap (written by scripts/render_static_pages.py)
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('static_site', 'static_site', true)
+ON CONFLICT (id) DO NOTHING;
+
+-- Public read access (uploads are done with the service role key)
+CREATE POLICY "Public read static_site" ON storage.objects
+  FOR SELECT USING (bucket_id = 'static_site');
@@ -0,0 +1,15 @@
+-- Venue aliases: 表記揺れ（全角/半角、括弧書きなど）を正規の会場に紐付ける
+CREATE TABLE IF NOT EXISTS venue_aliases (
+    alias TEXT PRIMARY KEY,
+    venue_id UUID NOT NULL REFERENCES venues(id) ON DELETE CASCADE,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS venue_aliases_venue_id_idx ON venue_aliases (venue_id);
+
+-- Enable RLS
+ALTER TABLE venue_aliases ENABLE ROW LEVEL SECURITY;
+
+-- Public read access (writes are done by the crawler with the service role key)
+CREATE POLICY "Public read access" ON venue_aliases
+    FOR SELECT USING (true);